@@ -0,0 +1,527 @@
+"""
+Headless HTTP API (plain ASGI, no framework) over the same db layer as the
+Streamlit UI, for handheld POS devices and kitchen displays:
+
+    GET    /health
+    GET    /metrics                                Prometheus text format
+    GET    /menu                                   (ETag = menu version)
+    GET    /tables[?since=VERSION&timeout=S]       (long-poll until the table board changes)
+    POST   /tables/{id}/status                     {"status": "cleaning" | "available"}
+    POST   /orders                                 one-shot order, see place_order()
+    GET    /orders/{id}/bill?format=pdf|csv|json
+    GET    /tickets                                open tabs
+    POST   /tickets                                {"order_type", "table_id"}
+    GET    /tickets/{id}
+    POST   /tickets/{id}/items                     {"items": [{"item_id", "quantity"}, ...]}
+    DELETE /tickets/{id}/items/{line_id}[?quantity=N]
+    POST   /tickets/{id}/settle                    {"payment_mode", "discount_type", "discount_value"}
+    GET    /reports/summary|most-sold|trend?start=YYYY-MM-DD&end=YYYY-MM-DD
+    GET    /settlements[?start=YYYY-MM-DD&end=YYYY-MM-DD]
+    POST   /settlements/{day}                      close the day (Z-report); 200 if it already was
+    GET    /settlements/{day}[?format=json|pdf|csv]
+    GET    /kitchen/tickets[?station=S&station=...]
+    POST   /kitchen/tickets/{id}/status            {"status": "preparing" | "ready" | "served"}
+    GET    /kitchen/stream[?station=S&...]         server-sent events, see _kitchen_stream()
+
+Handlers are plain functions run on a thread pool the size of the SQLite
+connection pool, so the event loop only parses requests and writes
+responses. Serve it with any ASGI server, e.g. uvicorn (not a dependency
+of the app):
+
+    python -m api.server [--host 0.0.0.0] [--port 8000]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from utils import db_utils
+from utils import metrics
+from utils.db_pool import POOL_SIZE, close_all_pools
+from utils.settlement import PAYMENT_MODES
+
+log = logging.getLogger(__name__)
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        self.status = status
+        super().__init__(message)
+
+
+class Request:
+    def __init__(self, method, path, query, headers, body, params):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+        self.params = params
+
+    def arg(self, name, default=None, cast=str):
+        values = self.query.get(name)
+        if not values:
+            return default
+        try:
+            return cast(values[0])
+        except ValueError:
+            raise HTTPError(400, f"bad value for {name!r}: {values[0]!r}")
+
+    def date(self, name):
+        value = self.arg(name)
+        if value is not None:
+            try:
+                datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                raise HTTPError(400, f"{name} must be YYYY-MM-DD")
+        return value
+
+    def json(self):
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HTTPError(400, "body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        return data
+
+
+class Response:
+    def __init__(self, body=b"", status=200, content_type="application/json", headers=()):
+        self.body = body.encode("utf-8") if isinstance(body, str) else body
+        self.status = status
+        self.content_type = content_type
+        self.headers = list(headers)
+
+
+def _json_default(value):
+    # numpy scalars from pandas records
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _json(data, status=200, headers=()):
+    return Response(json.dumps(data, default=_json_default, ensure_ascii=False), status, headers=headers)
+
+
+def _records(df):
+    return json.loads(df.to_json(orient="records"))
+
+
+def _items(data):
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        raise HTTPError(400, "items must be a non-empty list")
+    try:
+        lines = [{"item_id": int(it["item_id"]), "quantity": int(it["quantity"])} for it in items]
+    except (KeyError, TypeError, ValueError):
+        raise HTTPError(400, "every item needs an integer item_id and quantity")
+    if any(it["quantity"] <= 0 for it in lines):
+        raise HTTPError(400, "every quantity must be positive")
+    return lines
+
+
+DISCOUNT_TYPES = ("None", "Percentage", "Fixed amount")
+
+
+def _discount(data):
+    discount_type = data.get("discount_type") or "None"
+    if discount_type not in DISCOUNT_TYPES:
+        raise HTTPError(400, f"discount_type must be one of {', '.join(DISCOUNT_TYPES)}")
+    try:
+        value = float(data.get("discount_value") or 0)
+    except (TypeError, ValueError):
+        raise HTTPError(400, "discount_value must be a number")
+    if discount_type == "Percentage" and not 0 <= value <= 100:
+        raise HTTPError(400, "a percentage discount must be between 0 and 100")
+    if discount_type == "Fixed amount" and not value >= 0:
+        raise HTTPError(400, "a fixed discount cannot be negative")
+    return discount_type, value
+
+
+def _payment_mode(data):
+    payment_mode = data.get("payment_mode") or "Cash"
+    if payment_mode not in PAYMENT_MODES:
+        raise HTTPError(400, f"payment_mode must be one of {', '.join(PAYMENT_MODES)}")
+    return payment_mode
+
+
+# ------------------ handlers ------------------
+_menu_body = (None, None)
+
+
+API_REQUEST = metrics.REGISTRY.histogram("rbs_api_request_seconds", "API handler time by route.", ("route",))
+
+
+def health(req):
+    return _json({"ok": True, "branch": db_utils.BRANCH_ID})
+
+
+def get_metrics(req):
+    return Response(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def get_menu(req):
+    global _menu_body
+    snapshot = db_utils.get_menu_snapshot()
+    etag = f'"menu-{snapshot.version}"'
+    if req.headers.get("if-none-match") == etag:
+        return Response(status=304, headers=[("etag", etag)])
+    # encoded once per menu version
+    version, body = _menu_body
+    if version != snapshot.version:
+        body = json.dumps([{k: row[k] for k in ("id", "item_name", "category", "price", "gst")}
+                           for row in snapshot.rows], default=_json_default, ensure_ascii=False)
+        _menu_body = (snapshot.version, body)
+    return Response(body, headers=[("etag", etag)])
+
+
+def get_tables(req):
+    version, rows = db_utils.get_table_board()
+    return _json({"version": version, "tables": rows})
+
+
+def set_table_status(req):
+    status = req.json().get("status")
+    if status not in ("cleaning", "available"):
+        raise HTTPError(400, "status must be 'cleaning' or 'available'")
+    db_utils.set_table_status(int(req.params["id"]), status)
+    return get_tables(req)
+
+
+def create_order(req):
+    data = req.json()
+    table_id = data.get("table_id")
+    items, (discount_type, discount_value) = _items(data), _discount(data)
+    order_id, bill = db_utils.place_order(
+        data.get("order_type") or ("Dine-In" if table_id is not None else "Takeaway"),
+        _payment_mode(data), items,
+        table_id=None if table_id is None else int(table_id),
+        discount_type=discount_type, discount_value=discount_value)
+    return _json({"order_id": order_id, "subtotal": bill["subtotal"], "gst_amount": bill["gst_amount"],
+                  "discount_amount": bill["discount_amount"], "total": bill["total"]}, 201)
+
+
+_BILL_TYPES = {"pdf": "application/pdf", "csv": "text/csv; charset=utf-8", "json": "application/json"}
+
+
+def get_bill(req):
+    fmt = req.arg("format", "pdf")
+    if fmt not in _BILL_TYPES:
+        raise HTTPError(400, "format must be pdf, csv or json")
+    order_id = int(req.params["id"])
+    data = db_utils.get_receipt(order_id, fmt)
+    if data is None:
+        raise HTTPError(404, f"no order {order_id}")
+    return Response(data, content_type=_BILL_TYPES[fmt],
+                    headers=[("content-disposition", f'inline; filename="receipt_{order_id}.{fmt}"')])
+
+
+def list_tickets(req):
+    return _json(_records(db_utils.get_open_tickets()))
+
+
+def open_ticket(req):
+    data = req.json()
+    table_id = data.get("table_id")
+    order_id = db_utils.open_ticket(data.get("order_type") or "Dine-In",
+                                    None if table_id is None else int(table_id))
+    return _json({"order_id": order_id}, 201)
+
+
+def get_ticket(req):
+    order_id = int(req.params["id"])
+    tickets = db_utils.get_open_tickets()
+    row = tickets[tickets["order_id"] == order_id]
+    if row.empty:
+        raise HTTPError(404, f"order {order_id} is not an open ticket")
+    return _json(dict(_records(row)[0], lines=_records(db_utils.get_ticket_lines(order_id))))
+
+
+def append_items(req):
+    line_ids = db_utils.add_to_ticket(int(req.params["id"]), _items(req.json()))
+    return _json({"line_ids": line_ids}, 201)
+
+
+def void_line(req):
+    try:
+        voided = db_utils.void_ticket_line(int(req.params["id"]), int(req.params["line_id"]),
+                                           req.arg("quantity", None, int))
+    except KeyError as e:
+        raise HTTPError(404, e.args[0])
+    return _json({"voided": voided})
+
+
+def settle_ticket(req):
+    data = req.json()
+    total = db_utils.settle_ticket(int(req.params["id"]), _payment_mode(data), *_discount(data))
+    return _json({"order_id": int(req.params["id"]), "total": total})
+
+
+def report_summary(req):
+    totals, items = db_utils.get_sales_summary(req.date("start"), req.date("end"))
+    return _json({"totals": totals, "items": _records(items)})
+
+
+def report_most_sold(req):
+    df = db_utils.most_sold_items_df(None, top_n=req.arg("top_n", 10, int), start_date=req.date("start"),
+                                     end_date=req.date("end"))
+    return _json(_records(df))
+
+
+def report_trend(req):
+    period = req.arg("period", "month")
+    if period not in ("day", "month", "year"):
+        raise HTTPError(400, "period must be day, month or year")
+    return _json(_records(db_utils.get_sales_trend(req.date("start"), req.date("end"), period)))
+
+
+def list_settlements(req):
+    return _json(_records(db_utils.get_settlements(req.date("start"), req.date("end"))))
+
+
+def close_day(req):
+    summary, created = db_utils.close_day(req.params["day"])
+    return _json(summary, 201 if created else 200)
+
+
+def get_settlement(req):
+    day, fmt = req.params["day"], req.arg("format", "json")
+    if fmt not in _BILL_TYPES:
+        raise HTTPError(400, "format must be pdf, csv or json")
+    data = db_utils.get_settlement(day) if fmt == "json" else db_utils.get_settlement_document(day, fmt)
+    if data is None:
+        raise HTTPError(404, f"{day} is not settled")
+    if fmt == "json":
+        return _json(data)
+    return Response(data, content_type=_BILL_TYPES[fmt],
+                    headers=[("content-disposition", f'inline; filename="z_report_{day}.{fmt}"')])
+
+
+def kitchen_tickets(req):
+    seq, tickets = db_utils.get_kitchen_tickets(req.query.get("station"))
+    return _json({"seq": seq, "tickets": tickets})
+
+
+def kitchen_status(req):
+    db_utils.advance_kitchen_ticket(int(req.params["id"]), req.json().get("status"))
+    return _json({"id": int(req.params["id"]), "status": req.json().get("status")})
+
+
+def _sse(event, seq, data):
+    return f"event: {event}\nid: {seq}\ndata: {json.dumps(data, default=_json_default, ensure_ascii=False)}\n\n"
+
+
+_sse_frames = OrderedDict()
+
+
+def _ticket_frame(ticket):
+    # every screen on a station gets the same change: encode it once (seq is unique per change)
+    frame = _sse_frames.get(ticket["seq"])
+    if frame is None:
+        frame = _sse_frames[ticket["seq"]] = _sse("ticket", ticket["seq"], ticket).encode("utf-8")
+        if len(_sse_frames) > 4096:
+            _sse_frames.popitem(last=False)
+    return frame
+
+
+ROUTES = [
+    ("GET", r"/health", health),
+    ("GET", r"/metrics", get_metrics),
+    ("GET", r"/menu", get_menu),
+    ("GET", r"/tables", get_tables),
+    ("POST", r"/tables/(?P<id>\d+)/status", set_table_status),
+    ("POST", r"/orders", create_order),
+    ("GET", r"/orders/(?P<id>\d+)/bill", get_bill),
+    ("GET", r"/tickets", list_tickets),
+    ("POST", r"/tickets", open_ticket),
+    ("GET", r"/tickets/(?P<id>\d+)", get_ticket),
+    ("POST", r"/tickets/(?P<id>\d+)/items", append_items),
+    ("DELETE", r"/tickets/(?P<id>\d+)/items/(?P<line_id>\d+)", void_line),
+    ("POST", r"/tickets/(?P<id>\d+)/settle", settle_ticket),
+    ("GET", r"/reports/summary", report_summary),
+    ("GET", r"/reports/most-sold", report_most_sold),
+    ("GET", r"/reports/trend", report_trend),
+    ("GET", r"/settlements", list_settlements),
+    ("POST", r"/settlements/(?P<day>\d{4}-\d{2}-\d{2})", close_day),
+    ("GET", r"/settlements/(?P<day>\d{4}-\d{2}-\d{2})", get_settlement),
+    ("GET", r"/kitchen/tickets", kitchen_tickets),
+    ("POST", r"/kitchen/tickets/(?P<id>\d+)/status", kitchen_status),
+]
+_COMPILED = [(method, re.compile(pattern + "$"), fn) for method, pattern, fn in ROUTES]
+
+
+def _route(method, path):
+    allowed = False
+    for m, pattern, fn in _COMPILED:
+        match = pattern.match(path)
+        if match:
+            if m == method:
+                return fn, match.groupdict()
+            allowed = True
+    if allowed:
+        raise HTTPError(405, f"{method} not allowed on {path}")
+    raise HTTPError(404, f"{path} not found")
+
+
+def _handle(req):
+    # runs on the worker pool
+    start, route = time.perf_counter(), "unmatched"
+    try:
+        fn, req.params = _route(req.method, req.path)
+        route = fn.__name__
+        return fn(req)
+    except HTTPError as e:
+        return _json({"error": str(e)}, e.status)
+    except (db_utils.TableConflict, db_utils.TicketClosed, db_utils.TicketStateError) as e:
+        return _json({"error": str(e)}, 409)
+    except ValueError as e:
+        return _json({"error": str(e)}, 400)
+    finally:
+        API_REQUEST.labels(route).observe(time.perf_counter() - start)
+
+
+# ------------------ ASGI ------------------
+class App:
+    def __init__(self, workers=POOL_SIZE):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        req = Request(scope["method"], scope["path"].rstrip("/") or "/",
+                      parse_qs(scope.get("query_string", b"").decode("latin-1")), headers, body, {})
+        loop = asyncio.get_running_loop()
+        if req.method == "GET" and req.path == "/kitchen/stream":
+            return await self._kitchen_stream(req, loop, receive, send)
+        try:
+            if req.method == "GET" and req.path == "/tables" and "since" in req.query:
+                resp = await self._wait_tables(req, loop)
+            else:
+                resp = await loop.run_in_executor(self._executor, _handle, req)
+        except Exception:
+            log.exception("%s %s failed", req.method, req.path)
+            resp = _json({"error": "internal server error"}, 500)
+        await send({"type": "http.response.start", "status": resp.status,
+                    "headers": [(b"content-type", resp.content_type.encode()),
+                                (b"content-length", str(len(resp.body)).encode())]
+                               + [(k.encode(), v.encode()) for k, v in resp.headers]})
+        await send({"type": "http.response.body", "body": resp.body})
+
+    async def _wait_tables(self, req, loop):
+        """Long poll: answer as soon as the table board version differs from ?since=."""
+        try:
+            since = req.arg("since", None, int)
+            timeout = min(req.arg("timeout", 25.0, float), 60.0)
+        except HTTPError as e:
+            return _json({"error": str(e)}, e.status)
+        changed = asyncio.Event()
+        # changes committed by this process wake the poll at once; other processes
+        # are noticed by the board's once-a-second version check
+        unsubscribe = db_utils.subscribe_tables(lambda version, rows: loop.call_soon_threadsafe(changed.set))
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                version, rows = await loop.run_in_executor(self._executor, db_utils.get_table_board)
+                remaining = deadline - loop.time()
+                if version != since or remaining <= 0:
+                    return _json({"version": version, "tables": rows})
+                changed.clear()
+                try:
+                    await asyncio.wait_for(changed.wait(), min(remaining, 1.0))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            unsubscribe()
+
+    async def _kitchen_stream(self, req, loop, receive, send, keepalive=15.0):
+        """
+        Server-sent events for a kitchen display: first an `event: snapshot`
+        with the active tickets of the requested stations, then one
+        `event: ticket` per new or changed ticket (`id:` is its seq). A client
+        that reads too slowly is not buffered without bound: once the
+        subscriber's queue overflows its backlog is replaced by a fresh
+        snapshot, and the await on send() is where this handler waits for it.
+        """
+        ready = asyncio.Event()
+        sub = await loop.run_in_executor(
+            self._executor, db_utils.kitchen_subscribe, req.query.get("station"),
+            lambda: loop.call_soon_threadsafe(ready.set))
+        disconnected = asyncio.ensure_future(self._disconnect(receive))
+        try:
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")]})
+            while not disconnected.done():
+                ready.clear()
+                events = sub.drain()
+                if events:
+                    chunk = b"".join(_sse("snapshot", data[0], data[1]).encode("utf-8") if kind == "snapshot"
+                                     else _ticket_frame(data) for kind, data in events)
+                else:
+                    woke = asyncio.ensure_future(ready.wait())
+                    done, _ = await asyncio.wait({woke, disconnected}, timeout=keepalive,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    woke.cancel()
+                    if done:
+                        continue
+                    chunk = b": keepalive\n\n"
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        finally:
+            sub.close()
+            disconnected.cancel()
+
+    @staticmethod
+    async def _disconnect(receive):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await asyncio.get_running_loop().run_in_executor(self._executor, db_utils.bootstrap)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                db_utils.flush_order_mirrors()
+                self._executor.shutdown(wait=True)
+                close_all_pools()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+app = App()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m api.server")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    args = ap.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("serving the API needs an ASGI server: pip install uvicorn "
+                         "(or point any ASGI server at api.server:app)")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,39 @@
-import os
 import streamlit as st
 from utils import db_utils
+from utils import metrics
 from ui import main_ui  
+from ui import menu_grid
 
-DB_PATH = "data/database.db"
+st.set_page_config(page_title="Restaurant Billing System", layout="wide")
 
-if not os.path.exists(DB_PATH):
-    db_utils.initialize_database()
-    db_utils.populate_menu_from_csv()
 
-st.set_page_config(page_title="Restaurant Billing System", layout="wide")
+@st.cache_resource(show_spinner=False)
+def reconcile_journals():
+    # once per server process: repair sample_bills.json / sales_report.csv after a crash
+    return db_utils.reconcile_order_journals()
+
+
+db_utils.bootstrap()  # migrations + first-run menu import; a no-op after the first run in this process
+reconcile_journals()
+metrics.start_textfile_writer()  # only when RBS_METRICS_FILE is set
 st.title("Restaurant Billing System")
 
 menu = ["Home", "Order", "Reports", "Admin"]
 choice = st.sidebar.selectbox("Menu", menu)
 
-if choice == "Home":
-    st.subheader("Menu")
+# one latency / statement-count observation per page rerun
+with metrics.page(choice):
+    if choice == "Home":
+        st.subheader("Menu")
 
-    # Load menu items from database
-    df = db_utils.load_menu_df()
+        # Cached menu; only re-read from the database after a menu edit
+        snapshot = db_utils.get_menu_snapshot()
 
-    if df.empty:
-        st.info("Menu is empty. Please add items from Admin panel.")
+        if not len(snapshot):
+            st.info("Menu is empty. Please add items from Admin panel.")
+        else:
+            menu_grid.render_menu_grid(snapshot, "home", menu_grid.home_card)
     else:
-        for _, row in df.iterrows():
-            col1, col2 = st.columns([1, 3])
-
-            # Build full image path
-            image_path = os.path.join("data/images", row["image"]) if row["image"] else None
-
-            if image_path and os.path.exists(image_path):
-                col1.image(image_path, width=100)
-            else:
-                col1.write("No image")
-
-            # Item details
-            col2.markdown(f"**{row['item_name']}**")
-            col2.markdown(f"Price: DA {row['price']:.2f}")
-
-            st.markdown("---")
-else:
-    main_ui.render(choice)
+        main_ui.render(choice)
 
 
@@ -0,0 +1,180 @@
+"""
+Load test for the HTTP API: sustained orders/second and latency percentiles.
+
+    python benchmarks/bench_api.py [--clients 16] [--duration 10] [--mix order|tab]
+    python benchmarks/bench_api.py --url http://127.0.0.1:8000 ...
+
+Without --url the ASGI app is driven in-process against a temp DB seeded
+with data/menu.csv (this measures routing, the worker pool and SQLite,
+not the network). With --url the clients are threads holding keep-alive
+HTTP connections to a running server (python -m api.server).
+
+mix "order": each iteration is one POST /orders with 1-4 random lines.
+mix "tab":   open a ticket, append three rounds, settle (5 requests per order).
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import db_utils  # noqa: E402
+
+
+def _lines(rng, item_ids):
+    return [{"item_id": rng.choice(item_ids), "quantity": rng.randint(1, 3)} for _ in range(rng.randint(1, 4))]
+
+
+def scenario(mix, rng, item_ids):
+    """The requests of one order as (method, path or callable(previous response), body) steps."""
+    if mix == "order":
+        return [("POST", "/orders", {"order_type": "Takeaway", "payment_mode": "Cash",
+                                     "items": _lines(rng, item_ids)})]
+    steps = [("POST", "/tickets", {"order_type": "Dine-In"})]
+    for _ in range(3):
+        steps.append(("POST", lambda r: f"/tickets/{r['order_id']}/items", {"items": _lines(rng, item_ids)}))
+    steps.append(("POST", lambda r: f"/tickets/{r['order_id']}/settle", {"payment_mode": "Card"}))
+    return steps
+
+
+def _run_steps(steps, request, latencies):
+    ticket = None
+    for method, path, body in steps:
+        if callable(path):
+            path = path(ticket)
+        t = time.perf_counter()
+        status, data = request(method, path, body)
+        latencies.append(time.perf_counter() - t)
+        if status >= 300:
+            raise RuntimeError(f"{method} {path} -> {status} {data[:200]!r}")
+        if path == "/tickets":
+            ticket = json.loads(data)
+
+
+# ------------------ in-process ------------------
+async def _asgi_request(app, method, path, body):
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {"type": "http", "method": method, "path": path, "query_string": b"",
+             "headers": [(b"content-type", b"application/json")]}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent[0]["status"], sent[1]["body"]
+
+
+async def _in_process(app, args, item_ids):
+    latencies, orders = [], [0]
+    deadline = time.perf_counter() + args.duration
+
+    async def client(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            ticket = None
+            for method, path, body in scenario(args.mix, rng, item_ids):
+                if callable(path):
+                    path = path(ticket)
+                t = time.perf_counter()
+                status, data = await _asgi_request(app, method, path, body)
+                latencies.append(time.perf_counter() - t)
+                if status >= 300:
+                    raise RuntimeError(f"{method} {path} -> {status} {data[:200]!r}")
+                if path == "/tickets":
+                    ticket = json.loads(data)
+            orders[0] += 1
+
+    t = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(args.clients)))
+    return orders[0], latencies, time.perf_counter() - t
+
+
+# ------------------ over HTTP ------------------
+def _over_http(args, item_ids):
+    url = urlsplit(args.url)
+    latencies, orders, lock = [], [0], threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        mine = []
+
+        def request(method, path, body):
+            conn.request(method, path, json.dumps(body), {"content-type": "application/json"})
+            resp = conn.getresponse()
+            return resp.status, resp.read()
+
+        done = 0
+        while time.perf_counter() < deadline:
+            _run_steps(scenario(args.mix, rng, item_ids), request, mine)
+            done += 1
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            orders[0] += done
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    t = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    return orders[0], latencies, time.perf_counter() - t
+
+
+def _percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", help="base URL of a running server; default: in-process app on a temp DB")
+    ap.add_argument("--clients", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--mix", choices=["order", "tab"], default="order")
+    args = ap.parse_args()
+
+    if args.url:
+        url = urlsplit(args.url)
+        conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        conn.request("GET", "/menu")
+        item_ids = [row["id"] for row in json.loads(conn.getresponse().read())]
+        conn.close()
+        orders, latencies, elapsed = _over_http(args, item_ids)
+    else:
+        from api.server import App
+
+        tmp = tempfile.mkdtemp()
+        db_utils.DB_PATH = os.path.join(tmp, "api.db")
+        db_utils.SAMPLE_BILLS_JSON = os.path.join(tmp, "sample_bills.json")
+        db_utils.SALES_CSV = os.path.join(tmp, "sales_report.csv")
+        db_utils.initialize_database()
+        db_utils.populate_menu_from_csv()
+        item_ids = [int(i) for i in db_utils.get_menu_snapshot().by_id]
+        orders, latencies, elapsed = asyncio.run(_in_process(App(), args, item_ids))
+        db_utils.flush_order_mirrors()
+        db_utils._pool().close_all()
+
+    latencies.sort()
+    print(f"{args.mix} mix, {args.clients} clients, {elapsed:.1f}s {'(' + args.url + ')' if args.url else '(in-process)'}")
+    print(f"orders       {orders:8d}   {orders / elapsed:8.1f} orders/s")
+    print(f"requests     {len(latencies):8d}   {len(latencies) / elapsed:8.1f} req/s")
+    print("latency ms   p50 {:.2f}  p95 {:.2f}  p99 {:.2f}  max {:.2f}".format(
+        *(1e3 * _percentile(latencies, q) for q in (0.5, 0.95, 0.99)), 1e3 * latencies[-1]))
+
+
+if __name__ == "__main__":
+    main()
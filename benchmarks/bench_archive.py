@@ -0,0 +1,66 @@
+"""
+Parquet archive: compaction speed and multi-year query latency.
+
+    python benchmarks/bench_archive.py [--lines 5000000] [--years 3]
+
+Seeds a synthetic history spread over --years, backfills the rollup,
+archives every closed day, then times the trend and top-item queries
+against the archive and against the SQLite tables they replace.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import db_utils, archive  # noqa: E402
+from bench_export import seed  # noqa: E402
+
+
+def timed(label, fn, repeat=5):
+    fn()
+    t = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    print(f"{label:40s} {(time.perf_counter() - t) / repeat * 1000:8.1f} ms")
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=5_000_000)
+    ap.add_argument("--years", type=int, default=3)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_utils.DB_PATH = os.path.join(tmp, "archive.db")
+        db_utils.ARCHIVE_DIR = os.path.join(tmp, "archive")
+        db_utils.initialize_database()
+        with db_utils._pool().connection() as conn:
+            seed(conn, args.lines, days=365 * args.years)
+        db_utils.rebuild_sales_rollup()
+
+        t = time.perf_counter()
+        result = db_utils.archive_closed_days()
+        print(f"archived {result['days']} days / {result['lines']} lines in {time.perf_counter() - t:.1f}s")
+
+        start, end = "2024-01-01", "2099-12-31"
+        with db_utils._pool().connection() as conn:
+            timed("trend by month, SQLite orders", lambda: conn.execute(
+                "SELECT substr(order_date, 1, 7), COUNT(*), SUM(total_amount) FROM orders GROUP BY 1").fetchall())
+            timed("top items, SQLite order_items", lambda: conn.execute(
+                "SELECT item_id, SUM(quantity) AS q FROM order_items GROUP BY item_id ORDER BY q DESC LIMIT 10"
+            ).fetchall(), repeat=1)
+        timed("trend by month, archive", lambda: archive.trend(db_utils.ARCHIVE_DIR, start, end, "month"))
+        timed("top items, archive", lambda: archive.top_items(db_utils.ARCHIVE_DIR, start, end))
+        timed("top items, one month, archive", lambda: archive.top_items(db_utils.ARCHIVE_DIR,
+                                                                         "2025-03-01", "2025-03-31"))
+        timed("get_sales_trend (archive + rollup)", lambda: db_utils.get_sales_trend(start, end, "month"))
+        timed("most_sold_items_df (archive + rollup)", lambda: db_utils.most_sold_items_df(None, 10, start, end))
+        db_utils._pool().close_all()
+
+
+if __name__ == "__main__":
+    main()
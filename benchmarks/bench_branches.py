@@ -0,0 +1,99 @@
+"""
+Multi-branch consolidation: initial and incremental sync, and the chain report.
+
+    python benchmarks/bench_branches.py [--branches 4] [--scale small] [--workers N] [--new-orders 200]
+
+Generates one synthetic shard per branch (benchmarks/workload.py, a
+different seed each), then times:
+
+- the first sync of every shard into an empty central store, with one
+  worker and with --workers (default: the CPU count). Parallel pulls
+  overlap with the single central writer, so expect a gain only on a
+  multi-core machine;
+- an incremental sync after --new-orders orders were placed in each shard;
+- a month of chain-wide figures from the central store, against reading
+  the same figures from every shard's own rollup.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import workload  # noqa: E402
+from utils import db_utils  # noqa: E402
+from utils.db_pool import close_all_pools  # noqa: E402
+
+
+def _fresh_central(path):
+    close_all_pools()
+    for p in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(p):
+            os.remove(p)
+    db_utils._central_ready.clear()
+
+
+def _timed(fn):
+    t = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t, result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--branches", type=int, default=4)
+    ap.add_argument("--scale", choices=sorted(workload.SCALES), default="small")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--new-orders", type=int, default=200, help="orders placed per shard before the incremental sync")
+    args = ap.parse_args()
+
+    base = tempfile.mkdtemp(prefix="rbs-branches-")
+    db_utils.SHARD_DIR = os.path.join(base, "none")  # shards are registered explicitly below
+    db_utils.MAIN_DB_PATH = os.path.join(base, "none.db")
+    db_utils.CENTRAL_DB_PATH = os.path.join(base, "central.db")
+    shards, total = {}, 0
+    for i in range(args.branches):
+        db_utils.BRANCH_ID = f"b{i + 1}"
+        counts = workload.generate(os.path.join(base, db_utils.BRANCH_ID), seed=i + 1, **workload.SCALES[args.scale])
+        shards[db_utils.BRANCH_ID] = (db_utils.DB_PATH, db_utils.SAMPLE_BILLS_JSON, db_utils.SALES_CSV)
+        total += counts["orders"]
+    print(f"{args.branches} shards, {total} orders in all ({args.scale}), {os.cpu_count()} CPUs")
+
+    for workers in sorted({1, args.workers}):
+        _fresh_central(db_utils.CENTRAL_DB_PATH)
+        for branch_id, (path, _, _) in shards.items():
+            db_utils.register_branch(branch_id, path)
+        seconds, result = _timed(lambda: db_utils.consolidate_branches(workers))
+        pulled = sum(result["orders"].values())
+        print(f"initial sync, {workers} worker(s): {seconds:6.2f} s  ({pulled / seconds:,.0f} orders/s)")
+
+    for branch_id, (path, bills, sales) in shards.items():
+        db_utils.BRANCH_ID, db_utils.DB_PATH, db_utils.SAMPLE_BILLS_JSON, db_utils.SALES_CSV = branch_id, path, bills, sales
+        item_ids = sorted(db_utils.get_menu_snapshot().by_id)
+        for k in range(args.new_orders):
+            db_utils.place_order("Takeaway", "Cash", [{"item_id": item_ids[k % len(item_ids)], "quantity": 1}])
+        db_utils.flush_order_mirrors()
+    seconds, result = _timed(lambda: db_utils.consolidate_branches(args.workers))
+    print(f"incremental sync: {sum(result['orders'].values())} orders in {seconds * 1000:.0f} ms")
+
+    end = workload.END_DATE.isoformat()
+    start = (workload.END_DATE.replace(day=1)).isoformat()
+    runs = 50
+    central, _ = _timed(lambda: [db_utils.get_chain_summary(start, end) for _ in range(runs)])
+
+    def per_shard():
+        for branch_id, (path, _, _) in shards.items():
+            db_utils.DB_PATH = path
+            db_utils.get_sales_summary(start, end)
+    shard_reads, _ = _timed(lambda: [per_shard() for _ in range(runs)])
+    print(f"chain month report: central store {central / runs * 1000:.2f} ms, "
+          f"every shard's rollup {shard_reads / runs * 1000:.2f} ms")
+    close_all_pools()
+    shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Orders/second for the bill calculator.
+
+    python benchmarks/bench_calculator.py [--orders 100000] [--lines 6]
+
+"loop" prices each order with the per-dict helpers (calculate_subtotal /
+calculate_gst / calculate_discount / calculate_total); "single" calls
+compute_bill() per order; "batch" prices every order in one compute_bills() call.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.calculator import (calculate_subtotal, calculate_gst, calculate_discount,  # noqa: E402
+                              calculate_total, compute_bill, compute_bills)
+
+
+def make_orders(n_orders, lines, seed=7):
+    rng = np.random.default_rng(seed)
+    n_lines = n_orders * lines
+    return {
+        "order_index": np.repeat(np.arange(n_orders), lines),
+        "prices": rng.choice([150.0, 250.0, 350.0, 499.99, 850.0, 1100.0, 1300.0], n_lines),
+        "quantities": rng.integers(1, 4, n_lines),
+        "gst_rates": rng.choice([5, 12, 18], n_lines),
+        "discount_types": rng.choice(["None", "Percentage", "Fixed amount"], n_orders),
+        "discount_values": rng.choice([0.0, 5.0, 10.0, 12.5], n_orders),
+    }
+
+
+def as_dicts(data, lines):
+    items = [{"price": p, "quantity": int(q), "gst": int(g)}
+             for p, q, g in zip(data["prices"].tolist(), data["quantities"], data["gst_rates"])]
+    return [items[i:i + lines] for i in range(0, len(items), lines)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--orders", type=int, default=100000)
+    ap.add_argument("--lines", type=int, default=6)
+    args = ap.parse_args()
+
+    data = make_orders(args.orders, args.lines)
+    orders = as_dicts(data, args.lines)
+    dtypes, dvalues = data["discount_types"].tolist(), data["discount_values"].tolist()
+    sample = min(len(orders), 20000)
+
+    t = time.perf_counter()
+    for items, dt, dv in zip(orders[:sample], dtypes, dvalues):
+        sub = calculate_subtotal(items)
+        gst = calculate_gst(sub, 5)
+        calculate_total(sub, gst, calculate_discount(sub, dt, dv))
+    loop = sample / (time.perf_counter() - t)
+
+    t = time.perf_counter()
+    for items, dt, dv in zip(orders[:sample], dtypes, dvalues):
+        compute_bill(items, dt, dv)
+    single = sample / (time.perf_counter() - t)
+
+    t = time.perf_counter()
+    compute_bills(data["order_index"], data["prices"], data["quantities"], data["gst_rates"],
+                  data["discount_types"], data["discount_values"], n_orders=args.orders)
+    batch = args.orders / (time.perf_counter() - t)
+
+    print(f"orders={args.orders} lines/order={args.lines}")
+    print(f"loop (legacy helpers, flat 5% GST): {loop:12.0f} orders/s")
+    print(f"compute_bill per order:             {single:12.0f} orders/s")
+    print(f"compute_bills batch:                {batch:12.0f} orders/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Connect-per-call vs pooled connections.
+
+    python benchmarks/bench_db_pool.py [--seconds 2] [--threads 4]
+
+"before" mirrors the old `_connect()` pattern (fresh sqlite3.connect per call,
+closed afterwards); "after" goes through utils.db_pool.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db_pool import ConnectionPool  # noqa: E402
+
+
+def _seed(path, items=30):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE menu (id INTEGER PRIMARY KEY, item_name TEXT, category TEXT, price REAL, gst INTEGER, image TEXT)")
+    conn.executemany("INSERT INTO menu (item_name, category, price, gst) VALUES (?, ?, ?, 5)",
+                     [(f"Item {i}", f"Cat {i % 5}", 100.0 + i) for i in range(items)])
+    conn.commit()
+    conn.close()
+
+
+def _query(conn):
+    conn.execute("SELECT * FROM menu ORDER BY category, item_name").fetchall()
+
+
+def run_before(path, deadline):
+    n = 0
+    while time.perf_counter() < deadline:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        _query(conn)
+        conn.close()
+        n += 1
+    return n
+
+
+def run_after(pool, deadline):
+    n = 0
+    while time.perf_counter() < deadline:
+        with pool.connection() as conn:
+            _query(conn)
+        n += 1
+    return n
+
+
+def _threaded(fn, arg, seconds, threads):
+    counts = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(i):
+        counts[i] = fn(arg, deadline)
+
+    ts = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return sum(counts) / seconds
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=2.0)
+    ap.add_argument("--threads", type=int, default=4)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        _seed(path)
+
+        before = _threaded(run_before, path, args.seconds, args.threads)
+        pool = ConnectionPool(path, size=args.threads)
+        after = _threaded(run_after, pool, args.seconds, args.threads)
+        stats = pool.stats()
+        pool.close_all()
+
+    print(f"threads={args.threads} seconds={args.seconds}")
+    print(f"before: {before:10.0f} queries/s  {before:10.0f} connections/s")
+    print(f"after:  {after:10.0f} queries/s  {stats['opened_total'] / args.seconds:10.1f} connections/s"
+          f"  ({stats['opened_total']} opened for {stats['checkouts']} checkouts)")
+    print(f"speedup: {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
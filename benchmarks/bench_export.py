@@ -0,0 +1,70 @@
+"""
+Streaming export throughput and peak memory.
+
+    python benchmarks/bench_export.py [--lines 10000000] [--formats csv,jsonl,parquet]
+
+Generates a synthetic orders/order_items DB in a temp dir (SQL-side, so
+setup itself stays in bounded memory), then exports every line item and
+reports rows/s and the process' peak RSS.
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import db_utils  # noqa: E402
+
+LINES_PER_ORDER = 4
+
+
+def seed(conn, lines, days=365):
+    orders = lines // LINES_PER_ORDER
+    conn.execute("BEGIN")
+    conn.execute("""
+        WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+        INSERT INTO orders (id, order_type, payment_mode, subtotal, gst_amount, discount_amount, total_amount, order_date)
+        SELECT i, CASE i % 3 WHEN 0 THEN 'Takeaway' ELSE 'Dine-In' END,
+               CASE i % 3 WHEN 0 THEN 'Cash' WHEN 1 THEN 'Card' ELSE 'UPI' END,
+               1000, 50, 0, 1050,
+               datetime('2024-01-01', '+' || (i * ? / ?) || ' seconds')
+        FROM n""", (orders, days * 86400, orders))
+    conn.execute("""
+        WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < ? - 1)
+        INSERT INTO order_items (order_id, item_id, quantity, item_name, category, unit_price, gst_rate)
+        SELECT i / ? + 1, i % 30 + 1, i % 3 + 1, 'Item ' || (i % 30 + 1), 'Category ' || (i % 5), 250.0, 5
+        FROM n""", (orders * LINES_PER_ORDER, LINES_PER_ORDER))
+    conn.execute("COMMIT")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=10_000_000)
+    ap.add_argument("--formats", default="csv,jsonl,parquet")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_utils.DB_PATH = os.path.join(tmp, "export.db")
+        db_utils.initialize_database()
+        t = time.perf_counter()
+        with db_utils._pool().connection() as conn:
+            seed(conn, args.lines)
+        print(f"seeded {args.lines} line items in {time.perf_counter() - t:.1f}s")
+
+        for fmt in args.formats.split(","):
+            dest = os.path.join(tmp, "out." + fmt)
+            t = time.perf_counter()
+            rows = db_utils.export_sales(dest, fmt)
+            dt = time.perf_counter() - t
+            rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print(f"{fmt:8s} {rows} rows in {dt:6.1f}s  {rows / dt:10.0f} rows/s  "
+                  f"{os.path.getsize(dest) / 1e6:8.1f} MB  peak RSS {rss_mb:.0f} MB")
+            os.remove(dest)
+        db_utils._pool().close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Kitchen display fan-out under load: hundreds of SSE screens, a steady
+stream of orders and a share of deliberately slow screens.
+
+    python benchmarks/bench_kitchen.py [--screens 400] [--rate 50] [--duration 10]
+                                       [--slow 0.1] [--slow-delay 1.0] [--buffer 64]
+
+Runs the ASGI app in-process on a temp DB seeded with data/menu.csv.
+Every screen opens GET /kitchen/stream (a third for all stations, the
+rest for one category each). A producer thread places orders at --rate
+per second. Each order's ticket events are timed from just before the
+order is placed to when a screen receives them. Slow screens sleep
+--slow-delay seconds in every send(), standing in for a stalled network
+write. They should show resyncs (snapshots) rather than unbounded queues,
+and should not move the fast screens' latency.
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import db_utils  # noqa: E402
+
+
+_ORDER_ID = re.compile(r'"order_id": (\d+)')
+
+
+class Screen:
+    def __init__(self, station, slow_delay):
+        self.station = station
+        self.slow_delay = slow_delay
+        self.received = {}  # order_id -> first time one of its tickets arrived
+        self.tickets = 0
+        self.snapshots = 0
+        self._partial = ""
+
+    async def send(self, message):
+        if message["type"] != "http.response.body":
+            return
+        now = time.perf_counter()
+        self._partial += message["body"].decode("utf-8")
+        *blocks, self._partial = self._partial.split("\n\n")
+        # the screens share the server's event loop, so they only pick out what is measured
+        for block in blocks:
+            if block.startswith("event: snapshot"):
+                self.snapshots += 1
+                for order_id in _ORDER_ID.findall(block):
+                    self.received.setdefault(int(order_id), now)
+            elif block.startswith("event: ticket"):
+                self.tickets += 1
+                if '"status": "new"' in block:
+                    self.received.setdefault(int(_ORDER_ID.search(block).group(1)), now)
+        if self.slow_delay:
+            await asyncio.sleep(self.slow_delay)
+
+
+async def _screen(app, screen, stop):
+    query = f"station={screen.station}".encode() if screen.station else b""
+    scope = {"type": "http", "method": "GET", "path": "/kitchen/stream", "query_string": query, "headers": []}
+    sent_request = False
+
+    async def receive():
+        nonlocal sent_request
+        if not sent_request:
+            sent_request = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await stop.wait()
+        return {"type": "http.disconnect"}
+
+    await app(scope, receive, screen.send)
+
+
+def _producer(args, item_ids, placed, stop_at):
+    rng = random.Random(7)
+    interval = 1.0 / args.rate
+    next_at = time.perf_counter()
+    while time.perf_counter() < stop_at:
+        lines = [{"item_id": rng.choice(item_ids), "quantity": rng.randint(1, 3)} for _ in range(rng.randint(1, 4))]
+        t = time.perf_counter()
+        order_id, _ = db_utils.place_order("Takeaway", "Cash", lines)
+        placed[order_id] = t
+        next_at += interval
+        time.sleep(max(0.0, next_at - time.perf_counter()))
+
+
+async def run(args, item_ids, categories):
+    from api.server import App
+
+    app = App()
+    stop = asyncio.Event()
+    placed = {}
+    rng = random.Random(1)
+    screens = []
+    for i in range(args.screens):
+        station = None if i % 3 == 0 else rng.choice(categories)
+        screens.append(Screen(station, args.slow_delay if rng.random() < args.slow else 0))
+    tasks = [asyncio.ensure_future(_screen(app, s, stop)) for s in screens]
+    await asyncio.sleep(1.0)  # let every screen subscribe and get its snapshot
+
+    # orders are committed from a worker thread, as the API's handlers would
+    loop = asyncio.get_running_loop()
+    t0 = time.perf_counter()
+    stop_at = t0 + args.duration
+    await loop.run_in_executor(None, _producer, args, item_ids, placed, stop_at)
+    elapsed = time.perf_counter() - t0
+    await asyncio.sleep(args.slow_delay + 1.0)  # drain
+    stop.set()
+    await asyncio.gather(*tasks)
+    return screens, placed, elapsed
+
+
+def _pct(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--screens", type=int, default=400)
+    ap.add_argument("--rate", type=float, default=50, help="orders per second")
+    ap.add_argument("--duration", type=float, default=10.0)
+    ap.add_argument("--slow", type=float, default=0.1, help="share of slow screens")
+    ap.add_argument("--slow-delay", type=float, default=1.0, help="seconds a slow screen spends in each send()")
+    ap.add_argument("--buffer", type=int, default=64, help="per-screen event buffer before a resync")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    db_utils.DB_PATH = os.path.join(tmp, "kitchen.db")
+    db_utils.SAMPLE_BILLS_JSON = os.path.join(tmp, "sample_bills.json")
+    db_utils.SALES_CSV = os.path.join(tmp, "sales_report.csv")
+    db_utils.initialize_database()
+    db_utils.populate_menu_from_csv()
+    db_utils._kitchen_hub.buffer = args.buffer
+    menu = db_utils.get_menu_snapshot()
+    item_ids = [int(i) for i in menu.by_id]
+
+    screens, placed, elapsed = asyncio.run(run(args, item_ids, menu.categories))
+    orders = len(placed)
+    db_utils.flush_order_mirrors()
+    db_utils._pool().close_all()
+
+    fast = sorted(t - placed[oid] for s in screens if not s.slow_delay for oid, t in s.received.items()
+                  if oid in placed)
+    slow = [s for s in screens if s.slow_delay]
+    print(f"{len(screens)} screens ({len(slow)} slow), {orders} orders in {elapsed:.1f}s "
+          f"({orders / elapsed:.0f}/s), buffer {args.buffer}")
+    print(f"ticket events delivered   {sum(s.tickets for s in screens):9d}")
+    # a fast screen for all stations must have seen every order
+    complete = [s for s in screens if s.station is None and not s.slow_delay]
+    missed = sum(len(set(placed) - set(s.received)) for s in complete)
+    print(f"all-station fast screens  {len(complete):9d}   orders never shown: {missed}")
+    print("fast screens latency ms   p50 {:.1f}  p99 {:.1f}  max {:.1f}".format(
+        *(1e3 * _pct(fast, q) for q in (0.5, 0.99)), 1e3 * (fast[-1] if fast else float("nan"))))
+    print(f"fast screen resyncs       {sum(s.snapshots - 1 for s in screens if not s.slow_delay):9d}")
+    if slow:
+        print(f"slow screens              {sum(s.tickets for s in slow)} events, "
+              f"{sum(s.snapshots - 1 for s in slow)} resync snapshots")
+    print(f"hub polls                 {db_utils._kitchen_hub.polls:9d}")
+    print(f"peak RSS                  {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} MB")
+
+
+if __name__ == "__main__":
+    main()
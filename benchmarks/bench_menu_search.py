@@ -0,0 +1,106 @@
+"""
+Menu search latency on a large generated menu.
+
+    python benchmarks/bench_menu_search.py [--items 10000] [--queries 2000]
+
+Builds a MenuIndex over --items generated items (2-4 word names drawn
+from common dish words plus a few thousand made-up ones, a few hundred
+categories), then times search() for exact, prefix, typo and two-word
+queries and a very common 3-letter prefix (hundreds of hits), then an
+incremental update after one item is edited, and the same prefix queries
+through SQLite FTS5 on a temp DB.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import menu_search  # noqa: E402
+from utils import migrations  # noqa: E402
+
+WORDS = ("chicken beef lamb paneer prawn fish tofu mushroom spinach potato tomato garlic butter cheese "
+         "masala tikka curry biryani kebab korma vindaloo tandoori grilled fried roasted spicy smoky "
+         "sweet sour lemon mango coconut honey chocolate vanilla caramel almond pistachio saffron "
+         "rice noodles pasta salad soup wrap burger pizza sandwich platter bowl skewer tart cake").split()
+
+
+def _vocabulary(rng, n=3000):
+    # a real large menu has thousands of distinct words (dish names, brands, regional terms)
+    syllables = ("ka ri ma no ta shi pa lo ve ru go ne zu ba mi da ko sa te li").split()
+    made = {"".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(n)}
+    return list(WORDS) + sorted(made)
+
+
+def _menu(n, rng, vocabulary):
+    categories = [f"{rng.choice(WORDS).title()} {rng.choice(('Specials', 'Classics', 'Bar', 'Grill'))}"
+                  for _ in range(300)]
+    return [{"id": i + 1, "item_name": " ".join(rng.choice(vocabulary).title() for _ in range(rng.randint(2, 4))),
+             "category": rng.choice(categories)} for i in range(n)]
+
+
+def _typo(word, rng):
+    i = rng.randrange(len(word))
+    return word[:i] + word[i + 1:] if rng.random() < 0.5 else word[:i] + rng.choice("aeiou") + word[i + 1:]
+
+
+def _time(fn, queries):
+    samples = []
+    for q in queries:
+        t = time.perf_counter()
+        fn(q)
+        samples.append(time.perf_counter() - t)
+    samples.sort()
+    return [1e6 * samples[min(len(samples) - 1, int(p * len(samples)))] for p in (0.5, 0.99)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=10000)
+    ap.add_argument("--queries", type=int, default=2000)
+    args = ap.parse_args()
+    rng = random.Random(3)
+    vocabulary = _vocabulary(rng)
+    rows = _menu(args.items, rng, vocabulary)
+
+    index = menu_search.MenuIndex()
+    t = time.perf_counter()
+    index.update(rows, 1)
+    build = time.perf_counter() - t
+
+    words = [rng.choice(vocabulary) for _ in range(args.queries)]
+    kinds = {
+        "exact": words,
+        "prefix": [w[:3] for w in words],
+        "typo": [_typo(w, rng) for w in words],
+        "two words": [f"{w} {rng.choice(WORDS)[:4]}" for w in words],
+        "common": [rng.choice(WORDS)[:3] for _ in words],
+    }
+    print(f"{args.items} items, {len(index._vocab)} distinct tokens, full build {build * 1e3:.0f} ms")
+    for kind, queries in kinds.items():
+        hits = sum(len(index.search(q, 50)) for q in queries[:100]) / 100
+        p50, p99 = _time(lambda q: index.search(q, 50), queries)
+        print(f"{kind:10s} p50 {p50:7.1f} us   p99 {p99:7.1f} us   ~{hits:.0f} hits (top 50)")
+
+    edited = dict(rows[0], item_name="Smoky Saffron Tart")
+    t = time.perf_counter()
+    changed = index.update([edited] + rows[1:], 2)
+    print(f"incremental update: {changed} item re-indexed in {(time.perf_counter() - t) * 1e3:.1f} ms")
+
+    path = os.path.join(tempfile.mkdtemp(), "menu.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE menu (id INTEGER PRIMARY KEY, item_name TEXT, category TEXT)")
+    conn.executemany("INSERT INTO menu VALUES (:id, :item_name, :category)", rows)
+    if migrations._m008_menu_search(conn.cursor(), {}):
+        conn.commit()
+        p50, p99 = _time(lambda q: menu_search.fts_search(conn, q, 50), kinds["prefix"])
+        print(f"{'fts5 prefix':10s} p50 {p50:7.1f} us   p99 {p99:7.1f} us")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
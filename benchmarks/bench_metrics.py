@@ -0,0 +1,105 @@
+"""
+Cost of the metrics instrumentation on a db_utils workload.
+
+    python benchmarks/bench_metrics.py [--blocks 40] [--iterations 25]
+
+One iteration is what an Order rerun plus a save does against the db
+layer: menu snapshot, menu search, tables, open tabs, one order, sales
+summary. Blocks of iterations alternate, in one process, between the
+instrumented functions on statement-counting connections and the
+unwrapped originals on plain connections, so disk and scheduler noise
+hits both sides alike. The median block of each is compared. Also prints
+the raw cost of one wrapped call and of counting one statement.
+(RBS_METRICS=0 skips the instrumentation altogether.)
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import db_pool, db_utils, metrics  # noqa: E402
+
+CALLS = ("get_menu_snapshot", "search_menu", "get_tables_df", "get_open_tickets", "place_order",
+         "get_sales_summary", "commit_order")
+
+
+def _instrumented(on, wrapped):
+    for name, fn in wrapped.items():
+        setattr(db_utils, name, fn if on else fn.__wrapped__)
+    # pooled connections pick their (statement-counting or plain) class when opened
+    metrics.ENABLED = on
+    db_pool.close_all_pools()
+    db_utils.get_version("menu")
+
+
+def _block(iterations, item_ids, offset):
+    start = time.perf_counter()
+    for i in range(iterations):
+        db_utils.get_menu_snapshot()
+        db_utils.search_menu("chick")
+        db_utils.get_tables_df()
+        db_utils.get_open_tickets()
+        db_utils.place_order("Takeaway", "Cash", [{"item_id": item_ids[(offset + i) % len(item_ids)], "quantity": 1}])
+        db_utils.get_sales_summary()
+    return (time.perf_counter() - start) / iterations
+
+
+def _micro():
+    def noop():
+        return None
+
+    wrapped, n = metrics.timed_call(noop, "noop"), 200000
+    t = time.perf_counter()
+    for _ in range(n):
+        noop()
+    bare = time.perf_counter() - t
+    t = time.perf_counter()
+    for _ in range(n):
+        wrapped()
+    print(f"wrapped call overhead     {(time.perf_counter() - t - bare) / n * 1e6:.2f} us")
+    t = time.perf_counter()
+    for _ in range(n):
+        metrics.count_statement()
+    print(f"statement count           {(time.perf_counter() - t) / n * 1e6:.2f} us")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--blocks", type=int, default=40)
+    ap.add_argument("--iterations", type=int, default=25)
+    args = ap.parse_args()
+    if not metrics.ENABLED:
+        sys.exit("RBS_METRICS=0: nothing to compare")
+
+    tmp = tempfile.mkdtemp()
+    db_utils.DB_PATH = os.path.join(tmp, "metrics.db")
+    db_utils.SAMPLE_BILLS_JSON = os.path.join(tmp, "sample_bills.json")
+    db_utils.SALES_CSV = os.path.join(tmp, "sales_report.csv")
+    db_utils.initialize_database()
+    db_utils.populate_menu_from_csv()
+    item_ids = sorted(db_utils.get_menu_snapshot().by_id)
+    wrapped = {name: getattr(db_utils, name) for name in CALLS}
+    _block(args.iterations, item_ids, 0)  # warm up caches and the pool
+
+    times = {True: [], False: []}
+    for b in range(args.blocks):
+        on = b % 2 == 0
+        _instrumented(on, wrapped)
+        times[on].append(_block(args.iterations, item_ids, b * args.iterations))
+    _instrumented(True, wrapped)
+    db_utils.flush_order_mirrors()
+
+    off, on = statistics.median(times[False]), statistics.median(times[True])
+    print(f"{args.blocks} blocks x {args.iterations} iterations, median block")
+    print(f"metrics off   {off * 1e3:8.3f} ms/iteration")
+    print(f"metrics on    {on * 1e3:8.3f} ms/iteration")
+    print(f"overhead      {100 * (on - off) / off:8.2f} %")
+    _micro()
+
+
+if __name__ == "__main__":
+    main()
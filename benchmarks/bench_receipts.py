@@ -0,0 +1,60 @@
+"""
+Receipt rendering: per-receipt latency, cached reprints and the
+end-of-day batch.
+
+    python benchmarks/bench_receipts.py [--orders 20000] [--workers N]
+
+Seeds one day of synthetic orders in a temp DB, then times a cold
+bill_to_pdf_bytes (fetch + render), a cached reprint, all three formats
+for one order, and archive_day_receipts serially and in the process pool.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import db_utils  # noqa: E402
+from bench_export import seed, LINES_PER_ORDER  # noqa: E402
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--orders", type=int, default=20000)
+    ap.add_argument("--workers", type=int)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_utils.DB_PATH = os.path.join(tmp, "receipts.db")
+        db_utils.initialize_database()
+        with db_utils._pool().connection() as conn:
+            seed(conn, args.orders * LINES_PER_ORDER, days=1)
+        ids = range(1, min(args.orders, 2000) + 1)
+
+        t = time.perf_counter()
+        for i in ids:
+            db_utils.bill_to_pdf_bytes(i)
+        print(f"cold pdf (fetch + render)   {(time.perf_counter() - t) / len(ids) * 1e3:7.3f} ms/receipt")
+        t = time.perf_counter()
+        for i in ids:
+            db_utils.bill_to_pdf_bytes(i)
+        print(f"cached reprint              {(time.perf_counter() - t) / len(ids) * 1e3:7.3f} ms/receipt")
+        t = time.perf_counter()
+        for i in ids:
+            db_utils.bill_to_csv_string(i)
+            db_utils.bill_to_json_str(i)
+        print(f"csv + json after the pdf    {(time.perf_counter() - t) / len(ids) * 1e3:7.3f} ms/receipt")
+
+        for workers in (1, args.workers):
+            t = time.perf_counter()
+            files, size = db_utils.archive_day_receipts("2024-01-01", os.path.join(tmp, f"out{workers}"), workers)
+            dt = time.perf_counter() - t
+            print(f"day batch, workers={workers or 'auto'}  {files} receipts in {dt:5.2f}s "
+                  f"({files / dt:6.0f}/s, {size / 1e6:.1f} MB)")
+        db_utils._pool().close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Report PDF throughput.
+
+    python benchmarks/bench_report_pdf.py [--rows 100000] [--target 500]
+
+Renders a synthetic sales DataFrame with report_df_to_pdf_bytes and
+prints rows/s and pages/s; exits non-zero if pages/s is below --target.
+The previous row-by-row drawString renderer is timed on a slice for
+comparison.
+"""
+import argparse
+import io
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import db_utils  # noqa: E402
+
+
+def frame(n):
+    i = np.arange(n)
+    names = np.array(["Vegetable Lasagna", "Garlic Bread", "Apple Pie", "Café crème", "Mint Tea (large)"])
+    df = pd.DataFrame({
+        "order_id": i // 4 + 1,
+        "order_date": pd.Timestamp("2025-01-01") + pd.to_timedelta(i * 37, unit="s"),
+        "order_type": np.where(i % 3, "Dine-In", "Takeaway"),
+        "payment_mode": np.array(["Cash", "Card", "UPI"])[i % 3],
+        "item_name": names[i % len(names)],
+        "category": np.array(["Main Course", "Side Dish", "Dessert", "Drink", "Drink"])[i % len(names)],
+        "price": (i % 20) * 50.0 + 200,
+        "quantity": i % 3 + 1,
+    })
+    df["line_total"] = df["price"] * df["quantity"]
+    df["order_date"] = df["order_date"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    return df
+
+
+def old_renderer(df, title="Report"):
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    width, height = A4
+    x, y = 40, height - 40
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(x, y, title)
+    y -= 25
+    c.setFont("Helvetica", 10)
+    for i, row in df.iterrows():
+        c.drawString(x, y, str(" | ".join([f"{col}: {row[col]}" for col in df.columns]))[:200])
+        y -= 14
+        if y < 60:
+            c.showPage()
+            y = height - 40
+    c.save()
+    return buf.getvalue()
+
+
+def pages(pdf):
+    return len(re.findall(rb"/Type /Page\b", pdf))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--target", type=float, default=500, help="minimum pages/s")
+    args = ap.parse_args()
+
+    df = frame(args.rows)
+    sample = df.head(min(args.rows, 10_000))
+    t = time.perf_counter()
+    old = old_renderer(sample)
+    dt = time.perf_counter() - t
+    print(f"old drawString renderer  {len(sample)} rows  {len(sample) / dt:9.0f} rows/s  {pages(old) / dt:7.1f} pages/s")
+
+    t = time.perf_counter()
+    pdf = db_utils.report_df_to_pdf_bytes(df, "Sales report", totals=["quantity", "line_total"])
+    dt = time.perf_counter() - t
+    rate = pages(pdf) / dt
+    print(f"report_pdf.TableReport   {len(df)} rows  {len(df) / dt:9.0f} rows/s  {rate:7.1f} pages/s  "
+          f"({pages(pdf)} pages, {len(pdf) / 1e6:.1f} MB, {dt:.2f}s)")
+    if rate < args.target:
+        print(f"FAIL: below target of {args.target:g} pages/s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
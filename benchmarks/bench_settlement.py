@@ -0,0 +1,78 @@
+"""
+End-of-day close: the live Daily report against the frozen settlement.
+
+    python benchmarks/bench_settlement.py [--scale medium] [--days 7] [--runs 50]
+
+On a synthetic restaurant (benchmarks/workload.py), for each of the last
+--days days, times:
+
+- the live path: get_sales_dataframe for the day, the payment mode and
+  order type groupbys, and report_df_to_pdf_bytes of the lines;
+- close_day: the one pass, rendering the CSV and PDF and freezing them;
+- viewing the closed day: get_settlement plus its stored PDF (best of --runs).
+
+The view should cost the same at every scale, however many orders the day had.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import workload  # noqa: E402
+from utils import db_utils  # noqa: E402
+
+
+def _timed(fn, runs=1):
+    best = float("inf")
+    for _ in range(runs):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def _live(day):
+    df = db_utils.get_sales_dataframe(day, day)
+    df.groupby("payment_mode")["line_total"].sum()
+    df.groupby("order_type")["line_total"].sum()
+    db_utils.report_df_to_pdf_bytes(df, title=f"Sales {day}", totals=["line_total"])
+
+
+def _view(day):
+    db_utils.get_settlement(day)
+    db_utils.get_settlement_document(day, "pdf")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scale", choices=sorted(workload.SCALES), default="medium")
+    ap.add_argument("--days", type=int, default=7)
+    ap.add_argument("--runs", type=int, default=50)
+    args = ap.parse_args()
+
+    base = tempfile.mkdtemp(prefix="rbs-settlement-")
+    counts = workload.generate(base, **workload.SCALES[args.scale])
+    print(f"{args.scale}: {counts['orders']} orders, {counts['lines']} lines "
+          f"(~{counts['orders'] // counts['days']} a day)")
+    days = [(workload.END_DATE - timedelta(days=i)).isoformat() for i in range(args.days)]
+    _live(days[-1])  # warm-up: imports pandas and reportlab
+
+    live = [_timed(lambda: _live(day)) for day in days]
+    close = [_timed(lambda: db_utils.close_day(day)) for day in days]
+    view = [_timed(lambda: _view(day), args.runs) for day in days]
+    orders = [db_utils.get_settlement(day)["orders"] for day in days]
+    for label, times in (("live daily report + PDF", live), ("close_day (once)", close),
+                         ("view closed day + PDF", view)):
+        print(f"{label:24s} mean {sum(times) / len(times) * 1000:8.2f} ms  max {max(times) * 1000:8.2f} ms")
+    print(f"orders per day: {min(orders)}..{max(orders)}")
+    db_utils._pool().close_all()
+    shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Check that pruning archived days from SQLite loses nothing the reports read.
+
+    python benchmarks/check_archive.py
+
+Builds a small synthetic restaurant (benchmarks/workload.py) in a temp
+dir, archives every day, prunes the first half of them from SQLite and
+exits non-zero if a report or export over the whole history (or a range
+straddling the prune mark) no longer matches what it gave before the prune,
+or if an order the central store has not consolidated yet was pruned.
+"""
+import io
+import os
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import workload  # noqa: E402
+from utils import archive, branches, db_utils  # noqa: E402
+
+PRUNE_BEFORE = "2025-06-15"
+
+
+def _totals():
+    totals, items = db_utils.get_sales_summary()
+    return totals["orders"], round(totals["total_amount"], 2), int(items["quantity"].sum())
+
+
+def _exports():
+    out = []
+    for fmt, start, end in (("csv", None, None), ("csv", "2025-06-10", "2025-06-20"), ("jsonl", None, None)):
+        buf, seen = io.BytesIO(), []
+        rows = db_utils.export_sales(buf, fmt, start, end, progress=lambda done, total: seen.append(total),
+                                     chunk_size=500)
+        out.append((rows, set(seen), buf.getvalue()))
+    return out
+
+
+def _unsynced(high_water):
+    with db_utils._pool().connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM orders WHERE sync_seq > ?", (high_water,)).fetchone()[0]
+
+
+def main():
+    if not archive.available():
+        sys.exit("the archive needs pyarrow (pip install pyarrow)")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workload.generate(tmp, **workload.SCALES["small"])
+        # this shard is consolidated into a central store of its own
+        db_utils.MAIN_DB_PATH = db_utils.DB_PATH
+        db_utils.SHARD_DIR = os.path.join(tmp, "branches")
+        db_utils.CENTRAL_DB_PATH = os.path.join(tmp, "central.db")
+        db_utils.register_branch(db_utils.BRANCH_ID, db_utils.DB_PATH)
+        before = _totals()
+        exports = _exports()
+        days = (date.today() - date.fromisoformat(PRUNE_BEFORE)).days
+
+        pruned = db_utils.archive_closed_days(prune_older_than=days)["pruned"]
+        results.append(("nothing pruned before the first consolidation", pruned == 0, pruned))
+        # consolidate only the first week's worth of orders (one batch)
+        with db_utils._pool().connection() as conn:
+            first_week = conn.execute("SELECT COUNT(*) FROM orders WHERE order_date < '2025-06-08'").fetchone()[0]
+        result = branches.pull((db_utils.BRANCH_ID, db_utils.DB_PATH, 0, first_week))
+        with db_utils._central().transaction() as conn:
+            branches.ingest(conn, result)
+        unsynced = _unsynced(result["high_water"])
+        db_utils.archive_closed_days(prune_older_than=days)
+        with db_utils._pool().connection() as conn:
+            mark = archive.get_mark(conn, archive.PRUNED_KEY)
+            first = conn.execute("SELECT MIN(order_date) FROM orders WHERE sync_seq > ?",
+                                 (result["high_water"],)).fetchone()[0]
+        results.append(("a partial consolidation prunes only consolidated days",
+                        _unsynced(result["high_water"]) == unsynced and mark and mark < first[:10],
+                        (mark, first, unsynced)))
+
+        db_utils.consolidate_branches()
+        db_utils.archive_closed_days(prune_older_than=days)
+        with db_utils._pool().connection() as conn:
+            mark = archive.get_mark(conn, archive.PRUNED_KEY)
+            left = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+        chain = db_utils.get_chain_summary()[0]["orders"]
+        results.append(("pruned through the day before PRUNE_BEFORE once consolidated",
+                        mark == "2025-06-14" and left < before[0] and chain == before[0], (mark, left, chain)))
+
+        results.append(("exports include the pruned days", _exports() == exports, None))
+        # after each action the whole-history figures must still match
+        for name, action in [
+            ("rollup kept after prune", lambda: None),
+            ("rollup kept after rebuild_sales_rollup", db_utils.rebuild_sales_rollup),
+            ("rollup kept after a ranged rebuild over pruned days",
+             lambda: db_utils.rebuild_sales_rollup("2025-06-01", "2025-06-30")),
+            ("rollup kept after recalculate_orders(apply=True)", lambda: db_utils.recalculate_orders(apply=True)),
+        ]:
+            action()
+            got = _totals()
+            results.append((name, got == before, got))
+        db_utils._pool().close_all()
+        db_utils._central().close_all()
+
+    print(f"orders, total, items sold: {before}")
+    for name, ok, detail in results:
+        print(f"{'ok  ' if ok else 'FAIL'} {name}" + ("" if ok else f": {detail}"))
+    sys.exit(0 if all(ok for _, ok, _ in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Assert that importing the data layer and the API stays cheap.
+
+    python benchmarks/check_import_time.py [--budget-ms 250] [--runs 3]
+
+Imports each module in a fresh interpreter under `python -X importtime`
+and exits non-zero if its cumulative import time (best of --runs) is over
+the budget, or if it pulled in a library that should only load on
+demand: pandas (reports), fpdf and reportlab (PDF exports), pyarrow (the
+sales archive) or Pillow (thumbnails). numpy is allowed, every bill is
+priced with it. Also prints how long a fresh process takes to import
+api.server and bootstrap a new database, i.e. until it can take orders.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["utils.db_utils", "api.server"]
+ON_DEMAND = ["pandas", "fpdf", "reportlab", "pyarrow", "PIL"]
+READY = """
+import os, sys
+from api import server
+from utils import db_utils
+db_utils.DB_PATH = os.path.join(sys.argv[1], "restaurant.db")
+db_utils.SAMPLE_BILLS_JSON = os.path.join(sys.argv[1], "sample_bills.json")
+db_utils.SALES_CSV = os.path.join(sys.argv[1], "sales_report.csv")
+db_utils.THUMB_DIR = os.path.join(sys.argv[1], "thumbnails")
+db_utils.bootstrap()
+"""
+
+
+def import_times(module):
+    """{module: cumulative microseconds} for one import of `module` in a fresh interpreter."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:"):
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():  # skips the header line
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+def _ready_seconds():
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", READY, tmp], cwd=ROOT, check=True)
+        return time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget-ms", type=float, default=250.0, help="cumulative import time allowed per module")
+    ap.add_argument("--runs", type=int, default=3, help="fresh interpreters per module; the fastest counts")
+    args = ap.parse_args()
+
+    failed = 0
+    for module in MODULES:
+        runs = [import_times(module) for _ in range(args.runs)]
+        best = min(runs, key=lambda t: t[module])
+        ms = best[module] / 1000
+        heavy = sorted({name.split(".")[0] for name in best} & set(ON_DEMAND))
+        ok = ms <= args.budget_ms and not heavy
+        failed += not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {module:16s} {ms:7.1f} ms (budget {args.budget_ms:.0f} ms)"
+              + (f"  loads {', '.join(heavy)}" if heavy else ""))
+        if not ok:
+            for name, us in sorted(best.items(), key=lambda kv: -kv[1])[1:8]:
+                print(f"       {name:40s} {us / 1000:7.1f} ms")
+    print(f"fresh process to a bootstrapped DB: {_ready_seconds() * 1000:.0f} ms")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Assert the report and bill queries are served by the schema indexes.
+
+    python benchmarks/check_query_plans.py
+
+Builds a fresh migrated DB in a temp dir, runs EXPLAIN QUERY PLAN on the
+hot queries (the report and bill SQL is taken from db_utils) and exits
+non-zero if any of them falls back to a full scan.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import db_utils  # noqa: E402
+
+# the report and bill checks use the SQL get_sales_dataframe and fetch_order_details run
+SALES_SQL, SALES_PARAMS = db_utils._sales_query("2025-01-01", "2025-01-31")
+
+CHECKS = [
+    ("sales report by date range",
+     SALES_SQL,
+     SALES_PARAMS,
+     ["idx_orders_order_date", "idx_order_items_order_id"]),
+    ("bill header", db_utils._ORDER_SQL, (1,), ["INTEGER PRIMARY KEY"]),
+    ("bill lines", db_utils._ORDER_LINES_SQL, (1,), ["idx_order_items_order_id"]),
+    ("items sold per menu item",
+     "SELECT SUM(quantity) FROM order_items WHERE item_id = ?",
+     (1,),
+     ["idx_order_items_item_id"]),
+    ("available tables",
+     "SELECT id, name FROM tables WHERE status = ?",
+     ("available",),
+     ["idx_tables_status"]),
+]
+
+
+def main():
+    failed = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db_utils.DB_PATH = os.path.join(tmp, "plans.db")
+        db_utils.initialize_database()
+        with db_utils._pool().connection() as conn:
+            conn.execute("ANALYZE")
+            for name, sql, params, indexes in CHECKS:
+                plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+                missing = [ix for ix in indexes if not any(ix in step for step in plan)]
+                ok = not missing
+                failed += not ok
+                print(f"{'ok  ' if ok else 'FAIL'} {name}")
+                for step in plan:
+                    print(f"       {step}")
+        db_utils._pool().close_all()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
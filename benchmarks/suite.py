@@ -0,0 +1,282 @@
+"""
+Benchmark suite over a synthetic restaurant (benchmarks/workload.py).
+
+    python -m benchmarks.suite [--scale small|medium|large] [--threads 8] [--cases save_order,sales]
+                               [--min-time 1.0] [--out results.json]
+                               [--compare baseline.json] [--threshold 0.15]
+
+Each case calls db_utils / calculator functions directly, either from one
+thread or from --threads threads at once ("x8" in the name). A case runs
+until --min-time seconds and at least --min-ops calls have passed, after
+one warm-up call. Every case draws its inputs from its own seeded RNG,
+the data is generated fresh for every run, and the cases that write
+(save_order, mixed) run after all the read cases, so runs on the same
+commit, scale and seed are comparable.
+
+Results are printed and, with --out, written as JSON:
+
+    {"meta": {"commit", "python", "sqlite", "scale": {...}, ...},
+     "results": {case: {"ops", "seconds", "ops_per_s", "mean_ms", "p50_ms", "p95_ms", "p99_ms"}}}
+
+--compare reads an earlier results file. Any case whose --metric (p50_ms
+by default) grew by more than --threshold (15%) is listed as a
+regression, and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import workload  # noqa: E402
+from utils import db_utils  # noqa: E402
+from utils.calculator import compute_bill, compute_bills  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CASES = []
+
+
+def case(name, threads=1):
+    """Register fn(ctx, rng) -> op; op() is one timed call. threads=None: --threads."""
+    def register(fn):
+        CASES.append((name, threads, fn))
+        return fn
+    return register
+
+
+class Context:
+    def __init__(self, counts):
+        self.counts = counts
+        menu = db_utils.get_menu_snapshot()
+        self.items = [menu.by_id[i] for i in sorted(menu.by_id)]
+        with db_utils._pool().connection() as conn:
+            self.last_day, self.order_ids = conn.execute(
+                "SELECT substr(MAX(order_date), 1, 10), MAX(id) FROM orders").fetchone()
+        self.month_start = str(np.datetime64(self.last_day) - np.timedelta64(29, "D"))
+
+    def lines(self, rng):
+        picks = rng.choice(len(self.items), size=int(rng.integers(1, 7)))
+        return [{"item_id": int(self.items[i]["id"]), "name": self.items[i]["item_name"],
+                 "price": float(self.items[i]["price"]), "quantity": int(rng.integers(1, 4)),
+                 "gst": int(self.items[i]["gst"]), "category": self.items[i]["category"]} for i in picks]
+
+
+# ------------------ cases ------------------
+@case("calc.compute_bill")
+def _compute_bill(ctx, rng):
+    orders = [ctx.lines(rng) for _ in range(256)]
+    state = {"i": 0}
+
+    def op():
+        state["i"] += 1
+        compute_bill(orders[state["i"] % 256], "Percentage", 10)
+    return op
+
+
+@case("calc.compute_bills_10k")
+def _compute_bills(ctx, rng):
+    n_orders, lines = 10000, 4
+    prices = np.array([it["price"] for it in ctx.items])
+    gst = np.array([it["gst"] for it in ctx.items])
+    items = rng.choice(len(prices), n_orders * lines)
+    order_index = np.repeat(np.arange(n_orders), lines)
+    quantities = rng.integers(1, 4, n_orders * lines)
+    return lambda: compute_bills(order_index, prices[items], quantities, gst[items], n_orders=n_orders)
+
+
+@case("db.sales_dataframe_month")
+def _sales_month(ctx, rng):
+    return lambda: db_utils.get_sales_dataframe(ctx.month_start, ctx.last_day)
+
+
+@case("db.sales_dataframe_all")
+def _sales_all(ctx, rng):
+    return lambda: db_utils.get_sales_dataframe()
+
+
+@case("db.most_sold_items_month")
+def _most_sold(ctx, rng):
+    return lambda: db_utils.most_sold_items_df(top_n=10, start_date=ctx.month_start, end_date=ctx.last_day)
+
+
+@case("db.sales_summary_all")
+def _summary(ctx, rng):
+    return lambda: db_utils.get_sales_summary()
+
+
+@case("db.bill_to_pdf_bytes_cold")
+def _pdf(ctx, rng):
+    def op():
+        db_utils._receipt_cache.invalidate()
+        db_utils.bill_to_pdf_bytes(int(rng.integers(1, ctx.order_ids + 1)))
+    return op
+
+
+@case("db.search_menu")
+def _search(ctx, rng):
+    words = [it["item_name"].split()[int(rng.integers(0, 2))][:4] for it in ctx.items[:500]]
+    return lambda: db_utils.search_menu(words[int(rng.integers(0, len(words)))])
+
+
+def _save_order(ctx, rng):
+    def op():
+        items = ctx.lines(rng)
+        bill = compute_bill(items)
+        db_utils.save_order("Takeaway", str(rng.choice(["Cash", "Card", "UPI"])), bill["subtotal"],
+                            bill["gst_amount"], bill["discount_amount"], bill["total"], items)
+    return op
+
+
+case("db.save_order")(_save_order)
+case("db.save_order", threads=None)(_save_order)
+
+
+def _mixed(ctx, rng):
+    # a service rush: mostly orders, with table board, menu and dashboard reads in between
+    save = _save_order(ctx, rng)
+    reads = (db_utils.get_tables_df, db_utils.get_menu_snapshot, db_utils.get_open_tickets,
+             lambda: db_utils.get_sales_summary(ctx.last_day, ctx.last_day))
+
+    def op():
+        r = rng.random()
+        if r < 0.5:
+            save()
+        else:
+            reads[int((r - 0.5) * 8)]()
+    return op
+
+
+case("db.mixed", threads=None)(_mixed)
+
+
+# ------------------ runner ------------------
+def _run(op_factory, threads, min_time, min_ops):
+    latencies = [[] for _ in range(threads)]
+    ops = [op_factory(t) for t in range(threads)]
+    for op in ops:
+        op()  # warm-up
+
+    start_gate = threading.Barrier(threads)
+
+    def worker(t):
+        op, mine = ops[t], latencies[t]
+        start_gate.wait()
+        deadline = time.perf_counter() + min_time
+        while True:
+            t0 = time.perf_counter()
+            op()
+            t1 = time.perf_counter()
+            mine.append(t1 - t0)
+            if t1 >= deadline and len(mine) * threads >= min_ops:
+                break
+
+    t0 = time.perf_counter()
+    if threads == 1:
+        worker(0)
+    else:
+        pool = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+        for th in pool:
+            th.start()
+        for th in pool:
+            th.join()
+    elapsed = time.perf_counter() - t0
+    lat = np.sort(np.concatenate([np.array(x) for x in latencies]))
+    return {"ops": int(len(lat)), "seconds": round(elapsed, 4), "ops_per_s": round(len(lat) / elapsed, 2),
+            "mean_ms": round(1e3 * float(lat.mean()), 4),
+            **{f"p{q}_ms": round(1e3 * float(np.percentile(lat, q)), 4) for q in (50, 95, 99)}}
+
+
+def _meta(args, params, counts):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"commit": commit, "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "numpy": np.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count(), "scale": args.scale,
+            "params": params, "data": counts, "threads": args.threads, "min_time": args.min_time}
+
+
+def compare(results, baseline, metric="p50_ms"):
+    """[(case, baseline value, current value, relative change)] for the cases in both runs."""
+    rows = []
+    for name, current in results["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before and before.get(metric):
+            rows.append((name, before[metric], current[metric], current[metric] / before[metric] - 1))
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scale", choices=sorted(workload.SCALES), default="small")
+    for key in ("items", "tables", "days", "orders_per_day"):
+        ap.add_argument("--" + key.replace("_", "-"), type=int, help=f"override the scale's {key}")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--threads", type=int, default=8, help="threads for the concurrent cases")
+    ap.add_argument("--cases", help="comma-separated substrings; run only matching cases")
+    ap.add_argument("--min-time", type=float, default=1.0, help="seconds per case")
+    ap.add_argument("--min-ops", type=int, default=5)
+    ap.add_argument("--dir", help="data directory (default: a temp dir)")
+    ap.add_argument("--out", help="write results JSON here")
+    ap.add_argument("--compare", help="baseline results JSON")
+    ap.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown before a case fails")
+    ap.add_argument("--metric", default="p50_ms", choices=["p50_ms", "p95_ms", "p99_ms", "mean_ms"])
+    args = ap.parse_args()
+
+    params = dict(workload.SCALES[args.scale])
+    params.update({k: getattr(args, k) for k in params if getattr(args, k) is not None})
+    t = time.perf_counter()
+    counts = workload.generate(args.dir or tempfile.mkdtemp(prefix="rbs-bench-"), seed=args.seed, **params)
+    print(f"{args.scale}: {counts['orders']} orders, {counts['lines']} lines, {counts['items']} items "
+          f"({time.perf_counter() - t:.1f}s to generate)")
+    ctx = Context(counts)
+
+    selected = [c for c in CASES if not args.cases or any(p in c[0] for p in args.cases.split(","))]
+    results = {"meta": _meta(args, params, counts), "results": {}}
+    for index, (name, threads, factory) in enumerate(selected):
+        threads = threads or args.threads
+        label = f"{name} x{threads}" if threads > 1 else name
+        seed = args.seed * 1000 + index
+        r = _run(lambda t: factory(ctx, np.random.default_rng([seed, t])), threads, args.min_time, args.min_ops)
+        results["results"][label] = r
+        print(f"{label:32s} {r['ops']:7d} ops {r['ops_per_s']:10.1f}/s   "
+              f"p50 {r['p50_ms']:9.3f}  p95 {r['p95_ms']:9.3f}  p99 {r['p99_ms']:9.3f} ms")
+    db_utils.flush_order_mirrors()
+    db_utils._pool().close_all()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("params") != params:
+            print(f"note: baseline was run with {baseline.get('meta', {}).get('params')}")
+        rows = compare(results, baseline, args.metric)
+        regressions = [r for r in rows if r[3] > args.threshold]
+        print(f"\n{args.metric} vs {args.compare} (commit {baseline.get('meta', {}).get('commit')}), "
+              f"threshold +{args.threshold:.0%}")
+        for name, before, after, change in rows:
+            flag = "REGRESSION" if change > args.threshold else ""
+            print(f"{name:32s} {before:9.3f} -> {after:9.3f}  {change:+7.1%}  {flag}")
+        if regressions:
+            print(f"{len(regressions)} case(s) slower than +{args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Synthetic restaurant data for benchmarks, reproducible from a seed.
+
+    python -m benchmarks.workload --dir /tmp/rbs-bench [--scale medium] [--seed 1]
+
+generate() points db_utils at a fresh DB in `directory` and fills it with:
+
+- a menu of `items` dishes over a dozen categories, with category price
+  bands and GST rates (drinks 18%, a few 12% items, the rest 5%);
+- `tables` dine-in tables;
+- `days` days of closed orders ending on END_DATE, about `orders_per_day`
+  a day (more on Friday-Sunday). Order times follow a lunch peak around
+  13:00 and a dinner peak around 20:30. Item popularity is Zipf-like, so a
+  few dishes dominate like on a real menu. Orders have 1-6 lines and
+  10% carry a discount. Bills are priced with calculator.compute_bills, as
+  the app prices them.
+
+Everything is drawn from numpy's seeded generator and dated from a fixed
+end date, so the same arguments give the same database on any machine.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import db_utils  # noqa: E402
+from utils.calculator import compute_bills  # noqa: E402
+
+END_DATE = date(2025, 6, 30)
+SCALES = {
+    "small": {"items": 100, "tables": 10, "days": 30, "orders_per_day": 80},
+    "medium": {"items": 1000, "tables": 30, "days": 90, "orders_per_day": 300},
+    "large": {"items": 10000, "tables": 60, "days": 180, "orders_per_day": 800},
+}
+
+# category -> (price low, price high, GST %)
+CATEGORIES = {
+    "Starter": (350, 900, 5), "Soup": (300, 650, 5), "Salad": (400, 850, 5), "Main Course": (850, 1900, 5),
+    "Grill": (1100, 2600, 5), "Pasta": (800, 1500, 5), "Pizza": (750, 1600, 5), "Rice": (450, 950, 5),
+    "Bread": (150, 400, 5), "Side Dish": (250, 600, 5), "Dessert": (400, 900, 12), "Drink": (200, 700, 18),
+}
+DISHES = ("Chicken Lamb Beef Prawn Salmon Paneer Tofu Mushroom Spinach Aubergine Lentil Chickpea Halloumi "
+          "Duck Calamari Falafel Potato Pumpkin Tomato Mozzarella").split()
+STYLES = ("Grilled Roasted Spicy Smoked Crispy Creamy Tandoori Garlic Lemon Herb Chili Honey Saffron Harissa "
+          "Pesto Truffle Masala Teriyaki BBQ Rustic").split()
+PAYMENT_MODES = (("Cash", 0.45), ("Card", 0.4), ("UPI", 0.15))
+DINE_IN_SHARE = 0.6
+DISCOUNT_SHARE = 0.1
+WEEKDAY_FACTOR = (0.85, 0.8, 0.85, 0.95, 1.2, 1.35, 1.25)  # Monday .. Sunday
+
+
+def use_directory(directory):
+    """Point db_utils (DB and mirror files) at `directory`; returns the DB path."""
+    os.makedirs(directory, exist_ok=True)
+    db_utils.DB_PATH = os.path.join(directory, "restaurant.db")
+    db_utils.SAMPLE_BILLS_JSON = os.path.join(directory, "sample_bills.json")
+    db_utils.SALES_CSV = os.path.join(directory, "sales_report.csv")
+    db_utils.ARCHIVE_DIR = os.path.join(directory, "archive")
+    db_utils.RECEIPTS_DIR = os.path.join(directory, "receipts")
+    db_utils.THUMB_DIR = os.path.join(directory, "thumbnails")
+    return db_utils.DB_PATH
+
+
+def make_menu(rng, items):
+    names = list(CATEGORIES)
+    rows, seen = [], set()
+    for i in range(items):
+        category = names[i % len(names)]
+        low, high, gst = CATEGORIES[category]
+        name = f"{rng.choice(STYLES)} {rng.choice(DISHES)} {category.split()[0]}"
+        if name in seen:
+            name = f"{name} No. {i}"
+        seen.add(name)
+        price = float(round(rng.uniform(low, high) / 10) * 10)
+        rows.append((name, category, price, 12 if gst == 5 and rng.random() < 0.05 else gst, f"SKU-{i + 1:05d}"))
+    return rows
+
+
+def _order_times(rng, day, n):
+    # two peaks plus a thin all-day trickle, in seconds after opening at 11:00
+    peak = rng.choice(3, size=n, p=[0.42, 0.5, 0.08])
+    minutes = np.where(peak == 0, rng.normal(13 * 60, 50, n),
+                       np.where(peak == 1, rng.normal(20.5 * 60, 65, n), rng.uniform(11 * 60, 23 * 60, n)))
+    seconds = np.clip(minutes * 60 + rng.uniform(0, 60, n), 11 * 3600, 23 * 3600 - 1).astype(np.int64)
+    seconds.sort()
+    base = np.datetime64(day.isoformat())
+    return (base + seconds.astype("timedelta64[s]")).astype(str)
+
+
+def make_orders(rng, menu, tables, days, orders_per_day, end=END_DATE):
+    """Column arrays for orders and their lines (numpy), priced with compute_bills."""
+    n_items = len(menu)
+    prices = np.array([m[2] for m in menu])
+    gst = np.array([m[3] for m in menu])
+    popularity = 1.0 / np.arange(1, n_items + 1) ** 0.9
+    popularity = rng.permutation(popularity / popularity.sum())
+
+    dates = []
+    for d in range(days):
+        day = end - timedelta(days=days - 1 - d)
+        n = rng.poisson(orders_per_day * WEEKDAY_FACTOR[day.weekday()])
+        dates.append(_order_times(rng, day, n))
+    order_date = np.concatenate(dates)
+    n_orders = len(order_date)
+
+    lines_per_order = np.minimum(rng.geometric(0.4, n_orders), 6)
+    order_index = np.repeat(np.arange(n_orders), lines_per_order)
+    item_index = rng.choice(n_items, size=len(order_index), p=popularity)
+    quantity = rng.choice([1, 2, 3], size=len(order_index), p=[0.7, 0.22, 0.08])
+
+    discounted = rng.random(n_orders) < DISCOUNT_SHARE
+    percentage = rng.random(n_orders) < 0.7
+    discount_types = np.where(discounted, np.where(percentage, "Percentage", "Fixed amount"), "None")
+    discount_values = np.where(discounted, np.where(percentage, rng.choice([5, 10, 15], n_orders), 100.0), 0.0)
+    bills = compute_bills(order_index, prices[item_index], quantity, gst[item_index],
+                          discount_types, discount_values, n_orders=n_orders)
+
+    dine_in = rng.random(n_orders) < DINE_IN_SHARE
+    modes, weights = zip(*PAYMENT_MODES)
+    return {
+        "order_date": order_date,
+        "order_type": np.where(dine_in, "Dine-In", "Takeaway"),
+        "table_id": np.where(dine_in, rng.integers(1, tables + 1, n_orders), 0) if tables else np.zeros(n_orders, int),
+        "payment_mode": rng.choice(modes, n_orders, p=weights),
+        "subtotal": bills["subtotal"], "gst_amount": bills["gst_amount"],
+        "discount_amount": bills["discount_amount"], "total": bills["total"],
+        "line_order": order_index, "line_item": item_index, "line_quantity": quantity,
+    }
+
+
+def generate(directory, items=1000, tables=30, days=90, orders_per_day=300, seed=1):
+    """Create and fill a fresh DB in `directory`; db_utils is left pointing at it. Returns counts."""
+    path = use_directory(directory)
+    for p in (path, path + "-wal", path + "-shm", db_utils.SAMPLE_BILLS_JSON, db_utils.SALES_CSV):
+        if os.path.exists(p):
+            os.remove(p)
+    db_utils.initialize_database()
+    rng = np.random.default_rng(seed)
+    menu = make_menu(rng, items)
+    data = make_orders(rng, menu, tables, days, orders_per_day)
+    n_orders = len(data["order_date"])
+
+    with db_utils._pool().transaction() as conn:
+        conn.executemany("INSERT INTO menu (id, item_name, category, price, gst, sku) VALUES (?, ?, ?, ?, ?, ?)",
+                         [(i + 1,) + m for i, m in enumerate(menu)])
+        conn.executemany("INSERT INTO tables (id, name, capacity) VALUES (?, ?, ?)",
+                         [(t, f"T{t}", int(rng.choice([2, 4, 6]))) for t in range(1, tables + 1)])
+        conn.executemany("""INSERT INTO orders (id, order_type, table_id, payment_mode, subtotal, gst_amount,
+                                                discount_amount, total_amount, order_date, opened_at, status)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'closed')""",
+                         ((i + 1, data["order_type"][i], int(data["table_id"][i]) or None, data["payment_mode"][i],
+                           float(data["subtotal"][i]), float(data["gst_amount"][i]),
+                           float(data["discount_amount"][i]), float(data["total"][i]),
+                           data["order_date"][i].replace("T", " "), data["order_date"][i].replace("T", " "))
+                          for i in range(n_orders)))
+        conn.executemany("""INSERT INTO order_items (order_id, item_id, quantity, item_name, category, unit_price,
+                                                     gst_rate) VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                         ((int(o) + 1, int(m) + 1, int(q), menu[m][0], menu[m][1], menu[m][2], menu[m][3])
+                          for o, m, q in zip(data["line_order"], data["line_item"], data["line_quantity"])))
+        for key in ("menu", "tables"):
+            db_utils._bump_version(conn, key)
+    db_utils.rebuild_sales_rollup()
+    return {"items": items, "tables": tables, "days": days, "orders": n_orders,
+            "lines": int(len(data["line_order"])), "seed": seed}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate a synthetic restaurant database.")
+    ap.add_argument("--dir", required=True, help="directory for restaurant.db (replaced if present)")
+    ap.add_argument("--scale", choices=sorted(SCALES), default="medium")
+    for key in ("items", "tables", "days", "orders_per_day"):
+        ap.add_argument("--" + key.replace("_", "-"), type=int, help=f"override the scale's {key}")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    params = dict(SCALES[args.scale])
+    params.update({k: getattr(args, k) for k in params if getattr(args, k) is not None})
+
+    t = time.perf_counter()
+    counts = generate(args.dir, seed=args.seed, **params)
+    db_utils._pool().close_all()
+    print(f"{counts['orders']} orders, {counts['lines']} lines, {counts['items']} menu items, "
+          f"{counts['tables']} tables over {counts['days']} days -> {db_utils.DB_PATH} "
+          f"({time.perf_counter() - t:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,14 @@ import streamlit as st
 from datetime import datetime, timedelta
 import pandas as pd
 import os
+import tempfile
 from utils import db_utils
-from utils.calculator import calculate_subtotal, calculate_gst, calculate_discount, calculate_total
+from utils import metrics
+from utils import archive
+from ui.menu_grid import render_menu_grid, admin_card
+from utils.calculator import compute_bill
 
+MAX_MENU_ROWS = 200  # number_inputs rendered per run; the search narrows anything bigger
 
 def show_clock():
     st.sidebar.markdown(f"### 🕒 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -14,24 +19,34 @@ def page_order():
     st.header("Place Order")
     show_clock()
 
-    menu_df = db_utils.load_menu_df()
-    if menu_df.empty:
+    menu = db_utils.get_menu_snapshot()
+    if not len(menu):
         st.warning("Menu is empty. Please import menu.csv from DB Setup or add items in Admin.")
         return
 
+    # messages from the button callbacks below (they run before this rerun)
+    for kind in ("error", "success"):
+        msg = st.session_state.pop(f"order_{kind}", None)
+        if msg:
+            getattr(st, kind)(msg)
+
     # Table management
     st.sidebar.header("Table Management")
     tables_df = db_utils.get_tables_df()
-    if not tables_df.empty:
-        for _, row in tables_df.iterrows():
-            status = row["status"]
-            color = "🟢" if status == "available" else ("🔴" if status == "occupied" else "🟠")
-            st.sidebar.markdown(
-             f"{color} **{row['name']}** — {status} "
-             f"{'(Order #'+str(int(row['current_order_id']))+')' if pd.notna(row['current_order_id']) else ''}"
-)
-
-
+    # occupied -> cleaning -> available; both are compare-and-set, a stale click just reports the conflict
+    next_status = {"occupied": ("cleaning", "Clear"), "cleaning": ("available", "Ready")}
+    for row in tables_df.itertuples(index=False):
+        status = row.status
+        color = "🟢" if status == "available" else ("🔴" if status == "occupied" else "🟠")
+        c1, c2 = st.sidebar.columns([3, 1])
+        c1.markdown(
+            f"{color} **{row.name}** — {status} "
+            f"{'(Order #'+str(int(row.current_order_id))+')' if pd.notna(row.current_order_id) else ''}"
+        )
+        if status in next_status:
+            new_status, label = next_status[status]
+            c2.button(label, key=f"table_{row.id}_{status}", on_click=_order_action,
+                      args=(db_utils.set_table_status, row.id, new_status))
 
     # Order type and payment
     order_type = st.radio("Order type", ["Dine-In", "Takeaway"], horizontal=True)
@@ -46,10 +61,26 @@ def page_order():
         else:
             st.warning("No available tables.")
 
-    # Menu
+    # Running tabs: open tickets that take rounds of items until they are settled
+    tab_id = _running_tabs(tables_df, order_type, payment_mode, selected_table_id)
+
+    # Menu: only the items matching the search / category are rendered; quantities live in the cart
     st.subheader("Menu")
-    categories = menu_df["category"].unique()
-    selected_items = []
+    cart = st.session_state.setdefault("cart", {})
+    c1, c2 = st.columns([3, 1])
+    query = c1.text_input("Search menu", key="menu_query", placeholder="Item or category, e.g. chiken tik")
+    category = c2.selectbox("Category", ["All"] + menu.categories, key="menu_category")
+    if query.strip():
+        rows = [r for r in db_utils.search_menu(query, limit=None) if category == "All" or r["category"] == category]
+    elif category == "All":
+        rows = menu.rows
+    else:
+        rows = menu.by_category[category]
+    if len(rows) > MAX_MENU_ROWS:
+        st.caption(f"Showing {MAX_MENU_ROWS} of {len(rows)} items — search to narrow down.")
+        rows = rows[:MAX_MENU_ROWS]
+    elif query.strip() and not rows:
+        st.info("No menu item matches that search.")
 
     # Column headers
     col1_header, col2_header, col3_header = st.columns([1, 4, 1])
@@ -57,71 +88,166 @@ def page_order():
     col2_header.markdown("**Item**")
     col3_header.markdown("**Quantity**")
 
+    for row in rows:
+        item_id = int(row["id"])
+        col1, col2, col3 = st.columns([1, 4, 1])
+        with col2:
+            price_str = f"{row['price']:.2f}".rstrip('0').rstrip('.')  # remove .00 if unnecessary
+            st.markdown(f"**{row['item_name']}**")
+            st.caption(f"{row['category']} • {price_str} DA • GST {int(row['gst'])}%")
+        with col3:
+            key = f"quantity_{item_id}"
+            if key not in st.session_state:
+                # filtered out on an earlier run: restore what is in the cart
+                st.session_state[key] = cart.get(item_id, 0)
+            st.number_input(label="", min_value=0, step=1, key=key, on_change=_set_quantity, args=(item_id,))
 
-    for cat in categories:
-        st.markdown(f"**{cat}**")
-        cat_items = menu_df[menu_df["category"] == cat]
-        for _, row in cat_items.iterrows():
-            col1, col2, col3 = st.columns([1, 4, 1])
-
-            with col2:
-                price_str = f"{row['price']:.2f}".rstrip('0').rstrip('.')  # remove .00 if unnecessary
-                st.markdown(f"**{row['item_name']}**")
-                st.caption(f"{row['category']} • {price_str} DA • GST {int(row['gst'])}%")
-            with col3:
-                quantity = st.number_input( label="", min_value=0, step=1, value=0, key=f"quantity_{int(row['id'])}"  
-            )
-
-                    
-                
-                if quantity > 0:
-                    selected_items.append({
-                        "item_id": int(row["id"]),
-                        "name": row["item_name"],
-                        "price": float(row["price"]),
-                        "quantity": int(quantity),
-                        "gst": int(row["gst"]),
-                        "category": row["category"]
-                    })
+    selected_items = []
+    for item_id, quantity in cart.items():
+        row = menu.by_id.get(item_id)
+        if row is not None and quantity > 0:
+            selected_items.append({
+                "item_id": item_id,
+                "name": row["item_name"],
+                "price": float(row["price"]),
+                "quantity": int(quantity),
+                "gst": int(row["gst"]),
+                "category": row["category"]
+            })
 
     if not selected_items:
         st.info("Select items and quantities to build the order.")
+        _receipt_downloads()
         return
 
-    # Summary
     st.subheader("Order Summary")
-    summary_df = pd.DataFrame(selected_items)
-    summary_df["line_total"] = summary_df["price"] * summary_df["quantity"]
-    summary_df_display = summary_df.rename(columns={"name": "Item", "price": "Price", "quantity": "Qty", "line_total": "Total"})
-    st.table(summary_df_display)
-
-    subtotal = calculate_subtotal(selected_items)
-    gst_amount = calculate_gst(subtotal, gst_rate=5)
-
     discount_type = st.selectbox("Discount type", ["None", "Percentage", "Fixed amount"])
-    discount_amount = 0.0
+    discount_value = 0.0
     if discount_type == "Percentage":
-        pct = st.number_input("Discount (%)", min_value=0.0, max_value=100.0, value=0.0)
-        discount_amount = calculate_discount(subtotal, "Percentage", pct)
+        discount_value = st.number_input("Discount (%)", min_value=0.0, max_value=100.0, value=0.0)
     elif discount_type == "Fixed amount":
-        amt = st.number_input("Discount amount (DA)", min_value=0.0, value=0.0)
-        discount_amount = calculate_discount(subtotal, "Fixed amount", amt)
+        discount_value = st.number_input("Discount amount (DA)", min_value=0.0, value=0.0)
 
-    total = calculate_total(subtotal, gst_amount, discount_amount)
+    # one pass over the order: line totals, per-rate GST, discount and total
+    bill = compute_bill(selected_items, discount_type, discount_value)
+    subtotal, gst_amount = bill["subtotal"], bill["gst_amount"]
+    discount_amount, total = bill["discount_amount"], bill["total"]
+
+    summary_df = pd.DataFrame(selected_items)
+    summary_df["line_total"] = bill["line_totals"]
+    summary_df_display = summary_df.rename(columns={"name": "Item", "price": "Price", "quantity": "Qty", "line_total": "Total"})
+    st.table(summary_df_display)
 
     st.write(f"Subtotal: **{subtotal:.2f} DA**")
-    st.write(f"GST (5%): **{gst_amount:.2f} DA**")
+    for bucket in bill["gst_breakdown"]:
+        st.write(f"GST ({bucket['rate']:g}%): **{bucket['gst']:.2f} DA**")
     if discount_amount > 0:
         st.write(f"Discount: **-{discount_amount:.2f} DA**")
     st.write(f"Total: **{total:.2f} DA**")
 
+    if tab_id is not None:
+        st.button(f"Add to tab #{tab_id}", on_click=_add_round, args=(tab_id, selected_items))
+
     if st.button("Confirm & Save Order"):
-        order_id = db_utils.save_order(
-            order_type, payment_mode, subtotal, gst_amount, discount_amount, total, selected_items, table_id=selected_table_id
-        )
-        st.success(f"Order saved with ID #{order_id}")
-        if order_type == "Dine-In" and selected_table_id:
-            db_utils.update_table_status(selected_table_id, "occupied", current_order_id=order_id)
+        # order, lines and table occupancy are committed together
+        try:
+            order_id = db_utils.commit_order(
+                order_type, payment_mode, subtotal, gst_amount, discount_amount, total, selected_items,
+                table_id=selected_table_id if order_type == "Dine-In" else None
+            )
+        except db_utils.TableConflict:
+            st.error("That table was just taken by another order. Pick another table; nothing was saved.")
+        else:
+            st.success(f"Order saved with ID #{order_id}")
+            st.session_state["last_order_id"] = order_id
+
+    _receipt_downloads()
+
+def _receipt_downloads():
+    last_id = st.session_state.get("last_order_id")
+    if last_id:
+        # one fetch serves all three formats; repeat downloads come from the receipt cache
+        st.caption(f"Receipt for order #{last_id}")
+        c1, c2, c3 = st.columns(3)
+        c1.download_button("PDF", db_utils.bill_to_pdf_bytes(last_id), file_name=f"receipt_{last_id}.pdf",
+                           mime="application/pdf", key="receipt_pdf")
+        c2.download_button("CSV", db_utils.bill_to_csv_string(last_id), file_name=f"receipt_{last_id}.csv",
+                           mime="text/csv", key="receipt_csv")
+        c3.download_button("JSON", db_utils.bill_to_json_str(last_id), file_name=f"receipt_{last_id}.json",
+                           mime="application/json", key="receipt_json")
+
+def _order_action(fn, *args):
+    # button callback: a lost race is reported on the rerun instead of raising
+    try:
+        return fn(*args)
+    except (db_utils.TableConflict, db_utils.TicketClosed) as e:
+        st.session_state["order_error"] = f"Not saved: {e}."
+
+def _set_quantity(item_id):
+    quantity = int(st.session_state.get(f"quantity_{item_id}") or 0)
+    cart = st.session_state.setdefault("cart", {})
+    if quantity > 0:
+        cart[item_id] = quantity
+    else:
+        cart.pop(item_id, None)
+
+def _add_round(tab_id, items):
+    if _order_action(db_utils.add_to_ticket, tab_id, items) is not None:
+        # start the next round from empty quantities
+        st.session_state["cart"] = {}
+        for key in [k for k in st.session_state if str(k).startswith("quantity_")]:
+            st.session_state[key] = 0
+
+def _open_tab(order_type, table_id):
+    order_id = _order_action(db_utils.open_ticket, order_type, table_id)
+    if order_id is not None:
+        st.session_state["tab_id"] = order_id
+
+def _settle_tab(tab_id, payment_mode):
+    total = _order_action(db_utils.settle_ticket, tab_id, payment_mode,
+                          st.session_state["settle_dtype"], st.session_state["settle_dvalue"])
+    if total is not None:
+        st.session_state["order_success"] = f"Tab #{tab_id} settled: {total:.2f} DA"
+        st.session_state["last_order_id"] = tab_id
+        st.session_state.pop("tab_id", None)
+
+def _running_tabs(tables_df, order_type, payment_mode, table_id):
+    """Open-tab picker, lines with void buttons and the settle form; returns the selected tab id or None."""
+    st.subheader("Running tabs")
+    names = dict(zip(tables_df["id"], tables_df["name"]))
+    if order_type == "Dine-In" and table_id is not None:
+        st.button(f"Open tab on {names.get(table_id)}", on_click=_open_tab, args=(order_type, table_id))
+
+    open_df = db_utils.get_open_tickets()
+    if open_df.empty:
+        st.caption("No open tabs.")
+        return None
+    ids = [int(i) for i in open_df["order_id"]]
+    # labels stay stable while the tab grows, so the picker keeps its selection
+    labels = [f"#{int(r.order_id)} — {names.get(r.table_id, r.order_type)}" for r in open_df.itertuples(index=False)]
+    current = st.session_state.get("tab_id")
+    label = st.selectbox("Tab", labels, index=ids.index(current) if current in ids else 0)
+    tab_id = ids[labels.index(label)]
+    st.session_state["tab_id"] = tab_id
+
+    lines = db_utils.get_ticket_lines(tab_id)
+    running = open_df[open_df["order_id"] == tab_id].iloc[0]
+    st.write(f"Running total: **{running['total_amount']:.2f} DA** "
+             f"(subtotal {running['subtotal']:.2f} + GST {running['gst_amount']:.2f})")
+    with st.expander(f"Tab #{tab_id}: {len(lines)} lines", expanded=False):
+        for line in lines.itertuples(index=False):
+            c1, c2 = st.columns([5, 1])
+            c1.write(f"{line.quantity} × {line.item_name} @ {line.unit_price:.2f} DA")
+            c2.button("Void", key=f"void_{line.line_id}", on_click=_order_action,
+                      args=(db_utils.void_ticket_line, tab_id, line.line_id))
+
+    with st.form(f"settle_{tab_id}"):
+        st.selectbox("Discount type", ["None", "Percentage", "Fixed amount"], key="settle_dtype")
+        st.number_input("Discount (% or DA)", min_value=0.0, value=0.0, key="settle_dvalue")
+        st.form_submit_button(f"Settle tab #{tab_id} ({payment_mode})", on_click=_settle_tab,
+                              args=(tab_id, payment_mode))
+    return tab_id
+
 
 # ------------------ REPORTS PAGE ------------------
 def page_reports():
@@ -129,7 +255,7 @@ def page_reports():
     today = datetime.now().date()
     period = st.selectbox("Select period", ["Daily", "Weekly", "Monthly", "Custom Range"])
     if period == "Daily":
-        start = end = today
+        start = end = st.date_input("Day", value=today)
     elif period == "Weekly":
         start, end = today - timedelta(days=7), today
     elif period == "Monthly":
@@ -138,40 +264,179 @@ def page_reports():
         start = st.date_input("Start date", value=today - timedelta(days=7))
         end = st.date_input("End date", value=today)
 
-    df = db_utils.get_sales_dataframe(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
-    if df.empty:
+    start_s, end_s = start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+    if db_utils.chain_available():
+        scope = st.radio("Scope", [f"This branch ({db_utils.BRANCH_ID})", "All branches"], horizontal=True)
+        if scope == "All branches":
+            _chain_reports(start_s, end_s)
+            return
+    if period == "Daily":
+        record = db_utils.get_settlement(start_s)
+        if record:
+            # a closed day is read from its frozen Z-report, not recomputed
+            _settlement_view(record)
+            return
+        st.button(f"Close {start_s} (Z-report)", on_click=_close_day, args=(start_s,), disabled=start > today)
+        error = st.session_state.pop("settlement_error", None)
+        if error:
+            st.error(error)
+    # pre-aggregated daily rollup: a few rows per day instead of every line item
+    totals, items_df = db_utils.get_sales_summary(start_s, end_s)
+    if not totals["orders"]:
         st.info("No sales in selected period.")
         return
 
-    st.metric("Total sales (DA)", f"{df['line_total'].sum():.2f}")
-    st.metric("Total orders", int(df["order_id"].nunique()))
-    st.subheader("Sales items")
-    st.dataframe(df[["order_id","order_date","item_name","category","quantity","price","line_total"]])
+    st.metric("Total sales (DA)", f"{items_df['revenue'].sum():.2f}")
+    st.metric("Total orders", int(totals["orders"]))
+    st.subheader("Sales by item")
+    st.dataframe(items_df.rename(columns={"revenue": "line_total"}), hide_index=True)
 
-    ms = db_utils.most_sold_items_df(df, top_n=20)
+    if st.checkbox("Show individual line items"):
+        df = db_utils.get_sales_dataframe(start_s, end_s)
+        st.dataframe(df[["order_id","order_date","item_name","category","quantity","price","line_total"]])
+
+    if end > start:
+        # closed days come from the Parquet archive, recent ones from the rollup
+        period = "day" if (end - start).days <= 62 else "month"
+        trend = db_utils.get_sales_trend(start_s, end_s, period)
+        if len(trend) > 1:
+            st.subheader("Sales trend")
+            st.line_chart(trend.set_index("period")["total_amount"])
+
+    ms = db_utils.most_sold_items_df(None, top_n=20, start_date=start_s, end_date=end_s)
     if not ms.empty:
         st.subheader("Most sold items")
         st.table(ms.rename(columns={"item_name":"Item","quantity":"Quantity"}))
 
+    st.subheader("Export")
+    # parquet is only offered when pyarrow is installed
+    formats = [f for f in ["csv", "jsonl", "parquet", "pdf"] if f != "parquet" or archive.available()]
+    fmt = st.selectbox("Format", formats, key="export_format")
+    if st.button("Prepare export"):
+        # streamed to a temp file in chunks instead of building the whole report in memory
+        bar = st.progress(0.0)
+        # one temp file per export, so sessions exporting at the same time never share a path
+        previous = st.session_state.pop("export_file", None)
+        if previous and os.path.exists(previous[0]):
+            os.unlink(previous[0])
+        name = f"sales_{start_s}_{end_s}.{fmt}"
+        with tempfile.NamedTemporaryFile(prefix="sales_", suffix=f".{fmt}", delete=False) as tmp:
+            path = tmp.name
+        try:
+            rows = db_utils.export_sales(path, fmt, start_s, end_s,
+                                         progress=lambda done, total: bar.progress(min(done / max(total, 1), 1.0)))
+            st.session_state["export_file"] = (path, name, rows)
+        except RuntimeError as e:
+            os.unlink(path)
+            st.error(str(e))
+    if st.session_state.get("export_file"):
+        path, name, rows = st.session_state["export_file"]
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                st.download_button(f"Download {name} ({rows} rows)", f, file_name=name)
+
+def _close_day(day):
+    try:
+        db_utils.close_day(day)
+    except ValueError as e:
+        st.session_state["settlement_error"] = str(e)
+
+
+def _settlement_view(s):
+    day = s["day"]
+    st.caption(f"Day closed at {s['closed_at']}; the figures below are its settlement record.")
+    if s["late_orders"]:
+        st.warning(f"{s['late_orders']} order(s) were recorded for {day} after it was closed "
+                   "and are not in the Z-report.")
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Total collected (DA)", f"{s['total_amount']:.2f}")
+    c2.metric("Total orders", s["orders"])
+    c3.metric("GST (DA)", f"{s['gst_amount']:.2f}")
+    c4.metric("Discounts (DA)", f"{s['discount_amount']:.2f}", f"{s['discounts']['orders']} orders", delta_color="off")
+    st.subheader("By payment mode")
+    st.dataframe(pd.DataFrame(s["payment_modes"]), hide_index=True)
+    st.subheader("By order type")
+    st.dataframe(pd.DataFrame(s["order_types"]), hide_index=True)
+    st.subheader("GST by rate")
+    st.dataframe(pd.DataFrame(s["gst_rates"]), hide_index=True)
+    if s["voids"]["lines"]:
+        st.caption(f"Voids: {s['voids']['quantity']} items on {s['voids']['lines']} lines, "
+                   f"{s['voids']['amount']:.2f} DA")
+    if s["top_items"]:
+        st.subheader("Most sold items")
+        st.table(pd.DataFrame(s["top_items"]).rename(columns={"item_name": "Item", "category": "Category",
+                                                              "quantity": "Quantity", "revenue": "Revenue"}))
+    c1, c2 = st.columns(2)
+    c1.download_button("Z-report PDF", db_utils.get_settlement_document(day, "pdf"), file_name=f"z_report_{day}.pdf",
+                       mime="application/pdf")
+    c2.download_button("Z-report CSV", db_utils.get_settlement_document(day, "csv"), file_name=f"z_report_{day}.csv",
+                       mime="text/csv")
+
+
+def _sync_branches():
+    result = db_utils.consolidate_branches()
+    st.session_state["branch_sync"] = result
+
+
+def _chain_reports(start_s, end_s):
+    # read from the central store: per branch x day rollups, never the shards themselves
+    status = db_utils.get_branch_status()
+    synced = status["synced_at"].dropna()
+    st.caption(f"{len(status)} branches, consolidated up to {synced.min() if len(synced) else 'never'}")
+    st.button("Sync branches now", on_click=_sync_branches)
+    result = st.session_state.pop("branch_sync", None)
+    if result:
+        st.success(f"{sum(result['orders'].values())} new orders consolidated.")
+    for row in status[status["last_error"].notna()].itertuples():
+        st.warning(f"Branch {row.branch_id}: {row.last_error}")
+
+    totals, per_branch = db_utils.get_chain_summary(start_s, end_s)
+    if not totals["orders"]:
+        st.info("No consolidated sales in selected period.")
+        return
+    st.metric("Chain sales (DA)", f"{totals['total_amount']:.2f}")
+    st.metric("Chain orders", totals["orders"])
+    st.subheader("Sales by branch")
+    per_branch["share"] = (per_branch["total_amount"] / totals["total_amount"]).map("{:.1%}".format)
+    st.dataframe(per_branch, hide_index=True)
+
+    if end_s > start_s:
+        trend = db_utils.get_chain_trend(start_s, end_s)
+        if len(trend) > 1:
+            st.subheader("Daily sales by branch")
+            st.line_chart(trend)
+
+    branch = st.selectbox("Most sold items for", ["All branches"] + per_branch["branch_id"].tolist())
+    top = db_utils.get_chain_top_items(start_s, end_s, 20, None if branch == "All branches" else branch)
+    if not top.empty:
+        st.subheader("Most sold items")
+        st.table(top.rename(columns={"item_name": "Item", "quantity": "Quantity", "revenue": "Revenue"}))
+
 # ------------------ ADMIN PAGE ------------------
 
 def page_admin():
     st.header("Admin - Manage Menu and Tables")
 
     st.subheader("Menu")
-    menu_df = db_utils.load_menu_df()
-    if not menu_df.empty:
-        menu_df_display = menu_df.copy()
-        menu_df_display["price"] = menu_df_display["price"].apply(lambda x: f"{x:.2f}".rstrip('0').rstrip('.'))
-      
-        for _, row in menu_df_display.iterrows():
-            col1, col2, col3, col4 = st.columns([1, 3, 2, 2])
-            col1.write(int(row["id"]))  # ID first
-            col2.write(row["item_name"])
-            col3.write(row["category"])
-            col4.write(f"{row['price']} DA")
-            if row.get("image") and os.path.exists(row["image"]):
-                st.image(row["image"], width=80)
+    menu = db_utils.get_menu_snapshot()
+    menu_df = menu.df
+    if len(menu):
+        render_menu_grid(menu, "admin", admin_card, columns=4)
+
+    with st.expander("Bulk import / price-list sync (CSV)"):
+        st.caption("Columns: item_name, category, price, gst, image, sku (optional). "
+                   "Rows are matched by sku, else by name; only changed rows are written.")
+        upload = st.file_uploader("Menu CSV", type=["csv"], key="menu_csv_upload")
+        if upload is not None and st.button("Import CSV", key="menu_csv_import"):
+            with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as tmp:
+                tmp.write(upload.getvalue())
+            try:
+                result = db_utils.import_menu_csv(tmp.name)
+            finally:
+                os.unlink(tmp.name)
+            st.success(f"{result['inserted']} added, {result['updated']} updated, {result['unchanged']} unchanged.")
+            for line, msg in result["errors"][:20]:
+                st.error(f"Line {line}: {msg}")
 
     # Initialize action state
     if "action" not in st.session_state:
@@ -270,6 +535,33 @@ def page_admin():
             else:
                 st.error("Please enter a table name.")
 
+    # hidden: open the Admin page with ?diagnostics=1
+    if "diagnostics" in st.experimental_get_query_params():
+        _diagnostics_panel()
+
+def _diagnostics_panel():
+    st.subheader("Diagnostics")
+    st.caption("This server process since start. The same data in Prometheus format: "
+               "GET /metrics on the API, or the file named by RBS_METRICS_FILE.")
+    if not metrics.ENABLED:
+        st.info("Instrumentation is off (RBS_METRICS=0).")
+        return
+    pages = pd.DataFrame(metrics.summary(metrics.PAGE_RENDER, scale=1e3))
+    if not pages.empty:
+        statements = {r["page"]: r["mean"] for r in metrics.summary(metrics.PAGE_STATEMENTS)}
+        pages["statements/rerun"] = pages["page"].map(statements)
+        st.markdown("**Page renders (ms)**")
+        st.dataframe(pages.drop(columns="total").round(2), hide_index=True)
+    calls = pd.DataFrame(metrics.summary(metrics.DB_CALL, scale=1e3))
+    if not calls.empty:
+        calls["rows"] = calls["fn"].map(lambda fn: metrics.DB_ROWS.labels(fn).value)
+        calls["errors"] = calls["fn"].map(lambda fn: metrics.DB_ERRORS.labels(fn).value)
+        st.markdown("**db_utils calls (ms), by total time**")
+        st.dataframe(calls.rename(columns={"total": "total s"}).round(3), hide_index=True)
+    text = metrics.render()
+    st.code("\n".join(line for line in text.splitlines() if not line.startswith("#") and "_bucket" not in line))
+    st.download_button("Download metrics.prom", text, file_name="metrics.prom", mime="text/plain")
+
 
 
 # ------------------ RENDER ------------------
@@ -0,0 +1,63 @@
+import math
+import os
+import streamlit as st
+from utils import db_utils
+from utils import thumbnails
+
+PAGE_SIZES = [6, 12, 24, 48]
+DEFAULT_PAGE_SIZE = int(os.environ.get("RBS_MENU_PAGE_SIZE", "12"))
+
+
+def _page_controls(menu, key):
+    c1, c2, c3 = st.columns([2, 1, 1])
+    category = c1.selectbox("Category", ["All"] + menu.categories, key=f"{key}_category")
+    rows = menu.rows if category == "All" else menu.by_category[category]
+
+    sizes = sorted(set(PAGE_SIZES + [DEFAULT_PAGE_SIZE]))
+    page_size = c2.selectbox("Items per page", sizes, index=sizes.index(DEFAULT_PAGE_SIZE), key=f"{key}_page_size")
+    pages = max(1, math.ceil(len(rows) / page_size))
+    page = int(c3.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page"))
+    page = min(page, pages)
+    first = (page - 1) * page_size
+    return rows[first:first + page_size], first, len(rows), page, pages
+
+
+def render_menu_grid(menu, key, render_item, columns=3):
+    """
+    Category-filtered, paginated grid over a MenuSnapshot.
+
+    Only the current page is rendered: widget count and image bytes per
+    rerun depend on the page size, not on the menu size.
+    render_item(container, row) draws one cell.
+    """
+    visible, first, total, page, pages = _page_controls(menu, key)
+    if not visible:
+        st.info("No items in this category.")
+        return
+    for start in range(0, len(visible), columns):
+        cells = st.columns(columns)
+        for cell, row in zip(cells, visible[start:start + columns]):
+            render_item(cell, row)
+    st.caption(f"Showing {first + 1}–{first + len(visible)} of {total} items · page {page} of {pages}")
+
+
+def _image(cell, row, width):
+    # pre-sized thumbnail bytes instead of the full-size photo; original file as fallback
+    cell.image(thumbnails.thumbnail_bytes(row["image_path"], width, db_utils.THUMB_DIR) or row["image_path"], width=width)
+
+
+def home_card(cell, row):
+    if row["image_path"]:
+        _image(cell, row, 100)
+    else:
+        cell.write("No image")
+    cell.markdown(f"**{row['item_name']}**")
+    cell.markdown(f"Price: DA {row['price']:.2f}")
+
+
+def admin_card(cell, row):
+    price_str = f"{row['price']:.2f}".rstrip('0').rstrip('.')
+    cell.markdown(f"**#{int(row['id'])} {row['item_name']}**")
+    cell.caption(f"{row['category']} • {price_str} DA • GST {int(row['gst'])}%")
+    if row["image_path"]:
+        _image(cell, row, 80)
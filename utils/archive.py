@@ -0,0 +1,402 @@
+"""
+Columnar archive of closed sales days.
+
+Every closed day (before today) is written to a date-partitioned Parquet
+file of its own; once a month is over its day files are merged into one
+file per month, so multi-year scans open a few dozen files, not thousands:
+
+    data/archive/{orders,lines}/month=YYYY-MM/YYYY-MM-DD.parquet   (current month)
+    data/archive/{orders,lines}/month=YYYY-MM/YYYY-MM.parquet      (closed months)
+
+The last archived day is kept in app_meta ('archive_through', YYYYMMDD).
+Queries go through pyarrow.dataset, so month directories outside the
+requested range are skipped, row groups are pruned on the `day` column
+statistics and only the requested columns are read.
+
+Optionally, archived days older than N days can then be deleted from
+SQLite ('archive_pruned_through') to keep the live DB small; reports read
+those days from the archive instead. Run nightly, e.g. from cron:
+
+    python -m utils.archive compact [--prune-older-than DAYS]
+"""
+import argparse
+import os
+from datetime import date, datetime, timedelta
+
+# pyarrow takes ~0.3 s to import, so it is loaded by available() on first use
+pa = pc = ds = pq = None
+_import_tried = False
+
+ROW_GROUP_SIZE = 64 * 1024
+ARCHIVED_KEY = "archive_through"
+PRUNED_KEY = "archive_pruned_through"
+
+ORDER_COLUMNS = ["order_id", "order_date", "day", "order_type", "payment_mode", "table_id",
+                 "subtotal", "gst_amount", "discount_amount", "total_amount"]
+LINE_COLUMNS = ["order_id", "order_date", "day", "order_type", "payment_mode", "item_id",
+                "item_name", "category", "price", "gst_rate", "quantity", "line_total"]
+
+
+def available():
+    """Import pyarrow once; False when it is not installed (the archive is optional, reports fall back to SQLite)."""
+    global pa, pc, ds, pq, _import_tried
+    if not _import_tried:
+        try:
+            import pyarrow
+            import pyarrow.compute
+            import pyarrow.dataset
+            import pyarrow.parquet
+            pa, pc, ds, pq = pyarrow, pyarrow.compute, pyarrow.dataset, pyarrow.parquet
+        except ImportError:
+            pass
+        _import_tried = True
+    return pa is not None
+
+
+def _schemas():
+    orders = pa.schema([
+        ("order_id", pa.int64()), ("order_date", pa.string()), ("day", pa.string()),
+        ("order_type", pa.string()), ("payment_mode", pa.string()), ("table_id", pa.int64()),
+        ("subtotal", pa.float64()), ("gst_amount", pa.float64()), ("discount_amount", pa.float64()),
+        ("total_amount", pa.float64()),
+    ])
+    lines = pa.schema([
+        ("order_id", pa.int64()), ("order_date", pa.string()), ("day", pa.string()),
+        ("order_type", pa.string()), ("payment_mode", pa.string()), ("item_id", pa.int64()),
+        ("item_name", pa.string()), ("category", pa.string()), ("price", pa.float64()),
+        ("gst_rate", pa.int64()), ("quantity", pa.int64()), ("line_total", pa.float64()),
+    ])
+    return {"orders": orders, "lines": lines}
+
+
+# ------------------ high-water marks ------------------
+def _to_int(day):
+    return int(day.replace("-", ""))
+
+
+def _from_int(value):
+    if not value:
+        return None
+    s = str(value)
+    return f"{s[:4]}-{s[4:6]}-{s[6:]}"
+
+
+def get_mark(conn, key):
+    """Last archived (or pruned) day as 'YYYY-MM-DD', or None."""
+    row = conn.execute("SELECT value FROM app_meta WHERE key=?", (key,)).fetchone()
+    return _from_int(row[0]) if row else None
+
+
+def _set_mark(conn, key, day):
+    conn.execute("""INSERT INTO app_meta (key, value) VALUES (?, ?)
+                    ON CONFLICT(key) DO UPDATE SET value = excluded.value""", (key, _to_int(day)))
+
+
+def _next_day(day):
+    return (datetime.strptime(day, "%Y-%m-%d").date() + timedelta(days=1)).isoformat()
+
+
+# ------------------ compaction ------------------
+_ORDERS_QUERY = """
+    SELECT id, order_date, substr(order_date, 1, 10), order_type, payment_mode, table_id,
+           subtotal, gst_amount, discount_amount, total_amount
+    FROM orders WHERE order_date BETWEEN ? AND ?
+    ORDER BY order_date, id
+"""
+_LINES_QUERY = """
+    SELECT o.id, o.order_date, substr(o.order_date, 1, 10), o.order_type, o.payment_mode, oi.item_id,
+           oi.item_name, oi.category, COALESCE(oi.unit_price, 0), COALESCE(oi.gst_rate, 5), oi.quantity,
+           oi.quantity * COALESCE(oi.unit_price, 0)
+    FROM orders o
+    JOIN order_items oi ON o.id = oi.order_id
+    WHERE o.order_date BETWEEN ? AND ?
+    ORDER BY o.order_date, o.id
+"""
+
+
+def _day_path(root, kind, day):
+    return os.path.join(root, kind, f"month={day[:7]}", f"{day}.parquet")
+
+
+def _write_day(root, kind, schema, day, rows):
+    dest = _day_path(root, kind, day)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    cols = list(zip(*rows))
+    table = pa.Table.from_arrays([pa.array(c, type=f.type) for c, f in zip(cols, schema)], schema=schema)
+    _write_table(table, dest)
+
+
+def _write_table(table, dest):
+    tmp = dest + ".tmp"
+    pq.write_table(table, tmp, compression="zstd", row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp, dest)
+
+
+def _merge_month(root, kind, month):
+    """Fold the day files of a closed month into <month>.parquet (re-archived days replace theirs)."""
+    folder = os.path.join(root, kind, f"month={month}")
+    target = os.path.join(folder, f"{month}.parquet")
+    days = sorted(f for f in os.listdir(folder) if f.endswith(".parquet") and f != f"{month}.parquet")
+    if not days:
+        return
+    parts = [pq.read_table(os.path.join(folder, f)) for f in days]
+    if os.path.exists(target):
+        merged = pq.read_table(target)
+        replaced = pa.array([f[:-len(".parquet")] for f in days])
+        parts.append(merged.filter(pc.invert(pc.is_in(merged["day"], value_set=replaced))))
+    table = pa.concat_tables(parts).sort_by([("order_date", "ascending"), ("order_id", "ascending")])
+    _write_table(table, target)
+    for f in days:
+        os.remove(os.path.join(folder, f))
+
+
+def _merge_closed_months(root):
+    current = date.today().isoformat()[:7]
+    for kind in ("orders", "lines"):
+        base = os.path.join(root, kind)
+        if not os.path.isdir(base):
+            continue
+        for name in sorted(os.listdir(base)):
+            if name.startswith("month=") and name[6:] < current:
+                _merge_month(root, kind, name[6:])
+
+
+def _stream_days(conn, query, start, end, chunk_size=20000):
+    """Yield (day, rows) for each day in [start, end] that has rows; one day in memory at a time."""
+    cur = conn.execute(query, (start + " 00:00:00", end + " 23:59:59"))
+    day, rows = None, []
+    while True:
+        chunk = cur.fetchmany(chunk_size)
+        if not chunk:
+            break
+        for row in chunk:
+            if row[2] != day:
+                if rows:
+                    yield day, rows
+                day, rows = row[2], []
+            rows.append(row)
+    if rows:
+        yield day, rows
+
+
+def compact(conn, root, start=None, end=None):
+    """
+    Write every closed day in [start, end] to the archive. By default picks
+    up after the last archived day and stops at yesterday. Days already in
+    the archive are rewritten, so a range can be re-archived after a repair.
+    Returns {"days", "orders", "lines", "through"}.
+    """
+    if not available():
+        raise RuntimeError("the sales archive needs pyarrow (pip install pyarrow)")
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    end = min(end or yesterday, yesterday)
+    if start is None:
+        mark = get_mark(conn, ARCHIVED_KEY)
+        if mark:
+            start = _next_day(mark)
+        else:
+            row = conn.execute("SELECT MIN(order_date) FROM orders").fetchone()
+            start = row[0][:10] if row[0] else None
+    result = {"days": 0, "orders": 0, "lines": 0, "through": get_mark(conn, ARCHIVED_KEY)}
+    if start is None or start > end:
+        return result
+
+    schemas = _schemas()
+    for day, rows in _stream_days(conn, _ORDERS_QUERY, start, end):
+        _write_day(root, "orders", schemas["orders"], day, rows)
+        result["days"] += 1
+        result["orders"] += len(rows)
+    for day, rows in _stream_days(conn, _LINES_QUERY, start, end):
+        _write_day(root, "lines", schemas["lines"], day, rows)
+        result["lines"] += len(rows)
+    # also picks up day files left behind by an interrupted merge
+    _merge_closed_months(root)
+
+    if not result["through"] or end > result["through"]:
+        _set_mark(conn, ARCHIVED_KEY, end)
+        result["through"] = end
+    return result
+
+
+def prune(conn, before, synced_seq=None):
+    """
+    Delete archived orders dated before `before` ('YYYY-MM-DD') from SQLite.
+    Never goes past the archive mark; the daily rollup is kept. On a branch
+    shard, pass the central store's high-water mark as `synced_seq`: pruning
+    then stops before the first day holding an order not consolidated yet.
+    Returns the number of orders deleted.
+    """
+    archived = get_mark(conn, ARCHIVED_KEY)
+    if not archived:
+        return 0
+    last = min(archived, (datetime.strptime(before, "%Y-%m-%d").date() - timedelta(days=1)).isoformat())
+    if synced_seq is not None:
+        row = conn.execute("""SELECT MIN(order_date) FROM orders
+                              WHERE order_date <= ? AND (sync_seq IS NULL OR sync_seq > ?)""",
+                           (last + " 23:59:59", int(synced_seq))).fetchone()
+        if row[0]:
+            last = min(last, (datetime.strptime(row[0][:10], "%Y-%m-%d").date() - timedelta(days=1)).isoformat())
+    bound = last + " 23:59:59"
+    conn.execute("DELETE FROM order_items WHERE order_id IN (SELECT id FROM orders WHERE order_date <= ?)",
+                 (bound,))
+    deleted = conn.execute("DELETE FROM orders WHERE order_date <= ?", (bound,)).rowcount
+    pruned = get_mark(conn, PRUNED_KEY)
+    if not pruned or last > pruned:
+        _set_mark(conn, PRUNED_KEY, last)
+    return deleted
+
+
+# ------------------ queries ------------------
+def _dataset(root, kind):
+    path = os.path.join(root, kind)
+    if not available() or not os.path.isdir(path):
+        return None
+    month = pa.field("month", pa.string())
+    return ds.dataset(path, format="parquet", schema=_schemas()[kind].append(month),
+                      partitioning=ds.partitioning(pa.schema([month]), flavor="hive"))
+
+
+def _range_filters(start, end):
+    """
+    Filters covering [start, end]. The months strictly inside the range are
+    selected on the partition key alone, so their `day` column is never read;
+    only the boundary months are filtered per row.
+    """
+    if not start and not end:
+        return [None]
+    month, day = ds.field("month"), ds.field("day")
+    sm, em = start[:7] if start else None, end[:7] if end else None
+    inner = None
+    if sm:
+        inner = month > sm
+    if em:
+        inner = month < em if inner is None else inner & (month < em)
+    parts = []
+    for m in sorted({sm, em} - {None}):
+        expr = month == m
+        if start and m == sm:
+            expr = expr & (day >= start)
+        if end and m == em:
+            expr = expr & (day <= end)
+        parts.append(expr)
+    parts.insert(1 if sm else 0, inner)  # keep the pieces in date order
+    return parts
+
+
+def scan(root, kind, columns=None, start=None, end=None, filter=None):
+    """
+    Read `columns` of the "orders" or "lines" archive for days in [start, end]
+    as a pyarrow Table. `filter` is an extra pyarrow.dataset expression.
+    """
+    columns = list(columns or (ORDER_COLUMNS if kind == "orders" else LINE_COLUMNS))
+    dataset = _dataset(root, kind)
+    if dataset is None:
+        return _schemas()[kind].append(pa.field("month", pa.string())).empty_table().select(columns)
+    tables = []
+    for expr in _range_filters(start, end):
+        if filter is not None:
+            expr = filter if expr is None else expr & filter
+        tables.append(dataset.to_table(columns=columns, filter=expr))
+    return pa.concat_tables(tables)
+
+
+def count(root, kind, start=None, end=None):
+    """Number of archived rows for days in [start, end] (from Parquet metadata where possible)."""
+    dataset = _dataset(root, kind)
+    if dataset is None:
+        return 0
+    return sum(dataset.count_rows(filter=expr) for expr in _range_filters(start, end))
+
+
+def iter_rows(root, kind, columns, start=None, end=None, chunk_size=10000):
+    """
+    Yield lists of up to chunk_size row tuples of `columns` for the archived
+    days in [start, end], oldest first (by order_date, order_id). One month
+    is read at a time.
+    """
+    columns = list(columns)
+    keys = [k for k in ("order_date", "order_id") if k not in columns]
+    for month in _months(root, kind, start, end):
+        t = scan(root, kind, columns + keys, start, end, filter=ds.field("month") == month)
+        t = t.sort_by([("order_date", "ascending"), ("order_id", "ascending")]).select(columns)
+        for batch in t.to_batches(chunk_size):
+            yield list(zip(*(c.to_pylist() for c in batch.columns)))
+
+
+def item_quantities(root, start=None, end=None):
+    """{item_id: quantity sold} over the archived days in range."""
+    t = scan(root, "lines", ["item_id", "quantity"], start, end)
+    agg = t.group_by("item_id").aggregate([("quantity", "sum")])
+    return dict(zip(agg["item_id"].to_pylist(), agg["quantity_sum"].to_pylist()))
+
+
+def _months(root, kind, start=None, end=None):
+    base = os.path.join(root, kind)
+    names = os.listdir(base) if os.path.isdir(base) else []
+    return sorted(n[6:] for n in names if n.startswith("month=")
+                  and (not start or n[6:] >= start[:7]) and (not end or n[6:] <= end[:7]))
+
+
+def item_names(root, item_ids, start=None, end=None):
+    """{item_id: item_name} as last archived, for the given ids only."""
+    # newest month first: most ids resolve from one file instead of a full string-column scan
+    names, todo = {}, set(item_ids)
+    for month in reversed(_months(root, "lines", start, end)):
+        if not todo:
+            break
+        t = scan(root, "lines", ["item_id", "item_name"], start, end,
+                 filter=(ds.field("month") == month) & ds.field("item_id").isin(list(todo)))
+        agg = t.group_by("item_id", use_threads=False).aggregate([("item_name", "last")])
+        for item_id, name in zip(agg["item_id"].to_pylist(), agg["item_name_last"].to_pylist()):
+            names[item_id] = name
+            todo.discard(item_id)
+    return names
+
+
+def top_items(root, start=None, end=None, top_n=10):
+    """[(item_id, item_name, quantity)] summed over the archived days in range, best sellers first."""
+    # names are only looked up for the winners; grouping on the string column too costs ~3x
+    qty = item_quantities(root, start, end)
+    best = sorted(qty.items(), key=lambda kv: kv[1], reverse=True)[:top_n]
+    names = item_names(root, [i for i, _ in best], start, end) if best else {}
+    return [(i, names.get(i), q) for i, q in best]
+
+
+PERIODS = {"day": 10, "month": 7, "year": 4}
+
+
+def trend(root, start=None, end=None, period="month"):
+    """[(period, orders, total_amount)] for the archived days in range, oldest first."""
+    # group on the month partition key (or day), then fold months into years in Python
+    key = "day" if period == "day" else "month"
+    t = scan(root, "orders", [key, "total_amount"], start, end)
+    agg = t.group_by(key).aggregate([("total_amount", "count"), ("total_amount", "sum")])
+    out = {}
+    for k, n, total in zip(agg[key].to_pylist(), agg["total_amount_count"].to_pylist(),
+                           agg["total_amount_sum"].to_pylist()):
+        k = k[:PERIODS[period]]
+        prev = out.get(k, (0, 0.0))
+        out[k] = (prev[0] + n, prev[1] + (total or 0.0))
+    return [(k, n, total) for k, (n, total) in sorted(out.items())]
+
+
+def main(argv=None):
+    from utils import db_utils
+
+    ap = argparse.ArgumentParser(prog="python -m utils.archive")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    cp = sub.add_parser("compact", help="archive closed days to Parquet")
+    cp.add_argument("--start", help="re-archive from this day (default: after the last archived day)")
+    cp.add_argument("--end")
+    cp.add_argument("--prune-older-than", type=int, metavar="DAYS",
+                    help="then delete archived orders older than DAYS from SQLite")
+    args = ap.parse_args(argv)
+
+    db_utils.initialize_database()
+    result = db_utils.archive_closed_days(args.start, args.end, args.prune_older_than)
+    print(f"archived {result['days']} days ({result['orders']} orders, {result['lines']} lines) "
+          f"through {result['through']}; pruned {result.get('pruned', 0)} orders")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+"""
+Multi-branch storage: one SQLite shard per branch, consolidated into a
+central reporting store.
+
+Every branch writes only its own shard (db/restaurant.db for the default
+branch "main", db/branches/<id>.db for the others, picked by RBS_BRANCH),
+so branches never wait on each other's write lock. In a shard:
+
+- branch_info records which branch the file belongs to, and triggers
+  stamp that id on every new order and table;
+- every order that is closed (saved, settled, or changed afterwards, e.g.
+  by recalculate_orders) gets the next value of a per-shard sequence in
+  orders.sync_seq, also by trigger, so all write paths are covered.
+
+The central store (db/central.db, or RBS_CENTRAL_DB) keeps a copy of
+every closed order and line with a per branch x day rollup. sync() pulls,
+for every registered branch, the orders whose sync_seq is above that
+branch's high-water mark, in parallel worker processes that open the
+shards read-only. The parent writes each batch, the affected days of the
+rollup and the new mark in one transaction, so an interrupted sync
+resumes where it stopped. Orders later pruned from a shard by the
+archive stay in the central store.
+
+    python -m utils.branches add <branch_id> <path/to/shard.db> [--name NAME]
+    python -m utils.branches sync [--workers N]
+    python -m utils.branches status
+"""
+import argparse
+import concurrent.futures
+import multiprocessing
+import os
+import pathlib
+import re
+import sqlite3
+from datetime import datetime
+
+DEFAULT_BRANCH = "main"
+SEQ_KEY = "sync_seq"
+BATCH = 20000
+PROCESS_BACKLOG = 2 * BATCH  # smaller syncs use threads: worker processes take longer to start than to pull
+_BRANCH_ID = re.compile(r"^[A-Za-z0-9_-]{1,40}$")
+
+ORDER_COLUMNS = ["order_id", "day", "order_date", "order_type", "payment_mode", "table_id",
+                 "subtotal", "gst_amount", "discount_amount", "total_amount", "sync_seq"]
+LINE_COLUMNS = ["order_id", "day", "item_id", "item_name", "category", "unit_price", "quantity"]
+
+
+def check_branch_id(branch_id):
+    """Branch ids name shard files: letters, digits, '-' and '_' only."""
+    if not _BRANCH_ID.match(branch_id or ""):
+        raise ValueError(f"invalid branch id {branch_id!r} (use letters, digits, '-' or '_')")
+    return branch_id
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ------------------ shard side ------------------
+def shard_branch(conn):
+    """The branch a shard belongs to (None before its branch migration ran)."""
+    try:
+        row = conn.execute("SELECT branch_id FROM branch_info LIMIT 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def _open_shard(path):
+    # read-only: a sync never takes a shard's write lock
+    return sqlite3.connect(pathlib.Path(path).resolve().as_uri() + "?mode=ro", uri=True, timeout=30)
+
+
+def pull(job):
+    """
+    Worker: the closed orders of one shard with sync_seq above `high_water`
+    (at most `batch`, in sequence order) and their lines, read in one snapshot.
+    job = (branch_id, shard path, high_water, batch).
+    """
+    branch_id, path, high_water, batch = job
+    conn = _open_shard(path)
+    try:
+        conn.execute("BEGIN")
+        found = shard_branch(conn)
+        if found != branch_id:
+            raise ValueError(f"{path} belongs to branch {found!r}, not {branch_id!r}")
+        orders = conn.execute("""
+            SELECT id, substr(order_date, 1, 10), order_date, order_type, payment_mode, table_id,
+                   subtotal, gst_amount, discount_amount, total_amount, sync_seq
+            FROM orders WHERE sync_seq > ? ORDER BY sync_seq LIMIT ?""", (high_water, batch)).fetchall()
+        top = orders[-1][-1] if orders else high_water
+        lines = conn.execute("""
+            SELECT oi.order_id, substr(o.order_date, 1, 10), oi.item_id, oi.item_name, oi.category, oi.unit_price,
+                   oi.quantity
+            FROM orders o JOIN order_items oi ON oi.order_id = o.id
+            WHERE o.sync_seq > ? AND o.sync_seq <= ?""", (high_water, top)).fetchall()
+        conn.rollback()
+    finally:
+        conn.close()
+    return {"branch_id": branch_id, "orders": orders, "lines": lines, "high_water": top}
+
+
+# ------------------ central store ------------------
+def create_central_tables(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS branches (
+        branch_id TEXT PRIMARY KEY,
+        name TEXT,
+        db_path TEXT NOT NULL,
+        high_water INTEGER NOT NULL DEFAULT 0,   -- last shard sync_seq consolidated
+        synced_at TEXT,
+        last_error TEXT
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS branch_orders (
+        branch_id TEXT NOT NULL,
+        order_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        order_date TEXT,
+        order_type TEXT,
+        payment_mode TEXT,
+        table_id INTEGER,
+        subtotal REAL,
+        gst_amount REAL,
+        discount_amount REAL,
+        total_amount REAL,
+        sync_seq INTEGER,
+        PRIMARY KEY (branch_id, order_id)
+    );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_branch_orders_day ON branch_orders(branch_id, day)")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS branch_order_items (
+        branch_id TEXT NOT NULL,
+        order_id INTEGER NOT NULL,
+        day TEXT NOT NULL,                       -- copied from the order: the item rollup needs no join
+        item_id INTEGER,
+        item_name TEXT,
+        category TEXT,
+        unit_price REAL,
+        quantity INTEGER
+    );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_branch_order_items_day ON branch_order_items(branch_id, day)")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS branch_daily (
+        branch_id TEXT NOT NULL,
+        day TEXT NOT NULL,
+        payment_mode TEXT NOT NULL DEFAULT '',
+        order_type TEXT NOT NULL DEFAULT '',
+        orders INTEGER NOT NULL DEFAULT 0,
+        subtotal REAL NOT NULL DEFAULT 0,
+        gst_amount REAL NOT NULL DEFAULT 0,
+        discount_amount REAL NOT NULL DEFAULT 0,
+        total_amount REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (branch_id, day, payment_mode, order_type)
+    );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_branch_daily_day ON branch_daily(day)")
+    # items are matched across branches by name: menu ids are per shard
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS branch_daily_items (
+        branch_id TEXT NOT NULL,
+        day TEXT NOT NULL,
+        item_name TEXT NOT NULL DEFAULT '',
+        category TEXT NOT NULL DEFAULT '',
+        quantity INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (branch_id, day, item_name, category)
+    );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_branch_daily_items_day ON branch_daily_items(day)")
+
+
+def register(conn, branch_id, db_path, name=None):
+    """Add or re-point a branch; the shard must already record the same branch id."""
+    check_branch_id(branch_id)
+    db_path = os.path.abspath(db_path)
+    if not os.path.isfile(db_path):
+        raise FileNotFoundError(db_path)
+    shard = _open_shard(db_path)
+    try:
+        found = shard_branch(shard)
+    finally:
+        shard.close()
+    if found != branch_id:
+        raise ValueError(f"{db_path} belongs to branch {found!r}, not {branch_id!r}")
+    conn.execute("""INSERT INTO branches (branch_id, name, db_path) VALUES (?, ?, ?)
+                    ON CONFLICT(branch_id) DO UPDATE SET db_path = excluded.db_path,
+                                                         name = COALESCE(excluded.name, name)""",
+                 (branch_id, name or branch_id, db_path))
+
+
+def discover(conn, paths):
+    """Register every existing shard file in `paths` under the branch id it records; returns those ids."""
+    known = {path: b for b, path in conn.execute("SELECT branch_id, db_path FROM branches")}
+    found = []
+    for path in paths:
+        path = os.path.abspath(path)
+        if path in known:
+            found.append(known[path])
+            continue
+        if not os.path.isfile(path):
+            continue
+        shard = _open_shard(path)
+        try:
+            branch_id = shard_branch(shard)
+        finally:
+            shard.close()
+        if branch_id and not conn.execute("SELECT 1 FROM branches WHERE branch_id = ?", (branch_id,)).fetchone():
+            register(conn, branch_id, path)
+            found.append(branch_id)
+    return found
+
+
+def _in_chunks(conn, sql, branch_id, ids, size=500):
+    rows = []
+    for i in range(0, len(ids), size):
+        chunk = ids[i:i + size]
+        rows += conn.execute(sql % ",".join("?" * len(chunk)), [branch_id] + chunk).fetchall()
+    return rows
+
+
+def _rebuild_days(conn, branch_id, days):
+    keys = [(branch_id, d) for d in sorted(days)]
+    conn.executemany("DELETE FROM branch_daily WHERE branch_id = ? AND day = ?", keys)
+    conn.executemany("DELETE FROM branch_daily_items WHERE branch_id = ? AND day = ?", keys)
+    conn.executemany("""
+        INSERT INTO branch_daily (branch_id, day, payment_mode, order_type, orders, subtotal, gst_amount,
+                                  discount_amount, total_amount)
+        SELECT branch_id, day, COALESCE(payment_mode, ''), COALESCE(order_type, ''), COUNT(*),
+               COALESCE(SUM(subtotal), 0), COALESCE(SUM(gst_amount), 0), COALESCE(SUM(discount_amount), 0),
+               COALESCE(SUM(total_amount), 0)
+        FROM branch_orders WHERE branch_id = ? AND day = ?
+        GROUP BY 3, 4""", keys)
+    conn.executemany("""
+        INSERT INTO branch_daily_items (branch_id, day, item_name, category, quantity, revenue)
+        SELECT branch_id, day, COALESCE(item_name, ''), COALESCE(category, ''), SUM(quantity),
+               SUM(quantity * COALESCE(unit_price, 0))
+        FROM branch_order_items WHERE branch_id = ? AND day = ?
+        GROUP BY 3, 4""", keys)
+
+
+def ingest(conn, result):
+    """Write one pulled batch, re-aggregate the days it touched and move the branch's mark. Call inside a transaction."""
+    branch_id, orders = result["branch_id"], result["orders"]
+    if orders:
+        # orders changed after an earlier sync replace their old copy (and its day is re-aggregated)
+        known = _in_chunks(conn, "SELECT order_id, day FROM branch_orders WHERE branch_id = ? AND order_id IN (%s)",
+                           branch_id, [o[0] for o in orders])
+        days = {day for _, day in known} | {o[1] for o in orders}
+        # by day: one index on the lines is enough, and re-synced orders are rare
+        conn.executemany("DELETE FROM branch_order_items WHERE branch_id = ? AND day = ? AND order_id = ?",
+                         [(branch_id, day, order_id) for order_id, day in known])
+        conn.executemany(f"INSERT OR REPLACE INTO branch_orders (branch_id, {', '.join(ORDER_COLUMNS)}) "
+                         f"VALUES (?{', ?' * len(ORDER_COLUMNS)})", [(branch_id,) + tuple(o) for o in orders])
+        conn.executemany(f"INSERT INTO branch_order_items (branch_id, {', '.join(LINE_COLUMNS)}) "
+                         f"VALUES (?{', ?' * len(LINE_COLUMNS)})", [(branch_id,) + tuple(r) for r in result["lines"]])
+        _rebuild_days(conn, branch_id, days)
+    conn.execute("UPDATE branches SET high_water = ?, synced_at = ?, last_error = NULL WHERE branch_id = ?",
+                 (result["high_water"], _now(), branch_id))
+
+
+def backlog(path, high_water):
+    """Upper bound on the orders a shard closed since `high_water`: its sequence counter minus the mark."""
+    conn = _open_shard(path)
+    try:
+        row = conn.execute("SELECT value FROM app_meta WHERE key = ?", (SEQ_KEY,)).fetchone()
+    finally:
+        conn.close()
+    return max(0, (row[0] if row else 0) - high_water)
+
+
+def _failed(pool, errors, branch_id, exc):
+    errors[branch_id] = f"{type(exc).__name__}: {exc}"
+    with pool.transaction() as conn:
+        conn.execute("UPDATE branches SET last_error = ? WHERE branch_id = ?", (errors[branch_id], branch_id))
+
+
+def sync(pool, workers=None, batch=BATCH):
+    """
+    Bring every registered branch up to date. `pool` is the central store's
+    db_pool. Only branches whose sequence moved past their mark are pulled,
+    by up to `workers` worker processes when the backlog is large (threads
+    otherwise: starting processes costs more than a small pull saves). A
+    branch's next batch is pulled while the previous one is being written.
+    Returns {"orders": {branch: pulled}, "errors": {branch: message}};
+    a failed branch keeps its mark and records last_error.
+    """
+    with pool.connection() as conn:
+        registered = conn.execute("SELECT branch_id, db_path, high_water FROM branches").fetchall()
+    pulled, errors, todo = {b: 0 for b, _, _ in registered}, {}, {}
+    for branch_id, path, high_water in registered:
+        try:
+            pending = backlog(path, high_water)
+        except sqlite3.Error as e:
+            _failed(pool, errors, branch_id, e)
+            continue
+        if pending:
+            todo[branch_id] = (path, high_water, pending)
+    if not todo:
+        return {"orders": pulled, "errors": errors}
+
+    workers = min(workers or os.cpu_count() or 1, len(todo))
+    if workers > 1 and sum(n for _, _, n in todo.values()) >= PROCESS_BACKLOG:
+        # spawn: the parent may be a threaded server; workers only need sqlite3 and this module
+        ex = concurrent.futures.ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    else:
+        ex = concurrent.futures.ThreadPoolExecutor(workers)
+    with ex:
+        running = {ex.submit(pull, (b, path, hw, batch)): b for b, (path, hw, _) in todo.items()}
+        while running:
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for fut in done:
+                branch_id = running.pop(fut)
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    _failed(pool, errors, branch_id, e)
+                    continue
+                if len(result["orders"]) == batch:
+                    running[ex.submit(pull, (branch_id, todo[branch_id][0], result["high_water"], batch))] = branch_id
+                with pool.transaction() as conn:
+                    ingest(conn, result)
+                pulled[branch_id] += len(result["orders"])
+    return {"orders": pulled, "errors": errors}
+
+
+# ------------------ central reads ------------------
+def _range(start, end, column="d.day"):
+    if start and end:
+        return f" WHERE {column} BETWEEN ? AND ?", [start, end]
+    return "", []
+
+
+STATUS_COLUMNS = ["branch_id", "name", "db_path", "high_water", "synced_at", "last_error"]
+BRANCH_TOTAL_COLUMNS = ["branch_id", "name", "orders", "subtotal", "gst_amount", "discount_amount", "total_amount"]
+
+
+def status(conn):
+    return conn.execute("SELECT " + ", ".join(STATUS_COLUMNS) + " FROM branches ORDER BY branch_id").fetchall()
+
+
+def branch_totals(conn, start=None, end=None):
+    """One row per registered branch (zeros for a branch without sales in the range)."""
+    where, params = _range(start, end)
+    return conn.execute("""
+        SELECT b.branch_id, b.name, COALESCE(SUM(d.orders), 0), COALESCE(SUM(d.subtotal), 0),
+               COALESCE(SUM(d.gst_amount), 0), COALESCE(SUM(d.discount_amount), 0), COALESCE(SUM(d.total_amount), 0)
+        FROM branches b LEFT JOIN (SELECT * FROM branch_daily d""" + where + """) d ON d.branch_id = b.branch_id
+        GROUP BY b.branch_id ORDER BY 7 DESC""", params).fetchall()
+
+
+def daily_totals(conn, start=None, end=None):
+    where, params = _range(start, end)
+    return conn.execute("SELECT d.day, d.branch_id, SUM(d.total_amount) FROM branch_daily d" + where +
+                        " GROUP BY 1, 2 ORDER BY 1", params).fetchall()
+
+
+def top_items(conn, start=None, end=None, top_n=10, branch_id=None):
+    where, params = _range(start, end)
+    if branch_id:
+        where += (" AND" if where else " WHERE") + " d.branch_id = ?"
+        params.append(branch_id)
+    return conn.execute("""
+        SELECT d.item_name, SUM(d.quantity) AS quantity, SUM(d.revenue) FROM branch_daily_items d""" + where + """
+        GROUP BY d.item_name ORDER BY quantity DESC LIMIT ?""", params + [int(top_n)]).fetchall()
+
+
+def main(argv=None):
+    from utils import db_utils
+
+    ap = argparse.ArgumentParser(description="Multi-branch consolidation into the central reporting store.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    add = sub.add_parser("add", help="register a branch shard")
+    add.add_argument("branch_id")
+    add.add_argument("db_path")
+    add.add_argument("--name")
+    run = sub.add_parser("sync", help="pull new closed orders from every branch")
+    run.add_argument("--workers", type=int, help="worker processes (default: one per branch, up to the CPU count)")
+    run.add_argument("--batch", type=int, default=BATCH, help="orders per pull")
+    sub.add_parser("status", help="registered branches and their high-water marks")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "add":
+        db_utils.register_branch(args.branch_id, args.db_path, args.name)
+        print(f"registered {args.branch_id}: {os.path.abspath(args.db_path)}")
+    elif args.cmd == "sync":
+        result = db_utils.consolidate_branches(args.workers, args.batch)
+        for branch_id, n in sorted(result["orders"].items()):
+            print(f"{branch_id:20s} {n:8d} orders" + (f"  ERROR {result['errors'][branch_id]}"
+                                                      if branch_id in result["errors"] else ""))
+        if result["errors"]:
+            raise SystemExit(1)
+    else:
+        for row in db_utils.get_branch_status().itertuples(index=False):
+            print(f"{row.branch_id:20s} mark {row.high_water:10d}  synced {row.synced_at or 'never':19s}  "
+                  f"{row.db_path}" + (f"  ERROR {row.last_error}" if row.last_error else ""))
+
+
+if __name__ == "__main__":
+    main()
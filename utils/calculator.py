@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def calculate_subtotal(items):
     """items: list of dicts with price and quantity"""
     return sum(float(it["price"]) * int(it["quantity"]) for it in items)
@@ -15,3 +18,115 @@ def calculate_discount(subtotal, discount_type, discount_value):
 def calculate_total(subtotal, gst_amount, discount_amount):
     total = subtotal + gst_amount - discount_amount
     return max(total, 0.0)
+
+
+# ------------------ vectorized bill engine ------------------
+# Amounts are computed in integer minor units (1/100 DA) with half-up
+# rounding, so results are exact and identical for single bills and batches.
+# GST is rounded once per (order, rate) bucket, not per line.
+MINOR = 100
+
+
+def _to_minor(values, scale=MINOR):
+    # half-up (away from zero); the scaled value is first rounded to 6 places so
+    # float noise such as 12.345 * 100 == 1234.4999999999998 still rounds up
+    values = np.asarray(values, dtype=np.float64)
+    scaled = np.round(np.abs(values) * scale, 6)
+    return (np.sign(values) * np.floor(scaled + 0.5)).astype(np.int64)
+
+
+def _round_div(num, den):
+    # half-up integer division for non-negative numerators
+    return (2 * num + den) // (2 * den)
+
+
+def compute_bills(order_index, prices, quantities, gst_rates, discount_types=None, discount_values=None,
+                  n_orders=None):
+    """
+    Price a batch of orders in one vectorized pass.
+
+    Line arrays (same length): order_index (0..n_orders-1), prices, quantities,
+    gst_rates (percent). Optional per-order arrays: discount_types
+    ("Percentage" / "Fixed amount" / anything else = none) and discount_values.
+    Returns a dict of per-order float arrays (subtotal, gst_amount,
+    discount_amount, total), the per-line `line_total` array and `gst_buckets`:
+    (order_index, rate, taxable, gst) arrays for every non-empty bucket.
+    """
+    order_index = np.asarray(order_index, dtype=np.int64)
+    qty = np.asarray(quantities, dtype=np.int64)
+    line = _to_minor(prices) * qty
+    if n_orders is None:
+        n_orders = int(order_index.max()) + 1 if len(order_index) else 0
+
+    rate_bp = _to_minor(gst_rates, 100)
+    rates, rate_idx = np.unique(rate_bp, return_inverse=True)
+    if not len(rates):
+        rates = np.zeros(1, dtype=np.int64)
+    n_rates = len(rates)
+    bucket = order_index * n_rates + rate_idx.reshape(-1)
+    # float64 sums are exact for integer minor units below 2**53
+    taxable = np.rint(np.bincount(bucket, weights=line, minlength=n_orders * n_rates)).astype(np.int64)
+    gst = _round_div(taxable * np.tile(rates, n_orders), 10000)
+
+    subtotal = taxable.reshape(n_orders, n_rates).sum(axis=1)
+    gst_total = gst.reshape(n_orders, n_rates).sum(axis=1)
+
+    discount = np.zeros(n_orders, dtype=np.int64)
+    if discount_types is not None:
+        dtypes = np.asarray(discount_types, dtype=object)
+        dvalues = np.asarray(discount_values if discount_values is not None else np.zeros(n_orders), dtype=np.float64)
+        pct = dtypes == "Percentage"
+        fixed = dtypes == "Fixed amount"
+        discount[pct] = _round_div(subtotal[pct] * _to_minor(dvalues[pct], 100), 10000)
+        discount[fixed] = _to_minor(dvalues[fixed])
+    total = np.maximum(subtotal + gst_total - discount, 0)
+
+    nz = np.flatnonzero(taxable)
+    return {
+        "subtotal": subtotal / MINOR,
+        "gst_amount": gst_total / MINOR,
+        "discount_amount": discount / MINOR,
+        "total": total / MINOR,
+        "line_total": line / MINOR,
+        "gst_buckets": (nz // n_rates, rates[nz % n_rates] / 100, taxable[nz] / MINOR, gst[nz] / MINOR),
+    }
+
+
+def compute_bill(items, discount_type="None", discount_value=0.0, default_gst=5):
+    """
+    Price one order. items: dicts with price, quantity and optionally gst (percent).
+    Returns floats subtotal, gst_amount, discount_amount, total, the per-line
+    `line_totals` list and `gst_breakdown`: [{"rate", "taxable", "gst"}, ...].
+    """
+    n = len(items)
+    res = compute_bills(
+        np.zeros(n, dtype=np.int64),
+        [float(it["price"]) for it in items],
+        [int(it["quantity"]) for it in items],
+        [float(it["gst"]) if it.get("gst") is not None else default_gst for it in items],
+        [discount_type], [float(discount_value or 0)], n_orders=1,
+    )
+    _, rates, taxable, gst = res["gst_buckets"]
+    return {
+        "subtotal": float(res["subtotal"][0]),
+        "gst_amount": float(res["gst_amount"][0]),
+        "discount_amount": float(res["discount_amount"][0]),
+        "total": float(res["total"][0]),
+        "line_totals": res["line_total"].tolist(),
+        "gst_breakdown": [{"rate": float(r), "taxable": float(t), "gst": float(g)}
+                          for r, t, g in zip(rates, taxable, gst)],
+    }
+
+
+# scalar forms of the bucket arithmetic above, for running totals kept in minor units
+def bucket_gst(taxable_minor, rate):
+    """GST in minor units on one rate bucket, rounded exactly as compute_bills does."""
+    return int(_round_div(int(taxable_minor) * int(_to_minor(rate, 100)), 10000))
+
+
+def discount_minor(subtotal_minor, discount_type, discount_value):
+    if discount_type == "Percentage":
+        return int(_round_div(int(subtotal_minor) * int(_to_minor(discount_value, 100)), 10000))
+    if discount_type == "Fixed amount":
+        return int(_to_minor(discount_value))
+    return 0
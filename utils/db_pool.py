@@ -0,0 +1,173 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from utils import metrics
+
+# Connection tuning shared by every pooled connection
+POOL_SIZE = int(os.environ.get("RBS_DB_POOL_SIZE", "8"))
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KIB = 16384          # page cache per connection (negative PRAGMA value = KiB)
+MMAP_SIZE = 64 * 1024 * 1024
+
+
+class _CountingCursor(sqlite3.Cursor):
+    # statement counts for metrics (cheaper than a trace callback, which re-enters Python inside sqlite)
+    def execute(self, *args):
+        metrics.count_statement()
+        return super().execute(*args)
+
+    def executemany(self, *args):
+        metrics.count_statement()
+        return super().executemany(*args)
+
+
+class _CountingConnection(sqlite3.Connection):
+    def cursor(self, factory=_CountingCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        metrics.count_statement()
+        return super().execute(*args)
+
+    def executemany(self, *args):
+        metrics.count_statement()
+        return super().executemany(*args)
+
+
+class ConnectionPool:
+    """
+    Thread-aware pool of long-lived SQLite connections for one database file.
+
+    A thread that already holds a connection gets the same one back when it
+    asks again (so nested helpers share a transaction); otherwise an idle
+    connection is reused, or a new one is opened while under `size`.
+    """
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._all = []
+        self.opened = 0
+        self.checkouts = 0
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000.0, check_same_thread=False,
+                               isolation_level=None,
+                               factory=_CountingConnection if metrics.ENABLED else sqlite3.Connection)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        self.opened += 1
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._all) < self.size:
+                conn = self._open()
+                self._all.append(conn)
+                return conn
+        return self._idle.get(timeout=BUSY_TIMEOUT_MS / 1000.0)
+
+    @contextmanager
+    def connection(self):
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._acquire()
+        self.checkouts += 1
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self, immediate=True):
+        """
+        Run the block in one transaction: commit on success, roll back on error.
+        Nested calls on the same thread join the outer transaction.
+        """
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "size": self.size,
+            "open": len(self._all),
+            "idle": self._idle.qsize(),
+            "opened_total": self.opened,
+            "checkouts": self.checkouts,
+        }
+
+    def close_all(self):
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait()
+                except queue.Empty:
+                    break
+            for conn in self._all:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._all = []
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path):
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = _pools[path] = ConnectionPool(path)
+    return pool
+
+
+def pool_stats():
+    return [pool.stats() for pool in list(_pools.values())]
+
+
+def close_all_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
@@ -1,196 +1,304 @@
-import sqlite3
 import os
-import csv
-import json
-from datetime import datetime
-import pandas as pd
-from fpdf import FPDF
-import io
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
+import threading
+from glob import glob
+from datetime import datetime, timedelta
+from utils.db_pool import get_pool, pool_stats
+from utils.menu_cache import MenuCache
+from utils import migrations
+from utils import journal
+from utils import rollup
+from utils import thumbnails
+from utils import menu_import
+from utils import exporter
+from utils import archive
+from utils import receipts
+from utils import table_state
+from utils import tickets
+from utils import kitchen
+from utils import menu_search
+from utils import metrics
+from utils import branches
+from utils import settlement
+from utils.calculator import compute_bill, compute_bills
+# pandas, reportlab, fpdf and pyarrow are imported where they are first needed, so importing
+# this module stays cheap for API workers and CLIs (budget: benchmarks/check_import_time.py)
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # project_root/utils -> project_root
-DB_PATH = os.path.join(BASE_DIR, "db", "restaurant.db")
+# one SQLite shard per branch (RBS_BRANCH); the default branch keeps the original file names
+BRANCH_ID = branches.check_branch_id(os.environ.get("RBS_BRANCH", branches.DEFAULT_BRANCH))
+MAIN_DB_PATH = os.path.join(BASE_DIR, "db", "restaurant.db")
+SHARD_DIR = os.path.join(BASE_DIR, "db", "branches")
+DB_PATH = MAIN_DB_PATH if BRANCH_ID == branches.DEFAULT_BRANCH else os.path.join(SHARD_DIR, BRANCH_ID + ".db")
+CENTRAL_DB_PATH = os.environ.get("RBS_CENTRAL_DB") or os.path.join(BASE_DIR, "db", "central.db")
 DATA_DIR = os.path.join(BASE_DIR, "data")
 MENU_CSV = os.path.join(DATA_DIR, "menu.csv")
-SAMPLE_BILLS_JSON = os.path.join(DATA_DIR, "sample_bills.json")
-SALES_CSV = os.path.join(DATA_DIR, "sales_report.csv")
+THUMB_DIR = os.environ.get("RBS_THUMB_DIR") or os.path.join(DATA_DIR, "thumbnails")
+BRANCH_DATA_DIR = DATA_DIR if BRANCH_ID == branches.DEFAULT_BRANCH else os.path.join(DATA_DIR, "branches", BRANCH_ID)
+SAMPLE_BILLS_JSON = os.path.join(BRANCH_DATA_DIR, "sample_bills.json")
+SALES_CSV = os.path.join(BRANCH_DATA_DIR, "sales_report.csv")
+ARCHIVE_DIR = os.path.join(BRANCH_DATA_DIR, "archive")
+RECEIPTS_DIR = os.path.join(BRANCH_DATA_DIR, "receipts")
 
-os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-os.makedirs(DATA_DIR, exist_ok=True)
-
-def _connect():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+def _pool():
+    # looked up on every call so DB_PATH can be re-pointed (tests, benchmarks)
+    return get_pool(DB_PATH)
 
 def initialize_database():
-    conn = _connect()
-    cur = conn.cursor()
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS menu (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        item_name TEXT NOT NULL,
-        category TEXT,
-        price REAL,
-        gst INTEGER DEFAULT 5,
-        image TEXT
-    );
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS orders (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        order_type TEXT,        -- Dine-In or Takeaway
-        table_id INTEGER,       -- if dine-in
-        payment_mode TEXT,
-        subtotal REAL,
-        gst_amount REAL,
-        discount_amount REAL,
-        total_amount REAL,
-        order_date TEXT
-    );
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS order_items (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        order_id INTEGER,
-        item_id INTEGER,
-        quantity INTEGER,
-        FOREIGN KEY(order_id) REFERENCES orders(id),
-        FOREIGN KEY(item_id) REFERENCES menu(id)
-    );
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS tables (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        capacity INTEGER DEFAULT 2,
-        status TEXT DEFAULT 'available',    -- available / occupied / cleaning
-        current_order_id INTEGER
-    );
-    """)
-
-    conn.commit()
-    conn.close()
-
-def populate_menu_from_csv(csv_path=MENU_CSV):
+    """Create the schema or upgrade an existing DB file in place; returns the migrations applied."""
+    for folder in {os.path.dirname(DB_PATH), DATA_DIR, os.path.dirname(SAMPLE_BILLS_JSON)}:
+        os.makedirs(folder, exist_ok=True)
+    with _pool().transaction() as conn:
+        return migrations.migrate(conn, {"bills_json": SAMPLE_BILLS_JSON, "sales_csv": SALES_CSV,
+                                         "branch_id": BRANCH_ID})
+
+_bootstrapped = set()
+_bootstrap_lock = threading.Lock()
+
+def bootstrap():
+    """
+    Startup for the app and the API, once per process and DB file: apply
+    pending migrations and, when that created the schema, load the menu
+    from menu.csv. Refuses a DB file that belongs to another branch.
+    Later calls for the same DB_PATH return None at once.
+    """
+    path = os.path.abspath(DB_PATH)
+    if path in _bootstrapped:
+        return None
+    with _bootstrap_lock:
+        if path in _bootstrapped:
+            return None
+        applied = initialize_database()
+        with _pool().connection() as conn:
+            shard = branches.shard_branch(conn)
+        if shard != BRANCH_ID:
+            raise RuntimeError(f"{DB_PATH} is the shard of branch {shard!r}, not {BRANCH_ID!r} (RBS_BRANCH)")
+        if 1 in applied:  # brand-new (or pre-migrations) DB file; skipped if the menu has items
+            populate_menu_from_csv()
+        _bootstrapped.add(path)
+        return applied
+
+def _bump_version(conn, key):
+    conn.execute("""INSERT INTO app_meta (key, value) VALUES (?, 1)
+                    ON CONFLICT(key) DO UPDATE SET value = value + 1""", (key,))
+
+def _read_version(conn, key):
+    row = conn.execute("SELECT value FROM app_meta WHERE key=?", (key,)).fetchone()
+    return row[0] if row else 0
+
+def get_version(key):
+    with _pool().connection() as conn:
+        return _read_version(conn, key)
+
+def populate_menu_from_csv(csv_path=MENU_CSV, upsert=False):
+    """
+    Import menu.csv. By default only into an empty menu (first start);
+    with upsert=True existing items are updated in place (see import_menu_csv).
+    """
     if not os.path.exists(csv_path):
         return False, f"{csv_path} not found"
-    conn = _connect()
-    cur = conn.cursor()
-    # If menu has items, skip to avoid duplicates
-    cur.execute("SELECT COUNT(*) FROM menu")
-    if cur.fetchone()[0] > 0:
-        conn.close()
-        return False, "Menu already populated. Skipping import."
-    with open(csv_path, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            # image value optional: if CSV has an image column, use it, else try data/images/{slug}.jpg
-            image = row.get("image") or os.path.join(DATA_DIR, "images", slugify(row["item_name"]) + ".jpg")
-            cur.execute("INSERT INTO menu (item_name, category, price, gst, image) VALUES (?, ?, ?, ?, ?)",
-                        (row["item_name"].strip(), row["category"].strip(), float(row["price"]), int(row.get("gst", 5)), image))
-    conn.commit()
-    conn.close()
-    return True, "Menu imported."
+    if not upsert:
+        with _pool().connection() as conn:
+            # If menu has items, skip to avoid duplicates
+            if conn.execute("SELECT COUNT(*) FROM menu").fetchone()[0] > 0:
+                return False, "Menu already populated. Skipping import."
+    result = import_menu_csv(csv_path)
+    return True, (f"Menu imported: {result['inserted']} added, {result['updated']} updated, "
+                  f"{result['unchanged']} unchanged, {len(result['errors'])} rejected.")
+
+def _default_image(name):
+    # image value optional: if CSV has no image column, try data/images/{slug}.jpg
+    return os.path.join(DATA_DIR, "images", slugify(name) + ".jpg")
+
+def import_menu_csv(csv_path=MENU_CSV):
+    """
+    Stream, validate and upsert a menu CSV (item_name, category, price[, gst, image, sku])
+    in one transaction. Rows match existing items by sku, else by name; only changed
+    rows are written. Returns {"inserted", "updated", "unchanged", "errors"}.
+    """
+    f, reader = menu_import.open_reader(csv_path)
+    with f, _pool().transaction() as conn:
+        result = menu_import.import_rows(conn, reader, _default_image)
+        if result["inserted"] or result["updated"]:
+            _bump_version(conn, "menu")
+    thumbnails.schedule((resolve_image_path(image) for image in result.pop("changed_images")), THUMB_DIR)
+    return result
 
 def slugify(name):
     return "".join(c if c.isalnum() else "_" for c in name.strip()).lower()
 
 # menu CRUD / read
+def _read_menu(path):
+    with get_pool(path).transaction(immediate=False) as conn:
+        version = _read_version(conn, "menu")
+        cur = conn.execute("SELECT * FROM menu ORDER BY category, item_name")
+        columns = [d[0] for d in cur.description]
+        rows = cur.fetchall()
+    return version, columns, rows
+
+def _menu_version(path):
+    with get_pool(path).connection() as conn:
+        return _read_version(conn, "menu")
+
+def resolve_image_path(image):
+    """menu.image may be a bare file name (menu.csv), a project-relative or an absolute path."""
+    if not image:
+        return None
+    for candidate in (image, os.path.join(BASE_DIR, image), os.path.join(DATA_DIR, "images", image)):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+_menu_cache = MenuCache(_menu_version, _read_menu, resolve_image_path)
+
+def get_menu_snapshot():
+    """Cached MenuSnapshot (rows, categories, by_category, by_id, df); only reloads after a menu edit."""
+    return _menu_cache.get(DB_PATH)
+
+_menu_indexes = {}
+
+def search_menu(query, limit=50):
+    """
+    Menu rows matching `query` (prefix and one-typo tolerant, over name and
+    category), best match first. The index follows the menu version and
+    only re-indexes the items that changed.
+    """
+    snap = get_menu_snapshot()
+    index = _menu_indexes.setdefault(DB_PATH, menu_search.MenuIndex())
+    if index.version != snap.version:
+        index.update(snap.rows, snap.version)
+    return [snap.by_id[i] for i in index.search(query, limit) if i in snap.by_id]
+
+def search_menu_fts(query, limit=50):
+    """Menu ids by SQLite FTS5 prefix search (for tools that don't hold the in-memory index)."""
+    with _pool().connection() as conn:
+        return menu_search.fts_search(conn, query, limit)
+
 def load_menu_df():
-    conn = _connect()
-    df = pd.read_sql_query("SELECT * FROM menu ORDER BY category, item_name", conn)
-    conn.close()
-    return df
+    # shared cached frame: callers must copy before mutating
+    return get_menu_snapshot().df
 
 def add_menu_item(name, category, price, gst=5, image=None):
-    conn = _connect()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO menu (item_name, category, price, gst, image) VALUES (?, ?, ?, ?, ?)",
-                (name, category, float(price), int(gst), image))
-    conn.commit()
-    last = cur.lastrowid
-    conn.close()
-    return last
+    with _pool().transaction() as conn:
+        cur = conn.execute("INSERT INTO menu (item_name, category, price, gst, image) VALUES (?, ?, ?, ?, ?)",
+                           (name, category, float(price), int(gst), image))
+        _bump_version(conn, "menu")
+        item_id = cur.lastrowid
+    thumbnails.schedule([resolve_image_path(image)], THUMB_DIR)
+    return item_id
 
 def delete_menu_item(item_id):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM menu WHERE id = ?", (item_id,))
-    conn.commit()
-    conn.close()
+    with _pool().transaction() as conn:
+        conn.execute("DELETE FROM menu WHERE id = ?", (item_id,))
+        _bump_version(conn, "menu")
 
 def update_menu_item(item_id, name, category, price, gst, image):
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE menu
-        SET item_name = ?, category = ?, price = ?, gst = ?, image = ?
-        WHERE id = ?
-    """, (name, category, price, gst, image, item_id))
-    conn.commit()
-    conn.close()
+    with _pool().transaction() as conn:
+        conn.execute("""
+            UPDATE menu
+            SET item_name = ?, category = ?, price = ?, gst = ?, image = ?
+            WHERE id = ?
+        """, (name, category, price, gst, image, item_id))
+        _bump_version(conn, "menu")
+    thumbnails.schedule([resolve_image_path(image)], THUMB_DIR)
 
 
 def get_menu_item_by_id(id_):
-    conn = sqlite3.connect("your_database_path.db")
-    conn.row_factory = sqlite3.Row  # So you can access columns by name
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM menu WHERE id=?", (id_,))
-    row = cursor.fetchone()
-    conn.close()
-    if row:
-        return dict(row)
-    else:
-        return None
+    with _pool().connection() as conn:
+        cursor = conn.execute("SELECT * FROM menu WHERE id=?", (id_,))
+        row = cursor.fetchone()
+        if row:
+            return dict(zip([c[0] for c in cursor.description], row))
+        else:
+            return None
     
 # tables
+TableConflict = table_state.TableConflict
+
+def _load_tables():
+    with _pool().connection() as conn:
+        return table_state.load(conn)
+
+# sidebar reads come from memory; the DB is only re-read when the 'tables' version moves
+_table_board = table_state.TableBoard(_load_tables, lambda: get_version(table_state.VERSION_KEY))
+
+def get_table_board():
+    """(version, rows) from the in-process board; see utils/table_state.py."""
+    return _table_board.snapshot()
+
 def get_tables_df():
-    conn = _connect()
-    df = pd.read_sql_query("SELECT * FROM tables ORDER BY id", conn)
-    conn.close()
-    return df
+    import pandas as pd
+    return pd.DataFrame(_table_board.snapshot()[1], columns=table_state.COLUMNS)
 
 def add_table(name, capacity=2):
-    conn = _connect()
-    cur = conn.cursor()
-    cur.execute("INSERT INTO tables (name, capacity) VALUES (?, ?)", (name, int(capacity)))
-    conn.commit()
-    last = cur.lastrowid
-    conn.close()
-    return last
+    with _pool().transaction() as conn:
+        cur = conn.execute("INSERT INTO tables (name, capacity) VALUES (?, ?)", (name, int(capacity)))
+        table_state.bump_version(conn)
+    _table_board.refresh()
+    return cur.lastrowid
+
+def delete_table(name):
+    """Delete a table by name unless it is seated; returns True if a row was removed."""
+    with _pool().transaction() as conn:
+        cur = conn.execute("DELETE FROM tables WHERE name=? AND status != 'occupied'", (name,))
+        if cur.rowcount:
+            table_state.bump_version(conn)
+    _table_board.refresh()
+    return cur.rowcount > 0
+
+def subscribe_tables(fn):
+    """Call fn(version, rows) after every table change seen by this process; returns an unsubscribe function."""
+    return _table_board.subscribe(fn)
+
+def set_table_status(table_id, status, order_id=None, expected_order_id=None):
+    """Compare-and-set transition (available -> occupied -> cleaning -> available); raises TableConflict."""
+    with _pool().transaction() as conn:
+        table_state.transition(conn, table_id, status, order_id, expected_order_id)
+    _table_board.refresh()
 
 def update_table_status(table_id, status, current_order_id=None):
-    conn = _connect()
-    cur = conn.cursor()
-    cur.execute("UPDATE tables SET status=?, current_order_id=? WHERE id=?", (status, current_order_id, int(table_id)))
-    conn.commit()
-    conn.close()
+    # admin override: no state check
+    with _pool().transaction() as conn:
+        conn.execute("UPDATE tables SET status=?, current_order_id=? WHERE id=?", (status, current_order_id, int(table_id)))
+        table_state.bump_version(conn)
+    _table_board.refresh()
 
 # orders
-def save_order(order_type, payment_mode, subtotal, gst_amount, discount_amount, total, items, table_id=None):
+def commit_order(order_type, payment_mode, subtotal, gst_amount, discount_amount, total, items, table_id=None,
+                 occupy_table=True):
     """
+    Atomic order commit: the order row, all its lines and (for dine-in with
+    occupy_table) the table status change are written in one transaction.
+    Seating is a compare-and-set: if the table was taken meanwhile,
+    TableConflict is raised and nothing is saved.
+    The sample_bills.json / sales_report.csv mirrors are queued on the
+    write-behind journal (utils/journal.py), off the request path.
+
     items: list of dicts {item_id, name, price, quantity}
     returns order_id
     """
-    conn = _connect()
-    cur = conn.cursor()
     order_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    cur.execute("""INSERT INTO orders
-                   (order_type, table_id, payment_mode, subtotal, gst_amount, discount_amount, total_amount, order_date)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                (order_type, table_id, payment_mode, subtotal, gst_amount, discount_amount, total, order_date))
-    order_id = cur.lastrowid
-    for it in items:
-        cur.execute("INSERT INTO order_items (order_id, item_id, quantity) VALUES (?, ?, ?)",
-                    (order_id, int(it["item_id"]), int(it["quantity"])))
-    conn.commit()
-    conn.close()
+    items = _complete_lines(items)
+    with _pool().transaction() as conn:
+        cur = conn.execute("""INSERT INTO orders
+                       (order_type, table_id, payment_mode, subtotal, gst_amount, discount_amount, total_amount, order_date)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (order_type, table_id, payment_mode, subtotal, gst_amount, discount_amount, total, order_date))
+        order_id = cur.lastrowid
+        # name/category/price/GST are snapshotted so bills and reports never need the menu join
+        conn.executemany("""INSERT INTO order_items
+                            (order_id, item_id, quantity, item_name, category, unit_price, gst_rate)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                         [(order_id, int(it["item_id"]), int(it["quantity"]), it["name"], it["category"],
+                           float(it["price"]), it["gst"]) for it in items])
+        rollup.apply_order(conn, order_date, order_type, payment_mode, subtotal, gst_amount, discount_amount, total,
+                           [(it["item_id"], it["name"], it["category"], it["price"], it["quantity"]) for it in items])
+        if table_id is not None and occupy_table:
+            table_state.transition(conn, table_id, "occupied", order_id)
+        kitchen.enqueue(conn, order_id, order_type, table_id, items, order_date)
+    if table_id is not None and occupy_table:
+        _table_board.refresh()
+    _kitchen_hub.poke()
 
-    # append to JSON file
     bill_record = {
         "order_id": order_id,
         "order_type": order_type,
@@ -203,164 +311,569 @@ def save_order(order_type, payment_mode, subtotal, gst_amount, discount_amount,
         "order_date": order_date,
         "items": items
     }
-    _append_json_line(SAMPLE_BILLS_JSON, bill_record)
-
-    # append to sales csv
-    _append_sales_csv(order_id, order_date, items)
-
+    _journal().submit(bill_record)
     return order_id
 
-def _append_json_line(path, record):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+# open tickets (running tabs): see utils/tickets.py
+TicketClosed = tickets.TicketClosed
+
+def open_ticket(order_type="Dine-In", table_id=None):
+    """Open an empty running tab, seating table_id on it (compare-and-set); returns the order id."""
+    with _pool().transaction() as conn:
+        order_id = tickets.open_ticket(conn, order_type, table_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        if table_id is not None:
+            table_state.transition(conn, table_id, "occupied", order_id)
+    if table_id is not None:
+        _table_board.refresh()
+    return order_id
 
-def _append_sales_csv(order_id, order_date, items):
-    os.makedirs(os.path.dirname(SALES_CSV), exist_ok=True)
-    header = not os.path.exists(SALES_CSV)
-    rows = []
+def add_to_ticket(order_id, items):
+    """Append a round (dicts {item_id, quantity[, name, price, gst, category]}); returns the new line ids."""
+    items = _priced_lines(items)
+    with _pool().transaction() as conn:
+        line_ids = tickets.append(conn, order_id, items)
+        order_type, table_id = conn.execute("SELECT order_type, table_id FROM orders WHERE id = ?",
+                                            (int(order_id),)).fetchone()
+        # each round goes to the kitchen as it is added
+        kitchen.enqueue(conn, order_id, order_type, table_id, items, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    _kitchen_hub.poke()
+    return line_ids
+
+def void_ticket_line(order_id, line_id, quantity=None):
+    """Void `quantity` (default: all) of one line of an open ticket; returns the quantity voided."""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with _pool().transaction() as conn:
+        line = conn.execute("SELECT item_name, category FROM order_items WHERE id = ? AND order_id = ?",
+                            (int(line_id), int(order_id))).fetchone()
+        voided = tickets.void(conn, order_id, line_id, quantity, now)
+        if voided:
+            # the kitchen stops making what was voided
+            kitchen.void(conn, order_id, line[0], line[1], voided, now)
+    if voided:
+        _kitchen_hub.poke()
+    return voided
+
+def settle_ticket(order_id, payment_mode, discount_type="None", discount_value=0.0):
+    """Close a running tab with payment; its table moves on to cleaning. Returns the final total."""
+    closed_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with _pool().transaction() as conn:
+        record = tickets.settle(conn, order_id, payment_mode, closed_at, discount_type, discount_value)
+        freed = False
+        if record["table_id"] is not None:
+            try:
+                table_state.transition(conn, record["table_id"], "cleaning", expected_order_id=order_id)
+                freed = True
+            except TableConflict:
+                pass  # table was already cleared or re-seated by hand
+    if freed:
+        _table_board.refresh()
+    _receipt_cache.invalidate(DB_PATH, [int(order_id)])
+    _journal().submit(record)
+    return record["total"]
+
+# kitchen queue: see utils/kitchen.py
+TicketStateError = kitchen.TicketStateError
+
+def _kitchen_active():
+    with _pool().connection() as conn:
+        return kitchen.active(conn)
+
+def _kitchen_changes(seq):
+    with _pool().connection() as conn:
+        return kitchen.changes_since(conn, seq)
+
+_kitchen_hub = kitchen.KitchenHub(_kitchen_active, _kitchen_changes)
+
+def kitchen_subscribe(stations=None, on_ready=None, buffer=None):
+    """A kitchen.Subscriber for display clients of the given stations (None = all)."""
+    return _kitchen_hub.subscribe(stations, on_ready, buffer)
+
+def get_kitchen_tickets(stations=None):
+    """Active (not yet served) kitchen tickets, oldest first: (seq, [ticket dicts])."""
+    seq, active = _kitchen_active()
+    return seq, [t for t in active if not stations or t["station"] in stations]
+
+def advance_kitchen_ticket(ticket_id, status):
+    """new -> preparing -> ready -> served (compare-and-set); raises TicketStateError."""
+    with _pool().transaction() as conn:
+        kitchen.advance(conn, ticket_id, status, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    _kitchen_hub.poke()
+
+def get_open_tickets():
+    import pandas as pd
+    with _pool().connection() as conn:
+        rows = tickets.open_tickets(conn)
+    return pd.DataFrame(rows, columns=["order_id", "order_type", "table_id", "opened_at", "subtotal", "gst_amount",
+                                       "total_amount"])
+
+def get_ticket_lines(order_id):
+    import pandas as pd
+    with _pool().connection() as conn:
+        return pd.read_sql_query("""SELECT id AS line_id, item_name, quantity, unit_price, gst_rate
+                                    FROM order_items WHERE order_id = ? ORDER BY id""", conn, params=(int(order_id),))
+
+def place_order(order_type, payment_mode, items, table_id=None, discount_type="None", discount_value=0.0):
+    """
+    Price and commit a one-shot order from {item_id, quantity} lines (menu
+    prices and GST filled in); returns (order_id, bill) with bill from compute_bill().
+    """
+    items = _priced_lines(items)
+    bill = compute_bill(items, discount_type, discount_value)
+    order_id = commit_order(order_type, payment_mode, bill["subtotal"], bill["gst_amount"], bill["discount_amount"],
+                            bill["total"], items, table_id=table_id, occupy_table=table_id is not None)
+    return order_id, bill
+
+def _complete_lines(items):
+    # fill name/price/gst/category from the cached menu when a caller only sent item_id + quantity
+    menu = None
+    lines = []
     for it in items:
-        rows.append({
-            "order_id": order_id,
-            "order_date": order_date,
-            "item_name": it.get("name"),
-            "quantity": it.get("quantity"),
-            "price": it.get("price"),
-            "line_total": float(it.get("price")) * int(it.get("quantity"))
-        })
-    df = pd.DataFrame(rows)
-    df.to_csv(SALES_CSV, mode="a", header=header, index=False, encoding="utf-8")
+        line = dict(it)
+        for key, col in (("name", "item_name"), ("price", "price"), ("gst", "gst"), ("category", "category")):
+            if line.get(key) is None:
+                menu = menu or get_menu_snapshot()
+                line[key] = menu.by_id.get(int(line["item_id"]), {}).get(col)
+        lines.append(line)
+    return lines
+
+def _priced_lines(items):
+    # _complete_lines() for callers that send bare item ids (API, tabs): unknown ids are an error
+    items = _complete_lines(items)
+    missing = [it["item_id"] for it in items if it.get("price") is None]
+    if missing:
+        raise ValueError(f"unknown menu item(s): {', '.join(map(str, missing))}")
+    return items
+
+def save_order(order_type, payment_mode, subtotal, gst_amount, discount_amount, total, items, table_id=None):
+    """
+    items: list of dicts {item_id, name, price, quantity}
+    returns order_id
+    """
+    return commit_order(order_type, payment_mode, subtotal, gst_amount, discount_amount, total, items,
+                        table_id=table_id, occupy_table=False)
+
+def _journal():
+    return journal.get_writer(SAMPLE_BILLS_JSON, SALES_CSV)
+
+def flush_order_mirrors():
+    """Block until every queued JSON/CSV mirror write is on disk."""
+    _journal().flush()
+
+def _load_bill_records(order_ids):
+    # rebuild commit_order()-style bill records from the DB (journal crash replay)
+    records = []
+    with _pool().connection() as conn:
+        for oid in order_ids:
+            order = conn.execute("""SELECT id, order_type, table_id, payment_mode, subtotal, gst_amount,
+                                           discount_amount, total_amount, order_date
+                                    FROM orders WHERE id=?""", (oid,)).fetchone()
+            if not order:
+                continue
+            lines = conn.execute("""SELECT item_id, item_name, unit_price, quantity, gst_rate, category
+                                    FROM order_items WHERE order_id = ? ORDER BY id""", (oid,)).fetchall()
+            records.append({
+                "order_id": order[0], "order_type": order[1], "table_id": order[2], "payment_mode": order[3],
+                "subtotal": order[4], "gst": order[5], "discount": order[6], "total": order[7],
+                "order_date": order[8],
+                "items": [{"item_id": l[0], "name": l[1], "price": l[2] or 0.0, "quantity": l[3],
+                           "gst": l[4], "category": l[5]} for l in lines]
+            })
+    return records
+
+def reconcile_order_journals():
+    """
+    Crash-replay check: make sample_bills.json and sales_report.csv hold
+    exactly one entry per committed order. Returns journal.reconcile()'s summary.
+    """
+    _journal().flush()
+    with _pool().connection() as conn:
+        order_ids = [r[0] for r in conn.execute("SELECT id FROM orders WHERE status = 'closed'")]
+    return journal.reconcile(order_ids, _load_bill_records, SAMPLE_BILLS_JSON, SALES_CSV)
 
 # fetch order details
+# the bill queries, shared with benchmarks/check_query_plans.py
+_ORDER_SQL = ("SELECT id, order_type, table_id, payment_mode, subtotal, gst_amount, discount_amount, total_amount, "
+              "order_date FROM orders WHERE id=?")
+_ORDER_LINES_SQL = """SELECT quantity, item_name, COALESCE(unit_price, 0), gst_rate
+                      FROM order_items WHERE order_id = ? ORDER BY id"""
+
 def fetch_order_details(order_id):
-    conn = _connect()
-    cur = conn.cursor()
-    cur.execute("SELECT id, order_type, table_id, payment_mode, subtotal, gst_amount, discount_amount, total_amount, order_date FROM orders WHERE id=?", (int(order_id),))
-    order = cur.fetchone()
-    cur.execute("""SELECT oi.quantity, m.item_name, m.price, m.gst
-                   FROM order_items oi JOIN menu m ON oi.item_id = m.id
-                   WHERE oi.order_id = ?""", (int(order_id),))
-    items = cur.fetchall()
-    conn.close()
+    with _pool().connection() as conn:
+        cur = conn.cursor()
+        cur.execute(_ORDER_SQL, (int(order_id),))
+        order = cur.fetchone()
+        cur.execute(_ORDER_LINES_SQL, (int(order_id),))
+        items = cur.fetchall()
     return order, items
 
 # reporting helpers
-def get_sales_dataframe(start_date=None, end_date=None):
-    conn = _connect()
+_SALES_COLUMNS = ["order_id", "order_date", "order_type", "payment_mode", "item_name", "category",
+                  "price", "quantity", "line_total"]
+
+def _pruned_through():
+    with _pool().connection() as conn:
+        return archive.get_mark(conn, archive.PRUNED_KEY)
+
+def _sales_query(start_date=None, end_date=None):
+    """The SQL and params get_sales_dataframe runs (also plan-checked by benchmarks/check_query_plans.py)."""
     query = """
     SELECT o.id as order_id, o.order_date, o.order_type, o.payment_mode,
-           m.item_name, m.category, m.price, oi.quantity, (oi.quantity * m.price) as line_total
+           oi.item_name, oi.category, oi.unit_price as price, oi.quantity,
+           (oi.quantity * oi.unit_price) as line_total
     FROM orders o
     JOIN order_items oi ON o.id = oi.order_id
-    JOIN menu m ON oi.item_id = m.id
     """
+    # open tickets have no order_date yet, so the date filter already skips them
     params = []
     if start_date and end_date:
         query += " WHERE o.order_date BETWEEN ? AND ?"
         params = [start_date + " 00:00:00", end_date + " 23:59:59"]
-    query += " ORDER BY o.order_date DESC"
-    df = pd.read_sql_query(query, _connect(), params=params)
+    else:
+        query += " WHERE o.status = 'closed'"
+    return query + " ORDER BY o.order_date DESC", params
+
+def get_sales_dataframe(start_date=None, end_date=None):
+    import pandas as pd
+    query, params = _sales_query(start_date, end_date)
+    with _pool().connection() as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+    # days pruned from SQLite are read back from the Parquet archive
+    pruned = _pruned_through()
+    if pruned and archive.available() and (not start_date or start_date <= pruned):
+        old = archive.scan(ARCHIVE_DIR, "lines", _SALES_COLUMNS, start_date,
+                           min(end_date or pruned, pruned)).to_pandas()
+        if df.empty:
+            df = old.iloc[::-1].reset_index(drop=True)
+        elif not old.empty:
+            df = pd.concat([df, old], ignore_index=True).sort_values("order_date", ascending=False,
+                                                                     kind="stable", ignore_index=True)
     if not df.empty:
         df["order_date"] = pd.to_datetime(df["order_date"])
     return df
 
-def most_sold_items_df(df, top_n=10):
+def export_sales(dest, fmt="csv", start_date=None, end_date=None, progress=None, chunk_size=exporter.CHUNK_SIZE):
+    """
+    Stream line items to a path / binary stream in chunks (csv, jsonl, parquet, pdf); returns rows written.
+    Days pruned from SQLite are included from the Parquet archive.
+    """
+    with _pool().connection() as conn:
+        return exporter.export_sales(conn, dest, fmt, start_date, end_date, chunk_size, progress,
+                                     archive_root=ARCHIVE_DIR)
+
+def rebuild_sales_rollup(start_date=None, end_date=None):
+    """Backfill / repair the daily rollup from orders (whole history if no range); pruned days are kept."""
+    with _pool().transaction() as conn:
+        rollup.rebuild(conn, start_date, end_date)
+
+def archive_closed_days(start_date=None, end_date=None, prune_older_than=None):
+    """
+    Nightly compaction: write closed days to the Parquet archive, then optionally
+    delete archived orders older than `prune_older_than` days from SQLite (once a
+    central store exists, only orders it has already consolidated).
+    """
+    # reads only, so order commits are not blocked while the files are written
+    with _pool().connection() as conn:
+        result = archive.compact(conn, ARCHIVE_DIR, start_date, end_date)
+    if prune_older_than is not None:
+        before = (datetime.now().date() - timedelta(days=prune_older_than)).isoformat()
+        synced = _synced_seq()
+        with _pool().transaction() as conn:
+            result["pruned"] = archive.prune(conn, before, synced)
+    return result
+
+def _synced_seq():
+    # orders the central store has not pulled yet must stay in the shard; no central store, no limit
+    if not os.path.exists(CENTRAL_DB_PATH):
+        return None
+    with _central().connection() as conn:
+        row = conn.execute("SELECT high_water FROM branches WHERE branch_id = ?", (BRANCH_ID,)).fetchone()
+    return row[0] if row else 0
+
+def get_sales_trend(start_date=None, end_date=None, period="month"):
+    """
+    Orders and revenue per day / month / year. Archived days come from the
+    Parquet archive, the days after it from the daily rollup.
+    """
+    import pandas as pd
+    n = archive.PERIODS[period]
+    with _pool().connection() as conn:
+        through = archive.get_mark(conn, archive.ARCHIVED_KEY) if archive.available() else None
+        live_start = start_date
+        if through and (not start_date or start_date <= through):
+            live_start = (datetime.strptime(through, "%Y-%m-%d").date() + timedelta(days=1)).isoformat()
+        where, params = " WHERE day >= ?", [live_start or ""]
+        if end_date:
+            where, params = where + " AND day <= ?", params + [end_date]
+        rows = conn.execute(f"SELECT substr(day, 1, {n}), SUM(orders), SUM(total_amount) FROM sales_daily_orders"
+                            + where + " GROUP BY 1 ORDER BY 1", params).fetchall()
+    if through and (not start_date or start_date <= through):
+        rows = archive.trend(ARCHIVE_DIR, start_date, min(end_date or through, through), period) + rows
+    df = pd.DataFrame(rows, columns=["period", "orders", "total_amount"])
+    # a month can straddle the archive mark
+    return df.groupby("period", as_index=False).sum()
+
+def get_sales_summary(start_date=None, end_date=None):
+    """
+    Report figures from the daily rollup: (totals dict, per day x item DataFrame).
+    totals has orders, subtotal, gst_amount, discount_amount, total_amount.
+    """
+    import pandas as pd
+    with _pool().connection() as conn:
+        totals = rollup.totals(conn, start_date, end_date)
+        rows = rollup.item_rows(conn, start_date, end_date)
+    return totals, pd.DataFrame(rows, columns=rollup.ITEM_COLUMNS)
+
+def get_most_sold_items(start_date=None, end_date=None, top_n=10):
+    import pandas as pd
+    with _pool().connection() as conn:
+        rows = rollup.most_sold(conn, start_date, end_date, top_n)
+    return pd.DataFrame(rows, columns=["item_name", "quantity"])
+
+def _most_sold_history(start_date, end_date, top_n):
+    import pandas as pd
+    with _pool().connection() as conn:
+        through = archive.get_mark(conn, archive.ARCHIVED_KEY) if archive.available() else None
+        if not through or (start_date and start_date > through):
+            return get_most_sold_items(start_date, end_date, top_n)
+        live_start = (datetime.strptime(through, "%Y-%m-%d").date() + timedelta(days=1)).isoformat()
+        live = conn.execute("""SELECT item_id, MAX(item_name), SUM(quantity) FROM sales_daily
+                               WHERE day >= ? AND day <= ? GROUP BY item_id""",
+                            (live_start, end_date or "9999-12-31")).fetchall()
+    old_end = min(end_date or through, through)
+    qty = archive.item_quantities(ARCHIVE_DIR, start_date, old_end)
+    names = {}
+    for item_id, name, q in live:
+        qty[item_id] = qty.get(item_id, 0) + q
+        names[item_id] = name
+    best = sorted(qty.items(), key=lambda kv: kv[1], reverse=True)[:top_n]
+    missing = [i for i, _ in best if i not in names]
+    if missing:
+        names.update(archive.item_names(ARCHIVE_DIR, missing, start_date, old_end))
+    return pd.DataFrame([(names.get(i), q) for i, q in best], columns=["item_name", "quantity"])
+
+def recalculate_orders(start_date=None, end_date=None, apply=False):
+    """
+    Re-price stored orders from their line snapshots with the batch bill engine.
+    The stored discount_amount is treated as a fixed discount. Returns a DataFrame
+    of orders whose stored figures differ; with apply=True those rows are updated.
+    """
+    import pandas as pd
+    where, params = " WHERE o.status = 'closed'", []
+    if start_date and end_date:
+        where, params = " WHERE o.order_date BETWEEN ? AND ?", [start_date + " 00:00:00", end_date + " 23:59:59"]
+    with _pool().connection() as conn:
+        orders = pd.read_sql_query("SELECT id, subtotal, gst_amount, discount_amount, total_amount FROM orders o"
+                                   + where + " ORDER BY id", conn, params=params)
+        lines = pd.read_sql_query("""SELECT oi.order_id, COALESCE(oi.unit_price, 0) AS price, oi.quantity,
+                                            COALESCE(oi.gst_rate, 5) AS gst
+                                     FROM orders o JOIN order_items oi ON o.id = oi.order_id""" + where,
+                                  conn, params=params)
+    if orders.empty:
+        return orders
+    pos = pd.Series(range(len(orders)), index=orders["id"])
+    res = compute_bills(pos.loc[lines["order_id"]].to_numpy(), lines["price"], lines["quantity"], lines["gst"],
+                        ["Fixed amount"] * len(orders), orders["discount_amount"].fillna(0), n_orders=len(orders))
+    fresh = orders[["id"]].assign(new_subtotal=res["subtotal"], new_gst_amount=res["gst_amount"],
+                                  new_total_amount=res["total"])
+    diff = orders.join(fresh.drop(columns="id"))
+    changed = diff[((diff["subtotal"] - diff["new_subtotal"]).abs() > 0.005) |
+                   ((diff["gst_amount"] - diff["new_gst_amount"]).abs() > 0.005) |
+                   ((diff["total_amount"] - diff["new_total_amount"]).abs() > 0.005)]
+    if apply and not changed.empty:
+        with _pool().transaction() as conn:
+            conn.executemany("UPDATE orders SET subtotal = ?, gst_amount = ?, total_amount = ? WHERE id = ?",
+                             [(float(sub), float(gst), float(tot), int(oid)) for sub, gst, tot, oid in
+                              changed[["new_subtotal", "new_gst_amount", "new_total_amount", "id"]]
+                              .itertuples(index=False, name=None)])
+            rollup.rebuild(conn, start_date, end_date)
+        _receipt_cache.invalidate(DB_PATH, changed["id"].tolist())
+    return changed
+
+def most_sold_items_df(df=None, top_n=10, start_date=None, end_date=None):
+    """Best sellers from a sales DataFrame or, with df=None, from the archive + rollup for the date range."""
+    import pandas as pd
+    if df is None:
+        return _most_sold_history(start_date, end_date, top_n)
     if df.empty:
         return pd.DataFrame(columns=["item_name", "quantity"])
     ms = df.groupby("item_name")["quantity"].sum().reset_index().sort_values(by="quantity", ascending=False)
     return ms.head(top_n)
 
+# end-of-day settlement (Z-report), see utils/settlement.py
+def close_day(day=None):
+    """
+    Settle `day` (default today): compute its Z-report, render the CSV and PDF
+    once and freeze them. Returns (summary, created); a day that is already
+    settled keeps its first record and is returned with created=False.
+    """
+    day = day or datetime.now().strftime("%Y-%m-%d")
+    datetime.strptime(day, "%Y-%m-%d")
+    with _pool().connection() as conn:
+        summary = settlement.get(conn, day)
+        if summary is not None:
+            return summary, False
+        if day > datetime.now().strftime("%Y-%m-%d"):
+            raise ValueError(f"{day} has not started yet")
+        pruned = archive.get_mark(conn, archive.PRUNED_KEY)
+        if pruned and day <= pruned:
+            raise ValueError(f"{day} was pruned to the archive (through {pruned}) and can no longer be settled")
+        summary = settlement.compute(conn, day)
+    # rendered outside the write transaction so order commits are not held up
+    summary["closed_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    csv_text, pdf = settlement.to_csv(summary), settlement.to_pdf(summary)
+    with _pool().transaction() as conn:
+        if settlement.freeze(conn, summary, csv_text, pdf):
+            return summary, True
+        return settlement.get(conn, day), False
+
+def get_settlement(day):
+    """A settled day's Z-report figures plus `late_orders` (orders recorded after it closed); None if not settled."""
+    with _pool().connection() as conn:
+        summary = settlement.get(conn, day)
+        if summary is not None:
+            summary["late_orders"] = settlement.late_orders(conn, summary)
+    return summary
+
+def get_settlement_document(day, fmt="pdf"):
+    """The frozen Z-report: bytes for "pdf", str for "csv"; None if the day is not settled."""
+    with _pool().connection() as conn:
+        return settlement.document(conn, day, fmt)
+
+def get_settlements(start_date=None, end_date=None):
+    import pandas as pd
+    with _pool().connection() as conn:
+        rows = settlement.listing(conn, start_date, end_date)
+    return pd.DataFrame(rows, columns=settlement.SUMMARY_COLUMNS)
+
+# branches: consolidated chain-wide reporting, see utils/branches.py
+_central_ready = set()
+
+def _central():
+    # the central store's tables are created once per process
+    if CENTRAL_DB_PATH not in _central_ready:
+        os.makedirs(os.path.dirname(CENTRAL_DB_PATH), exist_ok=True)
+        with get_pool(CENTRAL_DB_PATH).transaction() as conn:
+            branches.create_central_tables(conn)
+        _central_ready.add(CENTRAL_DB_PATH)
+    return get_pool(CENTRAL_DB_PATH)
+
+def chain_available():
+    """True once the central store has at least one branch registered."""
+    if not os.path.exists(CENTRAL_DB_PATH):
+        return False
+    with _central().connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM branches").fetchone()[0] > 0
+
+def register_branch(branch_id, db_path, name=None):
+    with _central().transaction() as conn:
+        branches.register(conn, branch_id, db_path, name)
+
+def consolidate_branches(workers=None, batch=branches.BATCH):
+    """
+    Register the shards found at MAIN_DB_PATH and in SHARD_DIR, then pull
+    every branch's newly closed orders into the central store.
+    Returns {"orders": {branch: pulled}, "errors": {branch: message}}.
+    """
+    pool = _central()
+    with pool.transaction() as conn:
+        branches.discover(conn, [MAIN_DB_PATH] + sorted(glob(os.path.join(SHARD_DIR, "*.db"))))
+    return branches.sync(pool, workers, batch)
+
+def get_branch_status():
+    import pandas as pd
+    with _central().connection() as conn:
+        return pd.DataFrame(branches.status(conn), columns=branches.STATUS_COLUMNS)
+
+def get_chain_summary(start_date=None, end_date=None):
+    """Consolidated figures for all branches: (chain totals dict, one row per branch DataFrame)."""
+    import pandas as pd
+    with _central().connection() as conn:
+        rows = branches.branch_totals(conn, start_date, end_date)
+    df = pd.DataFrame(rows, columns=branches.BRANCH_TOTAL_COLUMNS)
+    totals = {c: (int if c == "orders" else float)(df[c].sum()) for c in branches.BRANCH_TOTAL_COLUMNS[2:]}
+    return totals, df
+
+def get_chain_trend(start_date=None, end_date=None):
+    """Sales per day (index) and branch (columns) from the central store."""
+    import pandas as pd
+    with _central().connection() as conn:
+        rows = branches.daily_totals(conn, start_date, end_date)
+    df = pd.DataFrame(rows, columns=["day", "branch_id", "total_amount"])
+    return df.pivot(index="day", columns="branch_id", values="total_amount").fillna(0)
+
+def get_chain_top_items(start_date=None, end_date=None, top_n=10, branch_id=None):
+    import pandas as pd
+    with _central().connection() as conn:
+        rows = branches.top_items(conn, start_date, end_date, top_n, branch_id)
+    return pd.DataFrame(rows, columns=["item_name", "quantity", "revenue"])
+
 # export helpers: bill -> csv/json/pdf and report -> pdf
+_receipt_cache = receipts.ReceiptCache()
+
+def get_receipt(order_id, fmt="pdf"):
+    """
+    Rendered receipt: str for "csv"/"json", bytes for "pdf"; None if the order
+    does not exist. The order is fetched once and every format renders from it.
+    """
+    # closed orders never change, so their rendered receipts never go stale
+    # (recalculate_orders drops the ones it rewrites); an open ticket's
+    # running check is rendered fresh every time
+    order_id = int(order_id)
+    data = _receipt_cache.get(DB_PATH, order_id, fmt)
+    if data is not None:
+        return data
+    receipt = _receipt_cache.get(DB_PATH, order_id, "record")
+    if receipt is None:
+        with _pool().connection() as conn:
+            receipt = receipts.fetch(conn, [order_id]).get(order_id)
+        if receipt is None:
+            return None
+        if receipt["status"] != tickets.CLOSED:
+            return receipts.render(receipt, fmt)
+        _receipt_cache.put(DB_PATH, order_id, "record", receipt, receipts.receipt_size(receipt))
+    data = receipts.render(receipt, fmt)
+    _receipt_cache.put(DB_PATH, order_id, fmt, data, len(data))
+    return data
+
 def bill_to_csv_string(order_id):
-    order, items = fetch_order_details(order_id)
-    if not order:
-        return None
-    rows = []
-    for qty, name, price, gst in items:
-        rows.append({"item_name": name, "quantity": qty, "price": price, "line_total": qty * price})
-    df = pd.DataFrame(rows)
-    df.loc[len(df.index)] = ["", "", "Total", order[7]]
-    return df.to_csv(index=False)
+    return get_receipt(order_id, "csv")
 
 def bill_to_json_str(order_id):
-    order, items = fetch_order_details(order_id)
-    if not order:
-        return None
-    order_obj = {
-        "order_id": order[0],
-        "order_type": order[1],
-        "table_id": order[2],
-        "payment_mode": order[3],
-        "total_amount": order[7],
-        "order_date": order[8],
-        "items": []
-    }
-    for qty, name, price, gst in items:
-        order_obj["items"].append({"item_name": name, "quantity": qty, "price": price, "line_total": qty * price})
-    return json.dumps(order_obj, ensure_ascii=False, indent=4)
+    return get_receipt(order_id, "json")
 
 def bill_to_pdf_bytes(order_id):
-    order, items = fetch_order_details(order_id)
-    if not order:
-        return None
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", "B", 14)
-    pdf.cell(0, 10, "Restaurant Bill", ln=True, align="C")
-    pdf.ln(4)
-    pdf.set_font("Arial", size=11)
-    pdf.cell(0, 8, f"Order ID: {order[0]}  |  Type: {order[1]}  |  Table: {order[2]}", ln=True)
-    pdf.cell(0, 8, f"Date: {order[8]}", ln=True)
-    pdf.ln(4)
-    pdf.set_font("Arial", "B", 11)
-    pdf.cell(80, 8, "Item", border=1)
-    pdf.cell(30, 8, "Price", border=1, align="R")
-    pdf.cell(20, 8, "Qty", border=1, align="R")
-    pdf.cell(30, 8, "Total", border=1, align="R")
-    pdf.ln()
-    pdf.set_font("Arial", size=11)
-    subtotal = 0.0
-    for qty, name, price, gst in items:
-        line_total = qty * price
-        subtotal += line_total
-        pdf.cell(80, 8, str(name), border=1)
-        pdf.cell(30, 8, f"{price:.2f}", border=1, align="R")
-        pdf.cell(20, 8, str(qty), border=1, align="R")
-        pdf.cell(30, 8, f"{line_total:.2f}", border=1, align="R")
-        pdf.ln()
-    gst_amount = subtotal * 0.05
-    total = subtotal + gst_amount
-    pdf.ln(6)
-    pdf.cell(130, 8, "", ln=False)
-    pdf.cell(30, 8, "Subtotal:", align="R")
-    pdf.cell(30, 8, f"{subtotal:.2f}", align="R", ln=True)
-    pdf.cell(130, 8, "", ln=False)
-    pdf.cell(30, 8, "GST (5%):", align="R")
-    pdf.cell(30, 8, f"{gst_amount:.2f}", align="R", ln=True)
-    pdf.cell(130, 8, "", ln=False)
-    pdf.set_font("Arial", "B", 12)
-    pdf.cell(30, 8, "Total:", align="R")
-    pdf.cell(30, 8, f"{total:.2f}", align="R", ln=True)
-    return pdf.output(dest="S").encode("latin-1")
-
-def report_df_to_pdf_bytes(df, title="Report"):
-    buf = io.BytesIO()
-    c = canvas.Canvas(buf, pagesize=A4)
-    width, height = A4
-    x = 40
-    y = height - 40
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(x, y, title)
-    y -= 25
-    c.setFont("Helvetica", 10)
-    line_h = 14
-    for i, row in df.iterrows():
-        line = " | ".join([f"{col}: {row[col]}" for col in df.columns])
-        c.drawString(x, y, str(line)[:200])
-        y -= line_h
-        if y < 60:
-            c.showPage()
-            y = height - 40
-    c.save()
-    buf.seek(0)
-    return buf.read()
+    return get_receipt(order_id, "pdf")
+
+def archive_day_receipts(day, out_dir=None, workers=None):
+    """End of day: render every receipt of `day` to <out_dir>/<day>/ as PDF; returns (files, bytes)."""
+    with _pool().connection() as conn:
+        day_receipts = receipts.fetch_day(conn, day)
+    return receipts.write_batch(day_receipts, os.path.join(out_dir or RECEIPTS_DIR, day), workers)
+
+def report_df_to_pdf_bytes(df, title="Report", totals=()):
+    """Tabular multi-page PDF of a DataFrame (column header on every page, optional totals row)."""
+    from utils import report_pdf  # reportlab is only loaded once a report is exported
+    return report_pdf.dataframe_to_pdf(df, title=title, totals=totals)
+
+
+# metrics: gauges are read when the metrics are rendered; every public function above is timed
+def _pool_gauge(key):
+    return lambda: {(stats["path"],): stats[key] for stats in pool_stats()}
+
+def _stats_gauge(fn):
+    return lambda: {(k,): v for k, v in fn().items()}
+
+metrics.gauge("rbs_db_connections_open", "Open pooled SQLite connections.", _pool_gauge("open"), ("path",))
+metrics.gauge("rbs_db_connections_idle", "Idle pooled SQLite connections.", _pool_gauge("idle"), ("path",))
+metrics.gauge("rbs_db_connections_opened", "Connections opened since start.", _pool_gauge("opened_total"), ("path",))
+metrics.gauge("rbs_db_checkouts", "Pool checkouts since start.", _pool_gauge("checkouts"), ("path",))
+metrics.gauge("rbs_journal", "Order journal (JSON/CSV mirror) writer counters.",
+              _stats_gauge(lambda: _journal().stats()), ("stat",))
+metrics.gauge("rbs_menu_cache", "Menu snapshot cache counters.",
+              _stats_gauge(lambda: {"hits": _menu_cache.hits, "loads": _menu_cache.loads}), ("stat",))
+metrics.gauge("rbs_receipt_cache", "Receipt cache counters.",
+              _stats_gauge(lambda: {"hits": _receipt_cache.hits, "misses": _receipt_cache.misses}), ("stat",))
+metrics.gauge("rbs_table_board_loads", "Table board reloads from the DB.", lambda: _table_board.loads)
+metrics.gauge("rbs_kitchen_subscribers", "Connected kitchen display subscribers.", lambda: _kitchen_hub.subscribers)
+
+metrics.instrument(globals(), skip=("slugify", "resolve_image_path"))
@@ -0,0 +1,182 @@
+"""
+Streaming sales export with bounded memory.
+
+Rows are pulled from SQLite with fetchmany() in chunks and written
+incrementally to a path or binary stream as CSV, JSON Lines, Parquet
+(needs pyarrow) or PDF, so a year of line items never has to fit in a
+DataFrame. (reportlab still keeps finished PDF pages until save(); the
+PDF output is compressed but not constant-memory.) Days pruned from
+SQLite are read back from the Parquet archive a month at a time, like
+the reports do.
+"""
+import csv
+import io
+import itertools
+import json
+
+from utils import archive
+
+EXPORT_COLUMNS = ["order_id", "order_date", "order_type", "payment_mode",
+                  "item_name", "category", "price", "quantity", "line_total"]
+FORMATS = ("csv", "jsonl", "parquet", "pdf")
+CHUNK_SIZE = 10000
+
+_QUERY = """
+    SELECT o.id, o.order_date, o.order_type, o.payment_mode,
+           oi.item_name, oi.category, oi.unit_price, oi.quantity, oi.quantity * oi.unit_price
+    FROM orders o
+    JOIN order_items oi ON o.id = oi.order_id
+"""
+
+
+def _where(start_date, end_date):
+    if start_date and end_date:
+        return " WHERE o.order_date BETWEEN ? AND ?", [start_date + " 00:00:00", end_date + " 23:59:59"]
+    # open tickets have no order_date until they are settled
+    return " WHERE o.order_date IS NOT NULL", []
+
+
+def count_rows(conn, start_date=None, end_date=None):
+    where, params = _where(start_date, end_date)
+    return conn.execute("SELECT COUNT(*) FROM orders o JOIN order_items oi ON o.id = oi.order_id" + where,
+                        params).fetchone()[0]
+
+
+def iter_chunks(conn, start_date=None, end_date=None, chunk_size=CHUNK_SIZE):
+    """Yield lists of up to chunk_size row tuples (EXPORT_COLUMNS order), oldest first."""
+    where, params = _where(start_date, end_date)
+    # (order_date, id) is the idx_orders_order_date order, so rows stream without a temp sort
+    cur = conn.execute(_QUERY + where + " ORDER BY o.order_date, o.id", params)
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+def archived_range(conn, archive_root, start_date=None, end_date=None):
+    """
+    The part of [start_date, end_date] that was pruned from SQLite, as
+    (start, end), or None. Raises RuntimeError if those days can only be
+    read from the archive and pyarrow is missing.
+    """
+    pruned = archive.get_mark(conn, archive.PRUNED_KEY) if archive_root else None
+    if not pruned or (start_date and start_date > pruned):
+        return None
+    if not archive.available():
+        raise RuntimeError(f"days through {pruned} were pruned to the archive; exporting them needs pyarrow "
+                           "(pip install pyarrow)")
+    return start_date, min(end_date or pruned, pruned)
+
+
+# ------------------ writers ------------------
+class _CsvWriter:
+    def __init__(self, out):
+        self._text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+        self._csv = csv.writer(self._text)
+        self._csv.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows):
+        self._csv.writerows(rows)
+
+    def close(self):
+        self._text.flush()
+        self._text.detach()
+
+
+class _JsonlWriter:
+    def __init__(self, out):
+        self._out = out
+
+    def write(self, rows):
+        self._out.write("".join(json.dumps(dict(zip(EXPORT_COLUMNS, r)), ensure_ascii=False) + "\n"
+                                for r in rows).encode("utf-8"))
+
+    def close(self):
+        self._out.flush()
+
+
+class _ParquetWriter:
+    def __init__(self, out):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        self._pa = pa
+        self._schema = pa.schema([
+            ("order_id", pa.int64()), ("order_date", pa.string()), ("order_type", pa.string()),
+            ("payment_mode", pa.string()), ("item_name", pa.string()), ("category", pa.string()),
+            ("price", pa.float64()), ("quantity", pa.int64()), ("line_total", pa.float64()),
+        ])
+        self._writer = pq.ParquetWriter(out, self._schema, compression="zstd")
+
+    def write(self, rows):
+        cols = list(zip(*rows))
+        self._writer.write_table(self._pa.Table.from_arrays(
+            [self._pa.array(c, type=f.type) for c, f in zip(cols, self._schema)], schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+class _PdfWriter:
+    COLUMNS = [("order_id", 45, "right", "%d"), ("order_date", 95), ("order_type", 55), ("payment_mode", 60),
+               ("item_name", 150), ("category", 85), ("price", 60, "right", "%.2f"),
+               ("quantity", 45, "right", "%d"), ("line_total", 70, "right", "%.2f")]
+
+    def __init__(self, out, title):
+        from utils.report_pdf import TableReport
+        self._report = TableReport(out, self.COLUMNS, title=title, totals=["quantity", "line_total"])
+
+    def write(self, rows):
+        self._report.write_rows(rows)
+
+    def close(self):
+        self._report.close()
+
+
+def _open_writer(fmt, out, title):
+    if fmt == "csv":
+        return _CsvWriter(out)
+    if fmt == "jsonl":
+        return _JsonlWriter(out)
+    if fmt == "parquet":
+        return _ParquetWriter(out)
+    if fmt == "pdf":
+        return _PdfWriter(out, title)
+    raise ValueError(f"unknown export format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+
+def export_sales(conn, dest, fmt="csv", start_date=None, end_date=None, chunk_size=CHUNK_SIZE,
+                 progress=None, title="Sales report", archive_root=None):
+    """
+    Stream sales line items for [start_date, end_date] into `dest` (a path or a
+    writable binary file object). progress(rows_written, total_rows) is called
+    after every chunk. With archive_root, days pruned from SQLite come from the
+    archive there (they are all older than the rows still in SQLite).
+    Returns the number of rows written.
+    """
+    old = archived_range(conn, archive_root, start_date, end_date)
+    chunks = iter_chunks(conn, start_date, end_date, chunk_size)
+    if old:
+        chunks = itertools.chain(archive.iter_rows(archive_root, "lines", EXPORT_COLUMNS, *old, chunk_size=chunk_size),
+                                 chunks)
+    total = None
+    if progress:
+        total = count_rows(conn, start_date, end_date) + (archive.count(archive_root, "lines", *old) if old else 0)
+    own = isinstance(dest, str)
+    out = open(dest, "wb") if own else dest
+    try:
+        writer = _open_writer(fmt, out, title)
+        done = 0
+        for rows in chunks:
+            writer.write(rows)
+            done += len(rows)
+            if progress:
+                progress(done, total)
+        writer.close()
+        return done
+    finally:
+        if own:
+            out.close()
@@ -0,0 +1,315 @@
+import atexit
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+SALES_CSV_FIELDS = ["order_id", "order_date", "item_name", "quantity", "price", "line_total"]
+
+FSYNC_BATCH = "batch"   # fsync both files after every flushed batch
+FSYNC_NONE = "none"     # leave it to the OS; reconcile() repairs anything lost in a crash
+
+
+def bill_line(record):
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def sales_rows(record):
+    for it in record["items"]:
+        price = float(it.get("price"))
+        qty = int(it.get("quantity"))
+        yield [record["order_id"], record["order_date"], it.get("name"), qty, price, price * qty]
+
+
+def _sales_block(path, records):
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        writer.writerow(SALES_CSV_FIELDS)
+    for r in records:
+        writer.writerows(sales_rows(r))
+    return buf.getvalue().encode("utf-8")
+
+
+def _append(path, data):
+    # one O_APPEND write per batch so concurrent writers never interleave lines
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, data)
+        return fd
+    except BaseException:
+        os.close(fd)
+        raise
+
+
+class JournalWriter:
+    """
+    Write-behind journal for the sample_bills.json / sales_report.csv mirrors.
+
+    submit() queues a bill record and returns immediately; a background
+    thread batches records and appends each batch to both files with a
+    single write per file once `batch_size` records are waiting or
+    `flush_interval` seconds have passed. The queue is bounded: when it is
+    full submit() blocks for up to `put_timeout` seconds and then drops the
+    record (the orders table stays authoritative; reconcile() restores it).
+    """
+
+    def __init__(self, bills_path, sales_path, max_queue=10000, batch_size=256,
+                 flush_interval=0.25, fsync=FSYNC_BATCH, put_timeout=5.0):
+        self.bills_path = bills_path
+        self.sales_path = sales_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = object()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.failures = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="order-journal", daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, record):
+        self.start()
+        try:
+            self._queue.put(record, timeout=self.put_timeout)
+        except queue.Full:
+            self.dropped += 1
+            log.warning("order journal queue full, dropped order %s", record.get("order_id"))
+
+    def flush(self, timeout=10.0):
+        """
+        Block until everything submitted so far is on disk, for at most
+        `timeout` seconds; returns whether it got there. Returns at once
+        when the writer thread is not running (never started, closed, or died).
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        """Drain the queue and stop the writer thread."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(self._stop)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch, waiters, stop = [], [], False
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is self._stop:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or waiters or len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception:
+                    self.failures += 1
+                    log.exception("order journal write failed for %d orders", len(batch))
+            for w in waiters:
+                w.set()
+            if stop:
+                return
+
+    def _write(self, batch):
+        for path in (self.bills_path, self.sales_path):
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        bills = "".join(bill_line(r) for r in batch).encode("utf-8")
+        sales = _sales_block(self.sales_path, batch)
+        fds = [_append(self.bills_path, bills), _append(self.sales_path, sales)]
+        try:
+            if self.fsync == FSYNC_BATCH:
+                for fd in fds:
+                    os.fsync(fd)
+        finally:
+            for fd in fds:
+                os.close(fd)
+        self.written += len(batch)
+        self.batches += 1
+
+    def stats(self):
+        return {"queued": self._queue.qsize(), "written": self.written,
+                "dropped": self.dropped, "batches": self.batches, "failures": self.failures}
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(bills_path, sales_path):
+    key = (bills_path, sales_path)
+    writer = _writers.get(key)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(key)
+            if writer is None:
+                writer = _writers[key] = JournalWriter(bills_path, sales_path)
+    return writer
+
+
+def close_all():
+    for writer in list(_writers.values()):
+        writer.close()
+
+
+atexit.register(close_all)
+
+
+# ------------------ crash replay ------------------
+def _read_bill_ids(path):
+    ids = []
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    ids.append(int(json.loads(line)["order_id"]))
+                except (ValueError, KeyError, TypeError):
+                    continue
+    return ids
+
+
+def _read_sales_ids(path):
+    ids = set()
+    if os.path.exists(path):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    ids.add(int(row["order_id"]))
+                except (ValueError, KeyError, TypeError):
+                    continue
+    return ids
+
+
+def _dedupe_bills(path):
+    seen = set()
+    tmp = path + ".tmp"
+    with open(path, encoding="utf-8") as src, open(tmp, "w", encoding="utf-8") as dst:
+        for line in src:
+            try:
+                oid = int(json.loads(line)["order_id"])
+            except (ValueError, KeyError, TypeError):
+                dst.write(line)
+                continue
+            if oid not in seen:
+                seen.add(oid)
+                dst.write(line)
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp, path)
+
+
+def _dedupe_sales(path):
+    # an order's rows are written together, so keep only the first run of each order_id
+    done, current = set(), None
+    tmp = path + ".tmp"
+    with open(path, newline="", encoding="utf-8") as src, open(tmp, "w", newline="", encoding="utf-8") as dst:
+        reader = csv.reader(src)
+        writer = csv.writer(dst, lineterminator="\n")
+        header = next(reader, None)
+        if header:
+            writer.writerow(header)
+        for row in reader:
+            oid = row[0] if row else None
+            if oid != current:
+                if current is not None:
+                    done.add(current)
+                current = oid
+            if oid in done:
+                continue
+            writer.writerow(row)
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp, path)
+
+
+def reconcile(order_ids, load_records, bills_path, sales_path):
+    """
+    Compare both journals with the committed orders and repair them.
+
+    order_ids: ids present in the orders table. load_records(ids) returns
+    bill records (as built by commit_order) for the ids missing from a
+    journal. Duplicated orders are removed, missing ones are re-appended.
+    Returns a summary dict.
+    """
+    bill_ids = _read_bill_ids(bills_path)
+    sales_ids = _read_sales_ids(sales_path)
+    order_ids = set(order_ids)
+
+    duplicates = len(bill_ids) - len(set(bill_ids))
+    if duplicates:
+        _dedupe_bills(bills_path)
+    sales_dupes = _count_sales_runs(sales_path) - len(sales_ids)
+    if sales_dupes > 0:
+        _dedupe_sales(sales_path)
+
+    missing_bills = sorted(order_ids - set(bill_ids))
+    missing_sales = sorted(order_ids - sales_ids)
+    records = {r["order_id"]: r for r in load_records(sorted(set(missing_bills) | set(missing_sales)))}
+
+    restored_bills = [records[i] for i in missing_bills if i in records]
+    if restored_bills:
+        os.close(_append(bills_path, "".join(bill_line(r) for r in restored_bills).encode("utf-8")))
+    restored_sales = [records[i] for i in missing_sales if i in records and records[i]["items"]]
+    if restored_sales:
+        os.close(_append(sales_path, _sales_block(sales_path, restored_sales)))
+
+    return {
+        "bills_duplicates_removed": duplicates,
+        "sales_duplicates_removed": max(sales_dupes, 0),
+        "bills_restored": len(restored_bills),
+        "sales_restored": len(restored_sales),
+        "unknown_orders": sorted(set(bill_ids) - order_ids),
+    }
+
+
+def _count_sales_runs(path):
+    runs, current = 0, None
+    if os.path.exists(path):
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for row in reader:
+                oid = row[0] if row else None
+                if oid != current:
+                    runs += 1
+                    current = oid
+    return runs
@@ -0,0 +1,311 @@
+"""
+Kitchen ticket queue with push fan-out to display clients.
+
+Every committed order (and every round added to an open tab) becomes one
+kitchen ticket per station, in the same transaction as the order. A
+station is the line's menu category unless STATIONS maps it elsewhere
+(e.g. {"Drink": "Bar"}). Tickets move new -> preparing -> ready -> served.
+Voiding a tab line takes the quantity off that order's unserved tickets
+for the line's station in the same transaction; a ticket left with no
+items is cancelled.
+
+Each insert or status change stamps the ticket with the next value of the
+'kitchen' counter in app_meta. Write transactions are serialized, so `seq`
+grows in commit order and `WHERE seq > last` never skips a change, from
+any process.
+
+KitchenHub is the per-process fan-out. One poller thread reads new seqs
+(right away when this process committed something, otherwise every
+`interval` seconds) and keeps the active tickets in memory; it stops once
+the last subscriber leaves and restarts with the next one. Each
+Subscriber has a bounded buffer: a client that falls `buffer` events
+behind is not waited for. Its backlog is dropped and its next read is a
+"snapshot" of the active tickets for its stations, so one slow screen
+never holds up the others or grows memory.
+"""
+import json
+import logging
+import threading
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+SEQ_KEY = "kitchen"
+FLOW = ("new", "preparing", "ready", "served")
+CANCELLED = "cancelled"
+DONE = ("served", CANCELLED)  # off the board
+STATIONS = {}
+COLUMNS = ["id", "order_id", "station", "status", "seq", "order_type", "table_id", "items", "created_at",
+           "updated_at"]
+
+
+class TicketStateError(Exception):
+    """A status change lost the race or skipped a step."""
+
+    def __init__(self, ticket_id, expected, actual):
+        self.ticket_id = ticket_id
+        self.expected = expected
+        self.actual = actual
+        super().__init__(f"kitchen ticket {ticket_id} is {actual or 'missing'}, expected {expected}")
+
+
+def station_for(category):
+    return STATIONS.get(category, category or "Kitchen")
+
+
+def _next_seq(conn):
+    return conn.execute("""INSERT INTO app_meta (key, value) VALUES (?, 1)
+                           ON CONFLICT(key) DO UPDATE SET value = value + 1
+                           RETURNING value""", (SEQ_KEY,)).fetchone()[0]
+
+
+def enqueue(conn, order_id, order_type, table_id, lines, now):
+    """
+    Queue the lines of an order (or tab round) for the kitchen; call inside
+    the order's transaction. lines: dicts with name, category, quantity.
+    Returns the number of tickets created.
+    """
+    by_station = {}
+    for it in lines:
+        by_station.setdefault(station_for(it.get("category")), []).append(
+            {"name": it["name"], "quantity": int(it["quantity"])})
+    for station, items in by_station.items():
+        conn.execute("""INSERT INTO kitchen_tickets (order_id, station, status, seq, order_type, table_id, items,
+                                                     created_at, updated_at)
+                        VALUES (?, ?, 'new', ?, ?, ?, ?, ?, ?)""",
+                     (int(order_id), station, _next_seq(conn), order_type, table_id,
+                      json.dumps(items, ensure_ascii=False), now, now))
+    return len(by_station)
+
+
+def advance(conn, ticket_id, status, now):
+    """Move a ticket one step along FLOW (compare-and-set); raises TicketStateError."""
+    if status not in FLOW[1:]:
+        raise ValueError(f"unknown kitchen status {status!r}")
+    expected = FLOW[FLOW.index(status) - 1]
+    cur = conn.execute("UPDATE kitchen_tickets SET status = ?, seq = ?, updated_at = ? WHERE id = ? AND status = ?",
+                       (status, _next_seq(conn), now, int(ticket_id), expected))
+    if cur.rowcount != 1:
+        row = conn.execute("SELECT status FROM kitchen_tickets WHERE id = ?", (int(ticket_id),)).fetchone()
+        raise TicketStateError(ticket_id, expected, row[0] if row else None)
+
+
+def void(conn, order_id, name, category, quantity, now):
+    """
+    Take `quantity` of `name` off the unserved tickets of an order at the
+    line's station, newest first; call inside the void's transaction. A
+    ticket left empty is cancelled. Returns the quantity taken off.
+    """
+    left = int(quantity)
+    rows = conn.execute("""SELECT id, items FROM kitchen_tickets
+                           WHERE order_id = ? AND station = ? AND status != 'served' AND status != ?
+                           ORDER BY id DESC""", (int(order_id), station_for(category), CANCELLED)).fetchall()
+    for ticket_id, items in rows:
+        items = json.loads(items)
+        taken = 0
+        for it in items:
+            if it["name"] == name:
+                take = min(it["quantity"], left - taken)
+                it["quantity"] -= take
+                taken += take
+        if not taken:
+            continue
+        kept = [it for it in items if it["quantity"] > 0]
+        if kept:
+            conn.execute("UPDATE kitchen_tickets SET items = ?, seq = ?, updated_at = ? WHERE id = ?",
+                         (json.dumps(kept, ensure_ascii=False), _next_seq(conn), now, ticket_id))
+        else:
+            conn.execute("UPDATE kitchen_tickets SET status = ?, seq = ?, updated_at = ? WHERE id = ?",
+                         (CANCELLED, _next_seq(conn), now, ticket_id))
+        left -= taken
+        if not left:
+            break
+    return int(quantity) - left
+
+
+def _ticket(row):
+    ticket = dict(zip(COLUMNS, row))
+    ticket["items"] = json.loads(ticket["items"])
+    return ticket
+
+
+def changes_since(conn, seq, limit=1000):
+    """Tickets inserted or changed after `seq`, oldest change first."""
+    return [_ticket(r) for r in conn.execute(
+        "SELECT " + ", ".join(COLUMNS) + " FROM kitchen_tickets WHERE seq > ? ORDER BY seq LIMIT ?",
+        (int(seq), int(limit)))]
+
+
+def active(conn):
+    """(last seq, tickets not yet served or cancelled)."""
+    row = conn.execute("SELECT value FROM app_meta WHERE key = ?", (SEQ_KEY,)).fetchone()
+    tickets = [_ticket(r) for r in conn.execute(
+        "SELECT " + ", ".join(COLUMNS) + " FROM kitchen_tickets WHERE status != 'served' AND status != ? ORDER BY seq",
+        (CANCELLED,))]
+    return (row[0] if row else 0), tickets
+
+
+# ------------------ fan-out ------------------
+class Subscriber:
+    """One display client: a bounded queue of ticket events for its stations (None = all)."""
+
+    def __init__(self, hub, stations, buffer, on_ready):
+        self.hub = hub
+        self.stations = set(stations) if stations else None
+        self.buffer = buffer
+        self._on_ready = on_ready
+        self._events = deque()
+        self._resync = True  # the first read is always a snapshot
+        self._seen = 0  # seq already covered by what this client has been sent
+        self._cond = threading.Condition()
+        self.delivered = 0
+        self.resyncs = 0
+
+    def wants(self, ticket):
+        return self.stations is None or ticket["station"] in self.stations
+
+    def _push(self, ticket):
+        with self._cond:
+            # wake the consumer only when it goes from nothing to drain to something
+            wake = not self._events and not self._resync
+            if self._resync:
+                pass  # the snapshot it is owed will include this change
+            elif len(self._events) >= self.buffer:
+                # too far behind: drop the backlog, send a snapshot instead
+                self._events.clear()
+                self._resync = True
+                self.resyncs += 1
+            else:
+                self._events.append(ticket)
+            if wake:
+                self._cond.notify()
+        if wake and self._on_ready:
+            self._on_ready()
+
+    def drain(self):
+        """
+        Pending events without blocking: [("snapshot", (seq, tickets))] after
+        subscribing or an overflow, else [("ticket", ticket), ...].
+        """
+        with self._cond:
+            if self._resync:
+                self._resync = False
+                self._events.clear()
+                snapshot = self.hub.snapshot(self.stations)
+                self._seen = snapshot[0]
+                self.delivered += 1
+                return [("snapshot", snapshot)]
+            # a change can reach both a snapshot and the queue; send it once
+            events = [("ticket", t) for t in self._events if t["seq"] > self._seen]
+            self._events.clear()
+            if events:
+                self._seen = events[-1][1]["seq"]
+        self.delivered += len(events)
+        return events
+
+    def get(self, timeout=None):
+        """Blocking drain() for thread-based consumers; [] on timeout."""
+        with self._cond:
+            if not self._events and not self._resync:
+                self._cond.wait(timeout)
+        return self.drain()
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class KitchenHub:
+    """
+    Per-process kitchen board and fan-out. `active_fn()` returns (seq,
+    active tickets) and `changes_fn(seq)` the tickets changed after seq; the
+    poller thread starts with the first subscriber.
+    """
+
+    def __init__(self, active_fn, changes_fn, interval=0.5, buffer=256):
+        self._active_fn = active_fn
+        self._changes_fn = changes_fn
+        self.interval = interval
+        self.buffer = buffer
+        self.seq = None
+        self._tickets = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.polls = 0
+
+    def subscribe(self, stations=None, on_ready=None, buffer=None):
+        """on_ready() is called from the poller thread whenever the subscriber has something to drain."""
+        sub = Subscriber(self, stations, buffer or self.buffer, on_ready)
+        with self._lock:
+            if self.seq is None:
+                self.seq, tickets = self._active_fn()
+                self._tickets = {t["id"]: t for t in tickets}
+            self._subscribers.append(sub)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="kitchen-hub", daemon=True)
+                self._thread.start()
+        if on_ready:
+            on_ready()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+            if not self._subscribers:
+                self._wake.set()  # let the poller stop now rather than at the next tick
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def snapshot(self, stations=None):
+        with self._lock:
+            tickets = [t for t in self._tickets.values() if not stations or t["station"] in stations]
+            return self.seq, sorted(tickets, key=lambda t: t["seq"])
+
+    def poke(self):
+        """Something was committed in this process: poll now instead of at the next interval."""
+        if self._thread is not None:
+            self._wake.set()
+
+    def poll(self):
+        """Read and fan out every change since the last poll; returns how many there were."""
+        if self.seq is None:
+            return 0
+        changes = self._changes_fn(self.seq)
+        self.polls += 1
+        if not changes:
+            return 0
+        with self._lock:
+            for t in changes:
+                self.seq = max(self.seq, t["seq"])
+                if t["status"] in DONE:
+                    self._tickets.pop(t["id"], None)
+                else:
+                    self._tickets[t["id"]] = t
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            for t in changes:
+                if sub.wants(t):
+                    sub._push(t)
+        return len(changes)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._lock:
+                if not self._subscribers:
+                    # nobody is watching: stop, and reload the board with the next subscriber
+                    self._thread = None
+                    self.seq = None
+                    self._tickets = {}
+                    return
+            try:
+                # drain bursts in one go (changes_fn pages at its limit)
+                while self.poll():
+                    pass
+            except Exception:
+                log.exception("kitchen poll failed, retrying in %.1fs", self.interval)
@@ -0,0 +1,78 @@
+import threading
+
+
+class MenuSnapshot:
+    """
+    Read-only, pre-indexed view of the menu table at one menu version.
+    `df` (pandas) is only built when a page asks for it; the order, search
+    and API paths use the plain row dicts.
+    """
+
+    def __init__(self, version, columns, records, resolve_image=None):
+        self.version = version
+        self.columns = columns
+        self._records = records
+        self._df = None
+        self.rows = [dict(zip(columns, r)) for r in records]
+        self.by_id = {}
+        self.by_category = {}
+        # records are ordered by category, item_name so both indexes keep menu order
+        for row in self.rows:
+            # resolved once per menu version instead of an os.path.exists per rerun
+            row["image_path"] = resolve_image(row.get("image")) if resolve_image else None
+            self.by_id[int(row["id"])] = row
+            self.by_category.setdefault(row["category"], []).append(row)
+        self.categories = list(self.by_category)
+
+    @property
+    def df(self):
+        if self._df is None:
+            import pandas as pd
+            self._df = pd.DataFrame(self._records, columns=self.columns)
+        return self._df
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class MenuCache:
+    """
+    In-process menu cache keyed on the `menu` version counter in app_meta.
+
+    `version_fn(key)` is a single-row lookup done on every get(), so edits
+    committed by other processes are noticed on the next rerun; the menu
+    itself is only re-read and re-indexed when that version moves.
+    `load_fn(key)` returns (version, column names, row tuples) read in one transaction.
+    `resolve_image(image)` maps the menu.image value to an existing file or None.
+    """
+
+    def __init__(self, version_fn, load_fn, resolve_image=None):
+        self._version_fn = version_fn
+        self._load_fn = load_fn
+        self._resolve_image = resolve_image
+        self._snapshots = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def get(self, key):
+        snap = self._snapshots.get(key)
+        if snap is not None and snap.version == self._version_fn(key):
+            self.hits += 1
+            return snap
+        with self._lock:
+            snap = self._snapshots.get(key)
+            if snap is not None and snap.version == self._version_fn(key):
+                self.hits += 1
+                return snap
+            version, columns, records = self._load_fn(key)
+            snap = self._snapshots[key] = MenuSnapshot(version, columns, records, self._resolve_image)
+            self.loads += 1
+            return snap
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(key, None)
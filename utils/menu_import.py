@@ -0,0 +1,139 @@
+"""
+Bulk menu import / re-sync from a CSV price list.
+
+Rows are matched to existing items by `sku` when the CSV has one, else by
+item name (case-insensitive). A SKU no item has yet claims the item of
+the same name that has no SKU, so the first SKU'd price list fills in
+SKUs instead of duplicating the menu. Only new or actually changed rows
+are written, in one transaction, with executemany every CHUNK_SIZE rows
+while the CSV is read.
+
+    python -m utils.menu_import path/to/menu.csv
+"""
+import argparse
+import csv
+import os
+
+MENU_COLUMNS = ("item_name", "category", "price", "gst", "image", "sku")
+
+
+CHUNK_SIZE = 1000  # rows per executemany while the CSV is read
+
+def parse_row(row, default_image):
+    """Validate one CSV row; returns a MENU_COLUMNS tuple or raises ValueError."""
+    name = (row.get("item_name") or "").strip()
+    if not name:
+        raise ValueError("item_name is empty")
+    category = (row.get("category") or "").strip()
+    if not category:
+        raise ValueError("category is empty")
+    try:
+        price = float(row.get("price"))
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid price {row.get('price')!r}")
+    if price < 0:
+        raise ValueError("price is negative")
+    gst_raw = (row.get("gst") or "").strip()
+    try:
+        gst = int(float(gst_raw)) if gst_raw else 5
+    except ValueError:
+        raise ValueError(f"invalid gst {gst_raw!r}")
+    if not 0 <= gst <= 100:
+        raise ValueError(f"gst {gst} out of range")
+    image = (row.get("image") or "").strip() or default_image(name)
+    sku = (row.get("sku") or "").strip() or None
+    return name, category, price, gst, image, sku
+
+
+def import_rows(conn, reader, default_image, chunk_size=CHUNK_SIZE):
+    """
+    Upsert parsed rows into `menu`. Call inside a transaction.
+    Returns {"inserted", "updated", "unchanged", "errors": [(line, message)], "changed_images": [...]}.
+    """
+    by_sku, by_name, unskued = {}, {}, {}
+    for row in conn.execute("SELECT id, item_name, category, price, gst, image, sku FROM menu"):
+        item, name = (row[0], row[1:]), row[1].casefold()
+        if row[6]:
+            by_sku[row[6]] = item
+        else:
+            unskued.setdefault(name, item)
+        # items that got a SKU later are still matched by name from CSVs without one
+        by_name.setdefault(name, item)
+
+    inserts, updates, errors, changed_images = [], [], [], []
+    seen, written = set(), set()
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+
+    def write():
+        if inserts:
+            conn.executemany("INSERT INTO menu (item_name, category, price, gst, image, sku) "
+                             "VALUES (?, ?, ?, ?, ?, ?)", inserts)
+            counts["inserted"] += len(inserts)
+        if updates:
+            conn.executemany("UPDATE menu SET item_name = ?, category = ?, price = ?, gst = ?, image = ?, sku = ? "
+                             "WHERE id = ?", updates)
+            counts["updated"] += len(updates)
+        del inserts[:], updates[:]
+
+    for line, raw in enumerate(reader, start=2):
+        try:
+            values = parse_row(raw, default_image)
+        except ValueError as exc:
+            errors.append((line, str(exc)))
+            continue
+        name, sku = values[0].casefold(), values[5]
+        key = ("sku", sku) if sku else ("name", name)
+        if key in seen:
+            errors.append((line, f"duplicate of an earlier row ({values[0]})"))
+            continue
+        seen.add(key)
+        if sku:
+            existing = by_sku.get(sku) or unskued.pop(name, None)
+        else:
+            existing = by_name.get(name)
+            if existing is not None:
+                values = values[:5] + (existing[1][5],)  # a CSV without SKUs keeps the ones on file
+        if existing is not None and existing[0] in written:
+            errors.append((line, f"matches the same menu item as an earlier row ({values[0]})"))
+            continue
+        if existing is None:
+            inserts.append(values)
+            changed_images.append(values[4])
+        elif tuple(existing[1]) != values:
+            written.add(existing[0])
+            updates.append(values + (existing[0],))
+            if existing[1][4] != values[4]:
+                changed_images.append(values[4])
+        else:
+            written.add(existing[0])
+            counts["unchanged"] += 1
+        if len(inserts) + len(updates) >= chunk_size:
+            write()
+    write()
+    return dict(counts, errors=errors, changed_images=changed_images)
+
+
+def open_reader(csv_path):
+    f = open(csv_path, newline="", encoding="utf-8")
+    return f, csv.DictReader(f)
+
+
+def main(argv=None):
+    from utils import db_utils
+
+    ap = argparse.ArgumentParser(prog="python -m utils.menu_import")
+    ap.add_argument("csv_path", nargs="?", default=db_utils.MENU_CSV)
+    args = ap.parse_args(argv)
+    if not os.path.exists(args.csv_path):
+        ap.error(f"{args.csv_path} not found")
+
+    db_utils.initialize_database()
+    result = db_utils.import_menu_csv(args.csv_path)
+    print(f"inserted={result['inserted']} updated={result['updated']} unchanged={result['unchanged']} "
+          f"errors={len(result['errors'])}")
+    for line, msg in result["errors"][:50]:
+        print(f"  line {line}: {msg}")
+
+
+if __name__ == "__main__":
+    main()
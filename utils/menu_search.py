@@ -0,0 +1,199 @@
+"""
+Menu search: an in-memory index for the Order page plus an FTS5 mirror.
+
+MenuIndex matches every query token against item_name and category
+tokens, in order of preference:
+
+- exact token,
+- prefix ("chick" -> "chicken"): a bisect over the sorted vocabulary,
+- one typo ("chiken", "chikcen" -> "chicken"): a symmetric-delete map from
+  every one-character deletion of each vocabulary token (tokens of 4+
+  characters) to the tokens it came from, checked with Damerau distance 1.
+
+An item matches when all query tokens match; items are ranked by match
+quality, then name. update() diffs a new menu snapshot against the
+indexed one and only re-indexes the rows that changed, so a menu edit
+costs O(changed items).
+
+The FTS5 table `menu_fts` (external content on `menu`, kept in sync by
+triggers) gives SQL-side prefix search to other processes and tools:
+fts_search().
+"""
+import re
+import sqlite3
+import threading
+import unicodedata
+import heapq
+from bisect import bisect_left
+
+EXACT, PREFIX, FUZZY = 3, 2, 1
+MIN_FUZZY_LEN = 4
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lower-case, accent-free word tokens."""
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode("ascii")
+    return _TOKEN.findall(text.lower())
+
+
+def _deletes(token):
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def _within_one(a, b):
+    """Damerau-Levenshtein distance <= 1 (one insert, delete, substitution or swap)."""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    i = 0
+    while i < min(la, lb) and a[i] == b[i]:
+        i += 1
+    if la == lb:
+        return a[i + 1:] == b[i + 1:] or (i + 1 < la and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:])
+    if la < lb:
+        return a[i:] == b[i + 1:]
+    return a[i + 1:] == b[i:]
+
+
+class MenuIndex:
+    def __init__(self):
+        self.version = None
+        self._docs = {}        # item id -> (item_name, category) as indexed
+        self._keys = {}        # item id -> name sort key
+        self._postings = {}    # token -> set of item ids
+        self._vocab = []       # sorted tokens, for prefix ranges
+        self._deleted = {}     # one-deletion variant -> set of tokens
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    # ------------------ building ------------------
+    def update(self, rows, version=None):
+        """Bring the index in line with `rows` (dicts with id, item_name, category); returns items re-indexed."""
+        with self._lock:
+            fresh = {int(r["id"]): (r["item_name"], r["category"]) for r in rows}
+            changed = 0
+            for item_id in [i for i in self._docs if i not in fresh]:
+                self._remove(item_id)
+                changed += 1
+            added_tokens = set()
+            for item_id, doc in fresh.items():
+                if self._docs.get(item_id) != doc:
+                    if item_id in self._docs:
+                        self._remove(item_id)
+                    added_tokens |= self._add(item_id, doc)
+                    changed += 1
+            if added_tokens:
+                self._vocab = sorted(set(self._vocab) | added_tokens)
+            self.version = version
+            return changed
+
+    def _add(self, item_id, doc):
+        self._docs[item_id] = doc
+        self._keys[item_id] = str(doc[0]).lower()
+        new = set()
+        for token in set(tokenize(doc[0]) + tokenize(doc[1])):
+            ids = self._postings.get(token)
+            if ids is None:
+                ids = self._postings[token] = set()
+                new.add(token)
+                if len(token) >= MIN_FUZZY_LEN:
+                    for variant in _deletes(token):
+                        self._deleted.setdefault(variant, set()).add(token)
+            ids.add(item_id)
+        return new
+
+    def _remove(self, item_id):
+        doc = self._docs.pop(item_id)
+        del self._keys[item_id]
+        gone = []
+        for token in set(tokenize(doc[0]) + tokenize(doc[1])):
+            ids = self._postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(item_id)
+            if not ids:
+                del self._postings[token]
+                gone.append(token)
+                for variant in _deletes(token) if len(token) >= MIN_FUZZY_LEN else ():
+                    tokens = self._deleted.get(variant)
+                    if tokens:
+                        tokens.discard(token)
+                        if not tokens:
+                            del self._deleted[variant]
+        if gone:
+            dropped = set(gone)
+            self._vocab = [t for t in self._vocab if t not in dropped]
+
+    # ------------------ querying ------------------
+    def _expand(self, q):
+        """{vocabulary token: quality} for one query token."""
+        found = {}
+        if q in self._postings:
+            found[q] = EXACT
+        i = bisect_left(self._vocab, q)
+        while i < len(self._vocab) and self._vocab[i].startswith(q):
+            found.setdefault(self._vocab[i], PREFIX)
+            i += 1
+        if len(q) >= MIN_FUZZY_LEN - 1:
+            # q itself, or one of its deletions, equals a deletion of a vocabulary token
+            for variant in _deletes(q) | {q}:
+                for token in self._deleted.get(variant, ()):
+                    if token not in found and _within_one(q, token):
+                        found[token] = FUZZY
+            for variant in _deletes(q):
+                if variant in self._postings and variant not in found:
+                    found[variant] = FUZZY
+        return found
+
+    def search(self, query, limit=50):
+        """Item ids matching every token of `query`, best first."""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            scores = None
+            for q in tokens:
+                best = {}
+                # lowest quality first so an item keeps the best way it matched
+                for token, quality in sorted(self._expand(q).items(), key=lambda kv: kv[1]):
+                    best.update(dict.fromkeys(self._postings[token], quality))
+                if scores is None:
+                    scores = best
+                else:
+                    scores = {i: s + best[i] for i, s in scores.items() if i in best}
+                if not scores:
+                    return []
+            ranked = []
+            for score in sorted(set(scores.values()), reverse=True):
+                group = [i for i, s in scores.items() if s == score]
+                if limit:
+                    group = heapq.nsmallest(limit - len(ranked), group, key=self._keys.__getitem__)
+                else:
+                    group.sort(key=self._keys.__getitem__)
+                ranked.extend(group)
+                if limit and len(ranked) >= limit:
+                    break
+        return ranked
+
+
+# ------------------ FTS5 ------------------
+def fts_search(conn, query, limit=50):
+    """Menu ids whose name/category has every query token as a prefix, by FTS5 rank."""
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    match = " ".join(f'"{t}"*' for t in tokens)
+    try:
+        return [r[0] for r in conn.execute("SELECT rowid FROM menu_fts WHERE menu_fts MATCH ? ORDER BY rank LIMIT ?",
+                                           (match, int(limit)))]
+    except sqlite3.OperationalError:
+        pass  # no FTS5 in this SQLite build
+    where = " AND ".join(["(item_name LIKE ? OR category LIKE ?)"] * len(tokens))
+    params = [p for t in tokens for p in (f"%{t}%", f"%{t}%")]
+    return [r[0] for r in conn.execute(f"SELECT id FROM menu WHERE {where} ORDER BY item_name LIMIT ?",
+                                       params + [int(limit)])]
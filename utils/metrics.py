@@ -0,0 +1,317 @@
+"""
+In-process metrics: counters, latency histograms and callback gauges,
+rendered in the Prometheus text format.
+
+What is recorded:
+
+- rbs_db_call_seconds{fn}: every public db_utils function (instrument()),
+  plus rbs_db_rows_total{fn} for calls that return rows and
+  rbs_db_errors_total{fn} for calls that raise;
+- rbs_db_statements_total: execute() calls on pooled connections, so
+  statements inside helpers count too;
+- rbs_page_render_seconds{page} and rbs_page_statements{page}: one
+  observation per Streamlit rerun of a page (page());
+- gauges registered with gauge() and read at render time (pool
+  connections, journal queue, cache hit counters).
+
+Recording is a dict lookup, a bisect and a lock per observation. Set
+RBS_METRICS=0 to skip instrumentation entirely. RBS_METRICS_FILE names a
+file that start_textfile_writer() rewrites every few seconds (for node
+exporter's textfile collector); the API serves the same text at /metrics.
+"""
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+ENABLED = os.environ.get("RBS_METRICS", "1") != "0"
+TEXTFILE = os.environ.get("RBS_METRICS_FILE")
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        """Estimate from the buckets (linear within a bucket), as Prometheus' histogram_quantile does."""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return None
+        rank, seen = q * total, 0
+        for i, n in enumerate(counts):
+            if seen + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class Family:
+    """One metric name; children per label values."""
+
+    def __init__(self, name, kind, help, labelnames, factory):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self.children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            with self._lock:
+                child = self.children.setdefault(values, self._factory())
+        return child
+
+
+class Registry:
+    def __init__(self):
+        self.families = {}
+        self.gauges = {}  # name -> (help, labelnames, fn)
+
+    def _family(self, name, kind, help, labelnames, factory):
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = Family(name, kind, help, labelnames, factory)
+        return family
+
+    def counter(self, name, help, labelnames=()):
+        return self._family(name, "counter", help, labelnames, Counter)
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._family(name, "histogram", help, labelnames, lambda: Histogram(buckets))
+
+    def gauge(self, name, help, fn, labelnames=(), kind="gauge"):
+        """
+        A value read from fn() at render time: a number, or {label values
+        tuple: number} when labelnames are given. kind="counter" for totals
+        kept elsewhere.
+        """
+        self.gauges[name] = (help, tuple(labelnames), fn, kind)
+
+    def render(self):
+        out = []
+        for family in list(self.families.values()):
+            out.append(f"# HELP {family.name} {family.help}")
+            out.append(f"# TYPE {family.name} {family.kind}")
+            for values, child in sorted(family.children.items()):
+                if values and not (child.value if family.kind == "counter" else child.count):
+                    continue  # wrapped up front, never called
+                labels = _labels(family.labelnames, values)
+                if family.kind == "counter":
+                    out.append(f"{family.name}{_braces(labels)} {child.value}")
+                    continue
+                cumulative = 0
+                for bound, n in zip(child.buckets + ("+Inf",), child.counts):
+                    cumulative += n
+                    le = labels + [f'le="{bound}"']
+                    out.append(f"{family.name}_bucket{_braces(le)} {cumulative}")
+                out.append(f"{family.name}_sum{_braces(labels)} {child.sum:.6f}")
+                out.append(f"{family.name}_count{_braces(labels)} {child.count}")
+        for name, (help, labelnames, fn, kind) in list(self.gauges.items()):
+            try:
+                value = fn()
+            except Exception:
+                continue  # a gauge whose source is not set up yet is left out
+            out.append(f"# HELP {name} {help}")
+            out.append(f"# TYPE {name} {kind}")
+            items = value.items() if labelnames else [((), value)]
+            for values, v in sorted(items):
+                out.append(f"{name}{_braces(_labels(labelnames, values))} {v}")
+        return "\n".join(out) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    return [f'{k}="{_escape(v)}"' for k, v in zip(names, values)]
+
+
+def _braces(labels):
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+REGISTRY = Registry()
+DB_CALL = REGISTRY.histogram("rbs_db_call_seconds", "Latency of db_utils calls.", ("fn",))
+DB_ROWS = REGISTRY.counter("rbs_db_rows_total", "Rows returned by db_utils calls.", ("fn",))
+DB_ERRORS = REGISTRY.counter("rbs_db_errors_total", "db_utils calls that raised.", ("fn",))
+PAGE_RENDER = REGISTRY.histogram("rbs_page_render_seconds", "Streamlit page render (one rerun).", ("page",))
+PAGE_STATEMENTS = REGISTRY.histogram("rbs_page_statements", "SQL statements per page rerun.", ("page",),
+                                     buckets=COUNT_BUCKETS)
+PAGE_ERRORS = REGISTRY.counter("rbs_page_errors_total", "Page reruns that raised.", ("page",))
+DB_STATEMENTS = REGISTRY.counter("rbs_db_statements_total", "SQL statements run on pooled connections.").labels()
+
+_local = threading.local()  # per-thread statement count, for page()
+
+
+# ------------------ recording ------------------
+def count_statement():
+    """One SQL statement issued on this thread."""
+    DB_STATEMENTS.inc()
+    try:
+        _local.statements += 1
+    except AttributeError:
+        _local.statements = 1
+
+
+def _statements_here():
+    return getattr(_local, "statements", 0)
+
+
+def _rows(result):
+    if isinstance(result, list) or hasattr(result, "columns"):
+        return len(result)
+    return None
+
+
+def timed_call(fn, name=None):
+    """Wrap fn so every call lands in rbs_db_call_seconds{fn=name}."""
+    name = name or fn.__name__
+    latency, rows, errors = DB_CALL.labels(name), DB_ROWS.labels(name), DB_ERRORS.labels(name)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            latency.observe(time.perf_counter() - start)
+        n = _rows(result)
+        if n is not None:
+            rows.inc(n)
+        return result
+
+    return wrapper
+
+
+def instrument(namespace, skip=()):
+    """Wrap the public functions defined in a module's namespace (call at the end of the module)."""
+    if not ENABLED:
+        return
+    module = namespace["__name__"]
+    for name, obj in list(namespace.items()):
+        if (name.startswith("_") or name in skip or not callable(obj) or isinstance(obj, type)
+                or getattr(obj, "__module__", None) != module or hasattr(obj, "__wrapped__")):
+            continue
+        namespace[name] = timed_call(obj, name)
+
+
+@contextmanager
+def page(name):
+    """Time one page render and count the SQL statements it ran on this thread."""
+    if not ENABLED:
+        yield
+        return
+    before = _statements_here()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        PAGE_ERRORS.labels(name).inc()
+        raise
+    finally:
+        # Streamlit's rerun/stop are BaseExceptions: timed, not counted as errors
+        PAGE_RENDER.labels(name).observe(time.perf_counter() - start)
+        PAGE_STATEMENTS.labels(name).observe(_statements_here() - before)
+
+
+def gauge(name, help, fn, labelnames=(), kind="gauge"):
+    REGISTRY.gauge(name, help, fn, labelnames, kind)
+
+
+def render():
+    return REGISTRY.render()
+
+
+# ------------------ summaries ------------------
+def summary(family, scale=1.0):
+    """Rows of {labels..., count, mean, p50, p95, total} for a histogram family (values times `scale`), largest total first."""
+    rows = []
+    for values, h in list(family.children.items()):
+        if not h.count:
+            continue
+        row = dict(zip(family.labelnames, values))
+        row.update(count=h.count, mean=scale * h.sum / h.count, p50=scale * h.quantile(0.5),
+                   p95=scale * h.quantile(0.95), total=h.sum)
+        rows.append(row)
+    return sorted(rows, key=lambda r: -r["total"])
+
+
+def counters():
+    """{name{labels}: value} for every counter child."""
+    out = {}
+    for family in list(REGISTRY.families.values()):
+        if family.kind == "counter":
+            for values, c in list(family.children.items()):
+                out[family.name + _braces(_labels(family.labelnames, values))] = c.value
+    return out
+
+
+# ------------------ text file ------------------
+def write_textfile(path):
+    tmp = path + ".tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp, path)  # readers never see a half-written file
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def start_textfile_writer(path=None, interval=15.0):
+    """Rewrite `path` (default RBS_METRICS_FILE) every `interval` seconds from a daemon thread; once per process."""
+    global _writer
+    path = path or TEXTFILE
+    if not path:
+        return None
+    with _writer_lock:
+        if _writer is None:
+            def run():
+                while True:
+                    try:
+                        write_textfile(path)
+                    except OSError:
+                        pass
+                    time.sleep(interval)
+
+            _writer = threading.Thread(target=run, name="metrics-textfile", daemon=True)
+            _writer.start()
+    return _writer
+
@@ -0,0 +1,405 @@
+import csv
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+# Ordered schema steps. Each step gets a cursor inside the migration
+# transaction plus the context dict passed to migrate() (data file paths);
+# append new steps at the end and never renumber old ones. Steps hold their
+# own DDL and SQL, frozen as shipped: a later change to a module must not
+# change what an old step does.
+
+
+def _m001_base_schema(cur, ctx):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS menu (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_name TEXT NOT NULL,
+        category TEXT,
+        price REAL,
+        gst INTEGER DEFAULT 5,
+        image TEXT
+    );
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_type TEXT,        -- Dine-In or Takeaway
+        table_id INTEGER,       -- if dine-in
+        payment_mode TEXT,
+        subtotal REAL,
+        gst_amount REAL,
+        discount_amount REAL,
+        total_amount REAL,
+        order_date TEXT
+    );
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS order_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER,
+        item_id INTEGER,
+        quantity INTEGER,
+        FOREIGN KEY(order_id) REFERENCES orders(id),
+        FOREIGN KEY(item_id) REFERENCES menu(id)
+    );
+    """)
+
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS tables (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        capacity INTEGER DEFAULT 2,
+        status TEXT DEFAULT 'available',    -- available / occupied / cleaning
+        current_order_id INTEGER
+    );
+    """)
+
+    # change counters (e.g. menu_version) so caches can tell when to reload
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS app_meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    );
+    """)
+
+
+def _m002_indexes(cur, ctx):
+    # date-range reports, bill lookups and the order_items -> menu join
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_order_date ON orders(order_date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_order_items_item_id ON order_items(item_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_tables_status ON tables(status)")
+
+
+def _m003_sales_rollup(cur, ctx):
+    # history is backfilled by _m004 once lines carry their sale-time prices
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sales_daily (
+        day TEXT NOT NULL,
+        item_id INTEGER NOT NULL,
+        item_name TEXT,
+        category TEXT,
+        payment_mode TEXT NOT NULL DEFAULT '',
+        order_type TEXT NOT NULL DEFAULT '',
+        quantity INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, item_id, payment_mode, order_type)
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS sales_daily_orders (
+        day TEXT NOT NULL,
+        payment_mode TEXT NOT NULL DEFAULT '',
+        order_type TEXT NOT NULL DEFAULT '',
+        orders INTEGER NOT NULL DEFAULT 0,
+        subtotal REAL NOT NULL DEFAULT 0,
+        gst_amount REAL NOT NULL DEFAULT 0,
+        discount_amount REAL NOT NULL DEFAULT 0,
+        total_amount REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, payment_mode, order_type)
+    );
+    """)
+
+
+def _m004_order_item_snapshots(cur, ctx):
+    # name, category, unit price and GST rate as they were at sale time
+    cols = {row[1] for row in cur.execute("PRAGMA table_info(order_items)")}
+    for col, decl in (("item_name", "TEXT"), ("category", "TEXT"), ("unit_price", "REAL"), ("gst_rate", "INTEGER")):
+        if col not in cols:
+            cur.execute(f"ALTER TABLE order_items ADD COLUMN {col} {decl}")
+
+    # 1. bill journal: full line detail per order (matched on id and date so a
+    #    journal from another DB file is never applied to the wrong orders)
+    bills = ctx.get("bills_json")
+    if bills and os.path.exists(bills):
+        rows = []
+        with open(bills, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                for it in rec.get("items") or []:
+                    if it.get("item_id") is None or it.get("price") is None:
+                        continue
+                    rows.append((it.get("name"), it.get("category"), float(it["price"]), it.get("gst"),
+                                 rec.get("order_id"), int(it["item_id"]), rec.get("order_id"), rec.get("order_date")))
+        cur.executemany("""
+            UPDATE order_items SET item_name = ?, category = ?, unit_price = ?, gst_rate = ?
+            WHERE unit_price IS NULL AND order_id = ? AND item_id = ?
+              AND EXISTS (SELECT 1 FROM orders o WHERE o.id = ? AND o.order_date = ?)
+        """, rows)
+
+    # 2. sales report: name and price per order line
+    sales = ctx.get("sales_csv")
+    if sales and os.path.exists(sales):
+        rows = []
+        with open(sales, newline="", encoding="utf-8") as f:
+            for r in csv.DictReader(f):
+                try:
+                    rows.append((r["item_name"], float(r["price"]), int(r["order_id"]), r["item_name"],
+                                 int(r["order_id"]), r["order_date"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+        cur.executemany("""
+            UPDATE order_items SET item_name = ?, unit_price = ?
+            WHERE unit_price IS NULL AND order_id = ?
+              AND item_id IN (SELECT id FROM menu WHERE item_name = ?)
+              AND EXISTS (SELECT 1 FROM orders o WHERE o.id = ? AND o.order_date = ?)
+        """, rows)
+
+    # 3. anything left: current menu values (best available)
+    cur.execute("""
+        UPDATE order_items SET
+            item_name = COALESCE(item_name, (SELECT m.item_name FROM menu m WHERE m.id = order_items.item_id)),
+            category = COALESCE(category, (SELECT m.category FROM menu m WHERE m.id = order_items.item_id)),
+            unit_price = COALESCE(unit_price, (SELECT m.price FROM menu m WHERE m.id = order_items.item_id)),
+            gst_rate = COALESCE(gst_rate, (SELECT m.gst FROM menu m WHERE m.id = order_items.item_id))
+        WHERE item_name IS NULL OR category IS NULL OR unit_price IS NULL OR gst_rate IS NULL
+    """)
+
+    # 4. rollup backfill from the completed lines
+    cur.execute("DELETE FROM sales_daily")
+    cur.execute("DELETE FROM sales_daily_orders")
+    cur.execute("""
+        INSERT INTO sales_daily_orders
+            (day, payment_mode, order_type, orders, subtotal, gst_amount, discount_amount, total_amount)
+        SELECT substr(o.order_date, 1, 10), COALESCE(o.payment_mode, ''), COALESCE(o.order_type, ''),
+               COUNT(*), COALESCE(SUM(o.subtotal), 0), COALESCE(SUM(o.gst_amount), 0),
+               COALESCE(SUM(o.discount_amount), 0), COALESCE(SUM(o.total_amount), 0)
+        FROM orders o
+        WHERE o.order_date IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+    cur.execute("""
+        INSERT INTO sales_daily
+            (day, item_id, item_name, category, payment_mode, order_type, quantity, revenue)
+        SELECT substr(o.order_date, 1, 10), oi.item_id, MAX(oi.item_name), MAX(oi.category),
+               COALESCE(o.payment_mode, ''), COALESCE(o.order_type, ''),
+               SUM(oi.quantity), SUM(oi.quantity * COALESCE(oi.unit_price, 0))
+        FROM orders o
+        JOIN order_items oi ON o.id = oi.order_id
+        WHERE o.order_date IS NOT NULL
+        GROUP BY 1, 2, 5, 6
+    """)
+
+
+def _m005_menu_sku(cur, ctx):
+    # upsert keys for bulk price-list imports
+    cols = {row[1] for row in cur.execute("PRAGMA table_info(menu)")}
+    if "sku" not in cols:
+        cur.execute("ALTER TABLE menu ADD COLUMN sku TEXT")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_menu_sku ON menu(sku) WHERE sku IS NOT NULL")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_menu_item_name ON menu(item_name COLLATE NOCASE)")
+
+
+def _m006_open_tickets(cur, ctx):
+    # order status, running GST buckets and the void log for running tabs
+    cols = {row[1] for row in cur.execute("PRAGMA table_info(orders)")}
+    if "status" not in cols:
+        # existing orders were all committed in one shot, i.e. closed
+        cur.execute("ALTER TABLE orders ADD COLUMN status TEXT NOT NULL DEFAULT 'closed'")
+    if "opened_at" not in cols:
+        cur.execute("ALTER TABLE orders ADD COLUMN opened_at TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_open ON orders(status) WHERE status = 'open'")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS order_tax (
+        order_id INTEGER NOT NULL,
+        gst_rate REAL NOT NULL,
+        taxable INTEGER NOT NULL DEFAULT 0,     -- minor units (1/100 DA)
+        PRIMARY KEY (order_id, gst_rate)
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS order_voids (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER NOT NULL,
+        order_item_id INTEGER,
+        item_id INTEGER,
+        item_name TEXT,
+        unit_price REAL,
+        quantity INTEGER,
+        voided_at TEXT
+    );
+    """)
+
+
+def _m007_kitchen_tickets(cur, ctx):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS kitchen_tickets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER NOT NULL,
+        station TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'new',     -- new / preparing / ready / served
+        seq INTEGER NOT NULL,
+        order_type TEXT,
+        table_id INTEGER,
+        items TEXT NOT NULL,                    -- JSON [{"name", "quantity"}]
+        created_at TEXT,
+        updated_at TEXT
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_kitchen_tickets_seq ON kitchen_tickets(seq)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_kitchen_tickets_active ON kitchen_tickets(status) "
+                "WHERE status != 'served'")
+
+
+def _m008_menu_search(cur, ctx):
+    # FTS5 mirror of menu(item_name, category); skipped (returns False) when
+    # SQLite was built without FTS5, and menu_search.fts_search() falls back to LIKE.
+    # migrate() runs it again while menu_fts is missing (see OPTIONAL)
+    try:
+        cur.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS menu_fts USING fts5(
+                           item_name, category, content='menu', content_rowid='id',
+                           tokenize='unicode61 remove_diacritics 2', prefix='2 3')""")
+    except sqlite3.OperationalError:
+        return False
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS menu_fts_ai AFTER INSERT ON menu BEGIN
+                       INSERT INTO menu_fts (rowid, item_name, category) VALUES (new.id, new.item_name, new.category);
+                   END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS menu_fts_ad AFTER DELETE ON menu BEGIN
+                       INSERT INTO menu_fts (menu_fts, rowid, item_name, category)
+                       VALUES ('delete', old.id, old.item_name, old.category);
+                   END""")
+    cur.execute("""CREATE TRIGGER IF NOT EXISTS menu_fts_au AFTER UPDATE OF item_name, category ON menu BEGIN
+                       INSERT INTO menu_fts (menu_fts, rowid, item_name, category)
+                       VALUES ('delete', old.id, old.item_name, old.category);
+                       INSERT INTO menu_fts (rowid, item_name, category) VALUES (new.id, new.item_name, new.category);
+                   END""")
+    cur.execute("INSERT INTO menu_fts (menu_fts) VALUES ('rebuild')")
+    return True
+
+
+def _m009_branches(cur, ctx):
+    # an existing DB file becomes the shard of the configured branch ("main" by default;
+    # db_utils validates RBS_BRANCH), with the sync sequence consolidation pulls by
+    cur.execute("CREATE TABLE IF NOT EXISTS branch_info (branch_id TEXT NOT NULL, created_at TEXT)")
+    if not cur.execute("SELECT COUNT(*) FROM branch_info").fetchone()[0]:
+        cur.execute("INSERT INTO branch_info (branch_id, created_at) VALUES (?, ?)",
+                    (ctx.get("branch_id") or "main", datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    cols = {row[1] for row in cur.execute("PRAGMA table_info(orders)")}
+    if "branch_id" not in cols:
+        cur.execute("ALTER TABLE orders ADD COLUMN branch_id TEXT")
+    if "sync_seq" not in cols:
+        cur.execute("ALTER TABLE orders ADD COLUMN sync_seq INTEGER")
+    if "branch_id" not in {row[1] for row in cur.execute("PRAGMA table_info(tables)")}:
+        cur.execute("ALTER TABLE tables ADD COLUMN branch_id TEXT")
+
+    # existing rows: closed orders are queued for the first sync in id order
+    cur.execute("UPDATE orders SET branch_id = (SELECT branch_id FROM branch_info) WHERE branch_id IS NULL")
+    cur.execute("UPDATE tables SET branch_id = (SELECT branch_id FROM branch_info) WHERE branch_id IS NULL")
+    cur.execute("UPDATE orders SET sync_seq = id WHERE status = 'closed' AND sync_seq IS NULL")
+    cur.execute("""INSERT INTO app_meta (key, value)
+                   VALUES ('sync_seq', (SELECT COALESCE(MAX(sync_seq), 0) FROM orders))
+                   ON CONFLICT(key) DO NOTHING""")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_orders_sync_seq ON orders(sync_seq) WHERE sync_seq IS NOT NULL")
+
+    # the UPDATEs inside these triggers only touch branch_id / sync_seq, so they don't re-fire orders_sync_au
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS orders_branch_ai AFTER INSERT ON orders BEGIN
+        UPDATE app_meta SET value = value + 1 WHERE key = 'sync_seq' AND NEW.status = 'closed';
+        UPDATE orders SET branch_id = COALESCE(NEW.branch_id, (SELECT branch_id FROM branch_info)),
+                          sync_seq = CASE WHEN NEW.status = 'closed'
+                                          THEN (SELECT value FROM app_meta WHERE key = 'sync_seq') END
+        WHERE id = NEW.id;
+    END;
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS orders_sync_au
+    AFTER UPDATE OF status, order_date, order_type, payment_mode, table_id,
+                    subtotal, gst_amount, discount_amount, total_amount ON orders
+    WHEN NEW.status = 'closed' BEGIN
+        UPDATE app_meta SET value = value + 1 WHERE key = 'sync_seq';
+        UPDATE orders SET sync_seq = (SELECT value FROM app_meta WHERE key = 'sync_seq') WHERE id = NEW.id;
+    END;
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS tables_branch_ai AFTER INSERT ON tables WHEN NEW.branch_id IS NULL BEGIN
+        UPDATE tables SET branch_id = (SELECT branch_id FROM branch_info) WHERE id = NEW.id;
+    END;
+    """)
+
+
+def _m010_settlements(cur, ctx):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS settlements (
+        day TEXT PRIMARY KEY,
+        closed_at TEXT NOT NULL,
+        orders INTEGER NOT NULL,
+        subtotal REAL NOT NULL,
+        gst_amount REAL NOT NULL,
+        discount_amount REAL NOT NULL,
+        total_amount REAL NOT NULL,
+        summary TEXT NOT NULL,      -- JSON, see compute()
+        csv TEXT NOT NULL,
+        pdf BLOB NOT NULL
+    );
+    """)
+    # a closed day's figures never change
+    for event in ("UPDATE", "DELETE"):
+        cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS settlements_no_{event.lower()} BEFORE {event} ON settlements
+        BEGIN
+            SELECT RAISE(ABORT, 'settlements are immutable');
+        END
+        """)
+
+
+MIGRATIONS = [
+    (1, "base schema", _m001_base_schema),
+    (2, "secondary indexes", _m002_indexes),
+    (3, "daily sales rollup", _m003_sales_rollup),
+    (4, "order line price snapshots", _m004_order_item_snapshots),
+    (5, "menu sku", _m005_menu_sku),
+    (6, "open tickets", _m006_open_tickets),
+    (7, "kitchen tickets", _m007_kitchen_tickets),
+    (8, "menu search", _m008_menu_search),
+    (9, "branch shards", _m009_branches),
+    (10, "day settlements", _m010_settlements),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# steps that need an optional SQLite feature -> the table they create; an applied
+# step whose table is missing (e.g. the DB was migrated by a build without FTS5)
+# is run again by every migrate()
+OPTIONAL = {8: "menu_fts"}
+
+
+def current_version(conn):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT,
+        applied_at TEXT
+    );
+    """)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn, context=None):
+    """
+    Apply every migration newer than the DB's schema_version.
+    Call inside a transaction; returns the list of versions applied.
+    context: optional dict with "bills_json" / "sales_csv" paths used by data backfills.
+    """
+    context = context or {}
+    version = current_version(conn)
+    applied = []
+    for number, name, step in MIGRATIONS:
+        if number <= version:
+            continue
+        step(conn.cursor(), context)
+        conn.execute("INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                     (number, name, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        applied.append(number)
+    for number, name, step in MIGRATIONS:
+        if number in OPTIONAL and number <= version and not conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (OPTIONAL[number],)).fetchone():
+            step(conn.cursor(), context)
+    return applied
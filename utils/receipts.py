@@ -0,0 +1,283 @@
+"""
+Receipt rendering for committed orders: CSV, JSON and PDF.
+
+An order is fetched once into a plain receipt dict that all three formats
+render from, and every format prints the order's stored totals. PDFs are
+drawn with fpdf; the title block and table header are drawn once and
+their page operators replayed into each receipt (this reads fpdf 1.7's
+page buffers, hence the exact pin in requirements.txt). Rendered bytes of closed
+orders are kept in an LRU, and a whole day can be rendered in a process
+pool for end-of-day archiving:
+
+    python -m utils.receipts batch --day YYYY-MM-DD [--out DIR] [--workers N]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+import concurrent.futures
+
+from utils.calculator import MINOR, bucket_gst
+
+FORMATS = ("pdf", "csv", "json")
+MEMORY_CACHE_BYTES = 16 * 1024 * 1024
+
+_ORDER_COLUMNS = ["order_id", "order_type", "table_id", "payment_mode", "subtotal", "gst_amount",
+                  "discount_amount", "total_amount", "order_date", "status"]
+# an open ticket has no order_date yet; its running check shows the opening time
+_SELECT = ("SELECT id, order_type, table_id, payment_mode, subtotal, gst_amount, discount_amount, total_amount, "
+           "COALESCE(order_date, opened_at), status FROM orders ")
+
+
+# ------------------ loading ------------------
+def _attach_items(conn, receipts):
+    ids = list(receipts)
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        for order_id, qty, name, price, gst in conn.execute(
+                f"""SELECT order_id, quantity, item_name, COALESCE(unit_price, 0), gst_rate FROM order_items
+                    WHERE order_id IN ({",".join("?" * len(chunk))}) ORDER BY order_id, id""", chunk):
+            receipts[order_id]["items"].append((qty, name, price, gst))
+    return receipts
+
+
+def fetch(conn, order_ids):
+    """{order_id: receipt} for the given ids (missing ids are left out)."""
+    receipts = {}
+    ids = [int(i) for i in order_ids]
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        for row in conn.execute(_SELECT + f"WHERE id IN ({','.join('?' * len(chunk))})", chunk):
+            receipts[row[0]] = dict(zip(_ORDER_COLUMNS, row), items=[])
+    return _attach_items(conn, receipts)
+
+
+def fetch_day(conn, day):
+    """Receipts of every order placed on `day` ('YYYY-MM-DD'), oldest first."""
+    receipts = {}
+    for row in conn.execute(_SELECT + "WHERE order_date BETWEEN ? AND ? ORDER BY order_date, id",
+                            (day + " 00:00:00", day + " 23:59:59")):
+        receipts[row[0]] = dict(zip(_ORDER_COLUMNS, row), items=[])
+    return list(_attach_items(conn, receipts).values())
+
+
+# ------------------ csv / json ------------------
+def to_csv(receipt):
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    w.writerow(["item_name", "quantity", "price", "line_total"])
+    for qty, name, price, gst in receipt["items"]:
+        w.writerow([name, qty, price, qty * price])
+    w.writerow(["", "", "Total", receipt["total_amount"]])
+    return buf.getvalue()
+
+
+def to_json(receipt):
+    order_obj = {k: receipt[k] for k in ("order_id", "order_type", "table_id", "payment_mode",
+                                         "total_amount", "order_date")}
+    order_obj["items"] = [{"item_name": name, "quantity": qty, "price": price, "line_total": qty * price}
+                          for qty, name, price, gst in receipt["items"]]
+    return json.dumps(order_obj, ensure_ascii=False, indent=4)
+
+
+# ------------------ pdf ------------------
+COLUMNS = [("Item", 80, ""), ("Price", 30, "R"), ("Qty", 20, "R"), ("Total", 30, "R")]
+
+
+def _latin1(text):
+    return str(text).encode("latin-1", "replace").decode("latin-1")
+
+
+def _new_pdf():
+    from fpdf import FPDF  # loaded with the first PDF; keeps fpdf out of import time
+
+    pdf = FPDF()
+    # both fonts registered up front (F1 bold, F2 regular), so the replayed layout's font operators match
+    pdf.set_font("Arial", "B", 14)
+    pdf.set_font("Arial", size=11)
+    pdf.add_page()
+    return pdf
+
+
+@lru_cache(maxsize=None)
+def _static_layout():
+    """
+    The title block and the table header never change: draw them once and keep
+    fpdf's page operators and the y position after each, to replay per receipt.
+    """
+    pdf = _new_pdf()
+    mark = len(pdf.pages[1])
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Restaurant Bill", ln=True, align="C")
+    pdf.ln(4)
+    pdf.set_font("Arial", size=11)
+    title = (pdf.pages[1][mark:], pdf.y)
+    pdf.ln(16)  # the two order info lines
+    mark = len(pdf.pages[1])
+    pdf.ln(4)
+    pdf.set_font("Arial", "B", 11)
+    for name, width, align in COLUMNS:
+        pdf.cell(width, 8, name, border=1, align=align)
+    pdf.ln()
+    pdf.set_font("Arial", size=11)
+    return title, (pdf.pages[1][mark:], pdf.y)
+
+
+def _replay(pdf, layout):
+    ops, y = layout
+    pdf.pages[pdf.page] += ops
+    pdf.y = y
+
+
+def _totals(receipt):
+    """Total lines from the stored order figures, so the PDF agrees with the CSV and JSON."""
+    subtotal, gst = receipt["subtotal"] or 0, receipt["gst_amount"] or 0
+    rates = {}
+    for qty, name, price, rate in receipt["items"]:
+        rate = float(rate if rate is not None else 5)
+        rates[rate] = rates.get(rate, 0) + qty * int(round(price * MINOR))
+    buckets = [(rate, bucket_gst(taxable, rate) / MINOR) for rate, taxable in sorted(rates.items())]
+    lines = [("Subtotal:", subtotal)]
+    # the per-rate split is shown only where it adds up to the GST that was charged
+    if buckets and abs(sum(g for _, g in buckets) - gst) < 0.005:
+        lines += [(f"GST ({rate:g}%):", g) for rate, g in buckets]
+    else:
+        lines.append(("GST:", gst))
+    if receipt["discount_amount"]:
+        lines.append(("Discount:", -receipt["discount_amount"]))
+    return lines
+
+
+def to_pdf(receipt):
+    title, header = _static_layout()
+    pdf = _new_pdf()
+    _replay(pdf, title)
+    pdf.cell(0, 8, _latin1(f"Order ID: {receipt['order_id']}  |  Type: {receipt['order_type']}  |  "
+                           f"Table: {receipt['table_id']}"), ln=True)
+    pdf.cell(0, 8, _latin1(f"Date: {receipt['order_date']}"), ln=True)
+    _replay(pdf, header)
+    for qty, name, price, gst in receipt["items"]:
+        pdf.cell(80, 8, _latin1(name), border=1)
+        pdf.cell(30, 8, f"{price:.2f}", border=1, align="R")
+        pdf.cell(20, 8, str(qty), border=1, align="R")
+        pdf.cell(30, 8, f"{qty * price:.2f}", border=1, align="R")
+        pdf.ln()
+    pdf.ln(6)
+    for label, amount in _totals(receipt):
+        pdf.cell(130, 8, "", ln=False)
+        pdf.cell(30, 8, label, align="R")
+        pdf.cell(30, 8, f"{amount:.2f}", align="R", ln=True)
+    pdf.cell(130, 8, "", ln=False)
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(30, 8, "Total:", align="R")
+    pdf.cell(30, 8, f"{receipt['total_amount'] or 0:.2f}", align="R", ln=True)
+    return pdf.output(dest="S").encode("latin-1")
+
+
+RENDERERS = {"pdf": to_pdf, "csv": to_csv, "json": to_json}
+
+
+def render(receipt, fmt):
+    if fmt not in RENDERERS:
+        raise ValueError(f"unknown receipt format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    return RENDERERS[fmt](receipt)
+
+
+# ------------------ cache ------------------
+class ReceiptCache:
+    """
+    Byte-bounded LRU of receipts and their rendered formats, keyed
+    (db, order_id, fmt): order ids are only unique within one database, and a
+    process can serve several (a branch shard next to the main DB).
+    """
+
+    def __init__(self, max_bytes=MEMORY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._lru = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db, order_id, fmt):
+        key = (db, order_id, fmt)
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, db, order_id, fmt, value, size):
+        key = (db, order_id, fmt)
+        with self._lock:
+            old = self._lru.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._lru[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._lru:
+                _, (_, dropped) = self._lru.popitem(last=False)
+                self._bytes -= dropped
+
+    def invalidate(self, db=None, order_ids=None):
+        """Drop the given orders of `db`, every entry of `db`, or (no arguments) everything."""
+        with self._lock:
+            if db is None:
+                self._lru.clear()
+                self._bytes = 0
+                return
+            ids = None if order_ids is None else {int(i) for i in order_ids}
+            for key in [k for k in self._lru if k[0] == db and (ids is None or k[1] in ids)]:
+                self._bytes -= self._lru.pop(key)[1]
+
+
+def receipt_size(receipt):
+    return 200 + 80 * len(receipt["items"])
+
+
+# ------------------ batch ------------------
+def _render_pdf_to(args):
+    receipt, dest = args
+    data = to_pdf(receipt)
+    with open(dest, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def write_batch(receipts, out_dir, workers=None):
+    """Render receipts to <out_dir>/receipt_<id>.pdf in a process pool; returns (files, bytes)."""
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(r, os.path.join(out_dir, f"receipt_{r['order_id']}.pdf")) for r in receipts]
+    if workers == 1 or len(jobs) < 64:
+        sizes = list(map(_render_pdf_to, jobs))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as ex:
+            sizes = list(ex.map(_render_pdf_to, jobs, chunksize=max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 4))))
+    return len(sizes), sum(sizes)
+
+
+def main(argv=None):
+    from utils import db_utils
+
+    ap = argparse.ArgumentParser(prog="python -m utils.receipts")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("batch", help="render every receipt of one day to PDF files")
+    b.add_argument("--day", required=True, help="YYYY-MM-DD")
+    b.add_argument("--out", default=db_utils.RECEIPTS_DIR)
+    b.add_argument("--workers", type=int)
+    args = ap.parse_args(argv)
+
+    db_utils.initialize_database()
+    files, size = db_utils.archive_day_receipts(args.day, args.out, args.workers)
+    print(f"{files} receipts ({size / 1024:.0f} KiB) written to {os.path.join(args.out, args.day)}")
+
+
+if __name__ == "__main__":
+    main()
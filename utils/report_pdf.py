@@ -0,0 +1,205 @@
+"""
+Tabular report PDFs on the reportlab canvas.
+
+Rows go in as DataFrames (formatted a column at a time with pandas/numpy
+string ops) or as an iterator of row tuples, and come out as fixed
+columns with a header on every page, page numbers and an optional totals
+row. Each page column is emitted as one text object with one
+"(text) Tj T*" per row instead of a drawString call per cell; numeric
+columns use Courier and are right-aligned by padding, so no per-value
+width measurement is needed.
+
+    report = TableReport(out, auto_columns(df), title="Sales", totals=["line_total"])
+    report.write_frame(df)        # or report.write_rows(iterable_of_tuples)
+    report.close()
+"""
+import io
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfgen import canvas
+
+# reportlab's pure-Python ASCII85 pass costs more than the rest of the layout, and
+# binary (Flate-only) streams are a third smaller. reportlab reads this module
+# global while saving, so it is set once here, not toggled per report (threads).
+rl_config.useA85 = 0
+
+# width in points; fmt is a printf-style format for numeric columns ("%.2f", "%d")
+Column = namedtuple("Column", ["name", "width", "align", "fmt"], defaults=[80, "left", None])
+
+FONT, BOLD, MONO = "Helvetica", "Helvetica-Bold", "Courier"
+MARGIN = 30
+# average glyph width in em; used to cut text to its column instead of measuring every value
+_EM = {FONT: 0.55, MONO: 0.6}
+
+
+def auto_columns(df, page_width=landscape(A4)[0] - 2 * MARGIN, font_size=8, sample=1000):
+    """Column specs for a DataFrame: numbers right-aligned, widths from a sample of the values."""
+    cols, widths = [], []
+    head = df.head(sample)
+    for name in df.columns:
+        s = head[name]
+        if pd.api.types.is_float_dtype(s):
+            fmt, align = "%.2f", "right"
+        elif pd.api.types.is_integer_dtype(s) or pd.api.types.is_bool_dtype(s):
+            fmt, align = "%d", "right"
+        else:
+            fmt, align = None, "left"
+        text = _format(s, fmt) if len(s) else pd.Series([], dtype=object)
+        chars = max([len(str(name))] + ([int(text.str.len().max())] if len(text) else []))
+        cols.append((name, align, fmt))
+        widths.append(min(chars, 40) * font_size * (_EM[MONO] if align == "right" else _EM[FONT]) + 8)
+    scale = min(1.0, page_width / max(sum(widths), 1))
+    return [Column(name, w * scale, align, fmt) for (name, align, fmt), w in zip(cols, widths)]
+
+
+def _format(s, fmt, width=None):
+    if fmt is None:
+        return s.fillna("").astype(str)
+    if width:
+        fmt = f"%{width}{fmt[1:]}"  # "%.2f" -> "%12.2f": right-aligned by padding
+    values = pd.to_numeric(s, errors="coerce")
+    out = pd.Series(np.char.mod(fmt, values.fillna(0).to_numpy()), index=s.index, dtype=object)
+    return out.where(values.notna(), " " * (width or 0))
+
+
+def _pdf_text(s):
+    """Escape a str Series for a PDF literal string (WinAnsi, non-ASCII as octal escapes)."""
+    if s.str.contains(r"[\\()\r\n\t]", regex=True).any():
+        s = s.str.replace(r"[\r\n\t]", " ", regex=True).str.replace(r"([\\()])", r"\\\1", regex=True)
+    if not s.map(str.isascii).all():
+        s = s.map(lambda v: v.encode("cp1252", "replace").decode("latin-1")) \
+             .str.replace(r"[\x80-\xff]", lambda m: "\\%03o" % ord(m.group()), regex=True)
+    return s
+
+
+def _cells(s, col, chars):
+    """Series -> array of "(text) Tj T*" operators, formatting each distinct value once."""
+    codes, uniques = pd.factorize(s, use_na_sentinel=False)
+    text = _format(pd.Series(uniques), col.fmt, chars if col.align == "right" else None)
+    if len(text) and text.str.len().max() > chars:
+        text = text.str.slice(0, chars)
+    ops = ("(" + _pdf_text(text) + ") Tj T*").to_numpy()
+    return ops[codes]
+
+
+class TableReport:
+    """Streaming multi-page table writer; pages are laid out as soon as they fill."""
+
+    def __init__(self, out, columns, title="Report", pagesize=None, font_size=8, totals=()):
+        self.columns = [c if isinstance(c, Column) else Column(*c) for c in columns]
+        self.title = title
+        self.font_size = font_size
+        self.leading = font_size * 1.25
+        self.totals = {name: 0 for name in totals}
+        self.rows = 0
+        self.pages = 0
+        self._size = pagesize or landscape(A4)
+        self._c = canvas.Canvas(out, pagesize=self._size, pageCompression=1)
+        self._c.setTitle(title)
+        width, height = self._size
+        self._top = height - MARGIN - 34  # first body baseline, below title and column header
+        self._per_page = int((self._top - MARGIN) / self.leading) + 1
+        self._pending = [[] for _ in self.columns]  # escaped cell strings waiting for a page
+        self._x = []
+        x = MARGIN
+        for col in self.columns:
+            self._x.append(x)
+            x += col.width
+        fonts = [MONO if c.align == "right" else FONT for c in self.columns]
+        self._fonts = fonts
+        self._chars = [max(1, int((c.width - 6) / (self.font_size * _EM[f]))) for c, f in zip(self.columns, fonts)]
+
+    # ------------------ input ------------------
+    def write_frame(self, df):
+        """Append the rows of a DataFrame with (at least) the report's columns."""
+        if df.empty:
+            return
+        for name in self.totals:
+            self.totals[name] += pd.to_numeric(df[name], errors="coerce").sum()
+        for i, (col, chars) in enumerate(zip(self.columns, self._chars)):
+            self._pending[i].extend(_cells(df[col.name], col, chars).tolist())
+        self.rows += len(df)
+        start = 0
+        while len(self._pending[0]) - start >= self._per_page:
+            self._page(start, self._per_page)
+            start += self._per_page
+        for cells in self._pending:
+            del cells[:start]
+
+    def write_rows(self, rows):
+        """Append row tuples in column order (e.g. a fetchmany() chunk)."""
+        self.write_frame(pd.DataFrame.from_records(list(rows), columns=[c.name for c in self.columns]))
+
+    def close(self):
+        if self._pending[0] or not self.pages:
+            self._page(0, len(self._pending[0]))
+        if self.totals:
+            self._totals_row()
+        self._c.showPage()
+        self._c.save()
+
+    # ------------------ layout ------------------
+    def _right(self, i):
+        # right edge of the padded Courier text in column i
+        return self._x[i] + 3 + self._chars[i] * self.font_size * _EM[MONO]
+
+    def _header(self):
+        c = self._c
+        width, height = self._size
+        c.setFont(BOLD, 12)
+        c.drawString(MARGIN, height - MARGIN - 12, self.title)
+        c.setFont(FONT, 8)
+        c.drawRightString(width - MARGIN, height - MARGIN - 12, f"Page {self.pages}")
+        y = height - MARGIN - 28
+        c.setFont(BOLD, self.font_size)
+        for i, (col, x) in enumerate(zip(self.columns, self._x)):
+            if col.align == "right":
+                c.drawRightString(self._right(i), y, col.name)
+            else:
+                c.drawString(x + 3, y, col.name)
+        c.setLineWidth(0.5)
+        c.line(MARGIN, y - 3, self._x[-1] + self.columns[-1].width, y - 3)
+
+    def _page(self, start, n):
+        c = self._c
+        if self.pages:
+            c.showPage()
+        self.pages += 1
+        self._header()
+        for i, (x, font) in enumerate(zip(self._x, self._fonts)):
+            cells = self._pending[i][start:start + n]
+            if not cells:
+                continue
+            t = c.beginText(x + 3, self._top)
+            t.setFont(font, self.font_size, self.leading)
+            # the text object only sets origin and font; the rows go in as one literal
+            c.addLiteral(t.getCode()[:-2] + " ".join(cells) + " ET")
+        self._y = self._top - n * self.leading
+
+    def _totals_row(self):
+        if self._y < MARGIN:
+            self._page(0, 0)
+        c = self._c
+        y = self._y - 2
+        c.setLineWidth(0.5)
+        c.line(MARGIN, y + self.leading - 2, self._x[-1] + self.columns[-1].width, y + self.leading - 2)
+        c.setFont(BOLD, self.font_size)
+        c.drawString(self._x[0] + 3, y, "Total")
+        c.setFont(MONO + "-Bold", self.font_size)
+        for i, col in enumerate(self.columns):
+            if col.name in self.totals:
+                value = _format(pd.Series([self.totals[col.name]]), col.fmt or "%.2f").iloc[0]
+                c.drawRightString(self._right(i), y, value)
+
+
+def dataframe_to_pdf(df, title="Report", columns=None, totals=()):
+    """Whole DataFrame -> PDF bytes."""
+    buf = io.BytesIO()
+    report = TableReport(buf, columns or auto_columns(df), title=title, totals=totals)
+    report.write_frame(df)
+    report.close()
+    return buf.getvalue()
@@ -0,0 +1,144 @@
+"""
+Incrementally maintained daily sales rollup.
+
+sales_daily holds one row per day x item x payment_mode x order_type with
+the quantity and line revenue sold; sales_daily_orders holds the order
+counts and money totals per day x payment_mode x order_type. Both are
+updated inside the order-commit transaction, so reports read a few
+hundred pre-aggregated rows instead of every line item.
+
+Backfill existing history with:
+
+    python -m utils.rollup backfill [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+
+Days pruned from SQLite by the archive keep their rollup rows (they are
+the only copy of those days left in the DB), so a rebuild never touches
+days up to the 'archive_pruned_through' mark.
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from utils import archive
+
+
+def apply_order(conn, order_date, order_type, payment_mode, subtotal, gst_amount, discount_amount, total, lines):
+    """
+    Add one committed order to the rollup. Call inside the commit transaction.
+    lines: iterable of (item_id, item_name, category, price, quantity)
+    """
+    day = order_date[:10]
+    payment_mode = payment_mode or ""
+    order_type = order_type or ""
+    conn.execute("""
+        INSERT INTO sales_daily_orders
+            (day, payment_mode, order_type, orders, subtotal, gst_amount, discount_amount, total_amount)
+        VALUES (?, ?, ?, 1, ?, ?, ?, ?)
+        ON CONFLICT(day, payment_mode, order_type) DO UPDATE SET
+            orders = orders + 1,
+            subtotal = subtotal + excluded.subtotal,
+            gst_amount = gst_amount + excluded.gst_amount,
+            discount_amount = discount_amount + excluded.discount_amount,
+            total_amount = total_amount + excluded.total_amount
+    """, (day, payment_mode, order_type, subtotal or 0, gst_amount or 0, discount_amount or 0, total or 0))
+    conn.executemany("""
+        INSERT INTO sales_daily
+            (day, item_id, item_name, category, payment_mode, order_type, quantity, revenue)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(day, item_id, payment_mode, order_type) DO UPDATE SET
+            item_name = excluded.item_name,
+            category = excluded.category,
+            quantity = quantity + excluded.quantity,
+            revenue = revenue + excluded.revenue
+    """, [(day, int(item_id), name, category, payment_mode, order_type, int(qty), float(price) * int(qty))
+          for item_id, name, category, price, qty in lines])
+
+
+def _range(column, start, end):
+    if start and end:
+        return f" WHERE {column} BETWEEN ? AND ?", [start, end]
+    return "", []
+
+
+def rebuild(conn, start=None, end=None):
+    """
+    Recompute the rollup for [start, end] (whole history if omitted) from
+    orders/order_items, leaving pruned days as they are.
+    """
+    pruned = archive.get_mark(conn, archive.PRUNED_KEY)
+    if pruned:
+        first = (datetime.strptime(pruned, "%Y-%m-%d").date() + timedelta(days=1)).isoformat()
+        start, end = max(start or first, first), end or "9999-12-31"
+        if start > end:
+            return
+    where, params = _range("day", start, end)
+    conn.execute("DELETE FROM sales_daily" + where, params)
+    conn.execute("DELETE FROM sales_daily_orders" + where, params)
+
+    # open tickets (no order_date until settled) are added by tickets.settle()
+    owhere, oparams = " WHERE o.order_date IS NOT NULL", []
+    if start and end:
+        owhere, oparams = " WHERE o.order_date BETWEEN ? AND ?", [start + " 00:00:00", end + " 23:59:59"]
+    conn.execute("""
+        INSERT INTO sales_daily_orders
+            (day, payment_mode, order_type, orders, subtotal, gst_amount, discount_amount, total_amount)
+        SELECT substr(o.order_date, 1, 10), COALESCE(o.payment_mode, ''), COALESCE(o.order_type, ''),
+               COUNT(*), COALESCE(SUM(o.subtotal), 0), COALESCE(SUM(o.gst_amount), 0),
+               COALESCE(SUM(o.discount_amount), 0), COALESCE(SUM(o.total_amount), 0)
+        FROM orders o""" + owhere + """
+        GROUP BY 1, 2, 3
+    """, oparams)
+    conn.execute("""
+        INSERT INTO sales_daily
+            (day, item_id, item_name, category, payment_mode, order_type, quantity, revenue)
+        SELECT substr(o.order_date, 1, 10), oi.item_id, MAX(oi.item_name), MAX(oi.category),
+               COALESCE(o.payment_mode, ''), COALESCE(o.order_type, ''),
+               SUM(oi.quantity), SUM(oi.quantity * COALESCE(oi.unit_price, 0))
+        FROM orders o
+        JOIN order_items oi ON o.id = oi.order_id""" + owhere + """
+        GROUP BY 1, 2, 5, 6
+    """, oparams)
+
+
+# ------------------ reads ------------------
+def totals(conn, start=None, end=None):
+    where, params = _range("day", start, end)
+    row = conn.execute("""
+        SELECT COALESCE(SUM(orders), 0), COALESCE(SUM(subtotal), 0), COALESCE(SUM(gst_amount), 0),
+               COALESCE(SUM(discount_amount), 0), COALESCE(SUM(total_amount), 0)
+        FROM sales_daily_orders""" + where, params).fetchone()
+    return dict(zip(["orders", "subtotal", "gst_amount", "discount_amount", "total_amount"], row))
+
+
+ITEM_COLUMNS = ["day", "item_name", "category", "payment_mode", "order_type", "quantity", "revenue"]
+
+
+def item_rows(conn, start=None, end=None):
+    where, params = _range("day", start, end)
+    return conn.execute("SELECT " + ", ".join(ITEM_COLUMNS) + " FROM sales_daily" + where +
+                        " ORDER BY day DESC, category, item_name", params).fetchall()
+
+
+def most_sold(conn, start=None, end=None, top_n=10):
+    where, params = _range("day", start, end)
+    return conn.execute("""
+        SELECT item_name, SUM(quantity) AS quantity FROM sales_daily""" + where + """
+        GROUP BY item_id ORDER BY quantity DESC LIMIT ?""", params + [int(top_n)]).fetchall()
+
+
+def main(argv=None):
+    from utils import db_utils
+
+    ap = argparse.ArgumentParser(prog="python -m utils.rollup")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    bf = sub.add_parser("backfill", help="rebuild the rollup from existing orders")
+    bf.add_argument("--start")
+    bf.add_argument("--end")
+    args = ap.parse_args(argv)
+
+    db_utils.initialize_database()
+    db_utils.rebuild_sales_rollup(args.start, args.end)
+    print("sales rollup rebuilt" + (f" for {args.start}..{args.end}" if args.start and args.end else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+End-of-day settlement (Z-report).
+
+Closing a day reads that day's closed orders and their lines once, in a
+single pass, and totals them in minor units by payment mode, order type
+and GST rate (rounded per order and rate bucket like compute_bills), plus
+discounts, voids and the best-selling items. The result is frozen into a
+`settlements` row together with its CSV and PDF, rendered once.
+Triggers refuse any UPDATE or DELETE of a settlement, so a closed day's
+figures never change. Orders recorded for the day after it was closed
+are not added; they show up as `late_orders`.
+
+A closed day is then read by its primary key: constant time, however
+many orders the day had.
+
+    python -m utils.settlement close [--day YYYY-MM-DD]     (default: today)
+    python -m utils.settlement show --day YYYY-MM-DD
+    python -m utils.settlement export --day YYYY-MM-DD --format pdf|csv --out FILE
+"""
+import argparse
+import csv
+import io
+import json
+
+from utils.calculator import MINOR, bucket_gst
+
+PAYMENT_MODES = ("Cash", "Card", "UPI")
+TOP_ITEMS = 20
+FORMATS = ("pdf", "csv")
+SUMMARY_COLUMNS = ["day", "closed_at", "orders", "subtotal", "gst_amount", "discount_amount", "total_amount"]
+ROW_COLUMNS = ["section", "name", "orders", "quantity", "taxable", "amount"]
+
+
+def _minor(value):
+    return int(round((value or 0) * MINOR))
+
+
+def _add(groups, key, orders, amount):
+    g = groups.setdefault(key, [0, 0])
+    g[0] += orders
+    g[1] += amount
+
+
+def compute(conn, day, top_n=TOP_ITEMS):
+    """
+    The Z-report figures for `day` (YYYY-MM-DD) in one pass over its closed
+    orders and their lines; returns a JSON-ready dict.
+    """
+    totals = [0, 0, 0, 0, 0]  # orders, subtotal, gst, discount, total (minor units)
+    payments = {mode: [0, 0] for mode in PAYMENT_MODES}
+    types, rates, items = {}, {}, {}
+    discounted = [0, 0]
+    first = last = None
+    current, buckets = None, {}
+
+    def close_order():
+        for rate, taxable in buckets.items():
+            r = rates.setdefault(rate, [0, 0])
+            r[0] += taxable
+            r[1] += bucket_gst(taxable, rate)
+        buckets.clear()
+
+    rows = conn.execute("""
+        SELECT o.id, o.order_date, COALESCE(o.payment_mode, ''), COALESCE(o.order_type, ''), o.subtotal,
+               o.gst_amount, o.discount_amount, o.total_amount,
+               oi.item_id, oi.item_name, oi.category, oi.unit_price, oi.quantity, oi.gst_rate
+        FROM orders o
+        LEFT JOIN order_items oi ON oi.order_id = o.id
+        WHERE o.order_date BETWEEN ? AND ? AND o.status = 'closed'
+        ORDER BY o.order_date, o.id
+    """, (day + " 00:00:00", day + " 23:59:59"))
+    for (order_id, order_date, payment, order_type, subtotal, gst, discount, total,
+         item_id, name, category, price, quantity, rate) in rows:
+        if order_id != current:
+            close_order()
+            current = order_id
+            first = first or order_date
+            last = order_date
+            total = _minor(total)
+            totals[0] += 1
+            totals[1] += _minor(subtotal)
+            totals[2] += _minor(gst)
+            totals[3] += _minor(discount)
+            totals[4] += total
+            _add(payments, payment, 1, total)
+            _add(types, order_type, 1, total)
+            if _minor(discount):
+                discounted[0] += 1
+                discounted[1] += _minor(discount)
+        if item_id is None or not quantity:
+            continue
+        line = _minor(price) * int(quantity)
+        rate = float(rate if rate is not None else 5)
+        buckets[rate] = buckets.get(rate, 0) + line
+        it = items.setdefault(item_id, [name, category, 0, 0])
+        it[2] += int(quantity)
+        it[3] += line
+    close_order()
+
+    voids = conn.execute("""SELECT COUNT(*), COALESCE(SUM(quantity), 0), COALESCE(SUM(quantity * unit_price), 0)
+                            FROM order_voids WHERE voided_at BETWEEN ? AND ?""",
+                         (day + " 00:00:00", day + " 23:59:59")).fetchone()
+    open_tickets = conn.execute("SELECT COUNT(*) FROM orders WHERE status = 'open'").fetchone()[0]
+    best = sorted(items.values(), key=lambda it: (-it[2], -it[3], it[0] or ""))[:top_n]
+    return {
+        "day": day, "first_order": first, "last_order": last,
+        "orders": totals[0], "subtotal": totals[1] / MINOR, "gst_amount": totals[2] / MINOR,
+        "discount_amount": totals[3] / MINOR, "total_amount": totals[4] / MINOR,
+        "payment_modes": [{"payment_mode": k, "orders": n, "total_amount": a / MINOR}
+                          for k, (n, a) in payments.items()],
+        "order_types": [{"order_type": k, "orders": n, "total_amount": a / MINOR}
+                        for k, (n, a) in sorted(types.items())],
+        "gst_rates": [{"rate": r, "taxable": t / MINOR, "gst": g / MINOR} for r, (t, g) in sorted(rates.items())],
+        "discounts": {"orders": discounted[0], "amount": discounted[1] / MINOR},
+        "voids": {"lines": voids[0], "quantity": voids[1], "amount": round(voids[2], 2)},
+        "top_items": [{"item_name": n, "category": c, "quantity": q, "revenue": r / MINOR}
+                      for n, c, q, r in best],
+        "open_tickets": open_tickets,
+    }
+
+
+# ------------------ documents ------------------
+def rows(summary):
+    """The report as (section, name, orders, quantity, taxable, amount) tuples, shared by the CSV and PDF."""
+    out = [("Totals", "Subtotal", summary["orders"], None, None, summary["subtotal"]),
+           ("Totals", "GST", None, None, summary["subtotal"], summary["gst_amount"]),
+           ("Totals", "Discounts", summary["discounts"]["orders"], None, None, -summary["discount_amount"]),
+           ("Totals", "Total", summary["orders"], None, None, summary["total_amount"])]
+    out += [("Payment mode", p["payment_mode"] or "-", p["orders"], None, None, p["total_amount"])
+            for p in summary["payment_modes"]]
+    out += [("Order type", t["order_type"] or "-", t["orders"], None, None, t["total_amount"])
+            for t in summary["order_types"]]
+    out += [("GST rate", f"{g['rate']:g}%", None, None, g["taxable"], g["gst"]) for g in summary["gst_rates"]]
+    voids = summary["voids"]
+    out.append(("Voids", f"{voids['lines']} lines", None, voids["quantity"], None, voids["amount"]))
+    out += [("Top items", it["item_name"], None, it["quantity"], None, it["revenue"]) for it in summary["top_items"]]
+    return out
+
+
+def to_csv(summary):
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    w.writerow(ROW_COLUMNS)
+    w.writerows(rows(summary))
+    return buf.getvalue()
+
+
+def to_pdf(summary):
+    from utils import report_pdf  # reportlab is only loaded when a day is closed
+    columns = [report_pdf.Column("section", 90), report_pdf.Column("name", 260),
+               report_pdf.Column("orders", 70, "right", "%d"), report_pdf.Column("quantity", 70, "right", "%d"),
+               report_pdf.Column("taxable", 100, "right", "%.2f"), report_pdf.Column("amount", 100, "right", "%.2f")]
+    title = (f"Z-report {summary['day']}: {summary['orders']} orders, {summary['total_amount']:.2f} DA "
+             f"(closed {summary['closed_at']})")
+    buf = io.BytesIO()
+    report = report_pdf.TableReport(buf, columns, title=title)
+    report.write_rows(rows(summary))
+    report.close()
+    return buf.getvalue()
+
+
+# ------------------ records ------------------
+def freeze(conn, summary, csv_text, pdf):
+    """Insert the settlement; False (and nothing written) if the day was already closed."""
+    cur = conn.execute("""
+        INSERT INTO settlements (day, closed_at, orders, subtotal, gst_amount, discount_amount, total_amount,
+                                 summary, csv, pdf)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(day) DO NOTHING
+    """, (summary["day"], summary["closed_at"], summary["orders"], summary["subtotal"], summary["gst_amount"],
+          summary["discount_amount"], summary["total_amount"], json.dumps(summary), csv_text, pdf))
+    return cur.rowcount == 1
+
+
+def get(conn, day):
+    row = conn.execute("SELECT summary FROM settlements WHERE day = ?", (day,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def document(conn, day, fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    row = conn.execute(f"SELECT {fmt} FROM settlements WHERE day = ?", (day,)).fetchone()
+    return row[0] if row else None
+
+
+def listing(conn, start=None, end=None):
+    where, params = "", []
+    if start and end:
+        where, params = " WHERE day BETWEEN ? AND ?", [start, end]
+    return conn.execute("SELECT " + ", ".join(SUMMARY_COLUMNS) + " FROM settlements" + where +
+                        " ORDER BY day DESC", params).fetchall()
+
+
+def late_orders(conn, summary):
+    """Closed orders recorded for the day since it was settled (from the daily rollup)."""
+    row = conn.execute("SELECT COALESCE(SUM(orders), 0) FROM sales_daily_orders WHERE day = ?",
+                       (summary["day"],)).fetchone()
+    return max(row[0] - summary["orders"], 0)
+
+
+def main(argv=None):
+    from utils import db_utils
+
+    ap = argparse.ArgumentParser(prog="python -m utils.settlement")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("close", help="settle a day and freeze its Z-report")
+    c.add_argument("--day", help="YYYY-MM-DD (default: today)")
+    s = sub.add_parser("show", help="print a settled day's figures")
+    s.add_argument("--day", required=True)
+    e = sub.add_parser("export", help="write a settled day's PDF or CSV")
+    e.add_argument("--day", required=True)
+    e.add_argument("--format", choices=FORMATS, default="pdf")
+    e.add_argument("--out", required=True)
+    args = ap.parse_args(argv)
+
+    db_utils.bootstrap()
+    if args.cmd == "close":
+        summary, created = db_utils.close_day(args.day)
+        print(f"{summary['day']} {'closed' if created else 'was already closed'} at {summary['closed_at']}: "
+              f"{summary['orders']} orders, {summary['total_amount']:.2f} DA")
+    elif args.cmd == "show":
+        summary = db_utils.get_settlement(args.day)
+        if summary is None:
+            raise SystemExit(f"{args.day} is not settled")
+        print(json.dumps(summary, indent=2))
+    else:
+        data = db_utils.get_settlement_document(args.day, args.format)
+        if data is None:
+            raise SystemExit(f"{args.day} is not settled")
+        with open(args.out, "wb") as f:
+            f.write(data.encode("utf-8") if isinstance(data, str) else data)
+        print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
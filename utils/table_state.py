@@ -0,0 +1,143 @@
+"""
+Table state machine with compare-and-set transitions.
+
+    available -> occupied (order id) -> cleaning -> available
+
+Every transition is one conditional UPDATE (`... WHERE id = ? AND status = ?`),
+so two terminals can never seat the same table: the loser gets
+TableConflict and its transaction (e.g. the whole order) rolls back. Each
+change bumps the 'tables' counter in app_meta inside the same transaction.
+
+TableBoard keeps the current rows in memory for the process. Changes made
+through this process are pushed to it (and to its subscribers) right after
+commit; changes from other processes are picked up by a one-row version
+check at most every `max_age` seconds, and the rows are only re-read when
+that version moved.
+"""
+import threading
+import time
+
+STATUSES = ("available", "occupied", "cleaning")
+PREVIOUS = {"occupied": "available", "cleaning": "occupied", "available": "cleaning"}
+VERSION_KEY = "tables"
+COLUMNS = ["id", "name", "capacity", "status", "current_order_id"]
+
+
+class TableConflict(Exception):
+    """A transition lost the race: the table was not in the expected state."""
+
+    def __init__(self, table_id, expected, actual):
+        self.table_id = table_id
+        self.expected = expected
+        self.actual = actual
+        super().__init__(f"table {table_id} is {actual or 'missing'}, expected {expected}")
+
+
+def bump_version(conn):
+    conn.execute("""INSERT INTO app_meta (key, value) VALUES (?, 1)
+                    ON CONFLICT(key) DO UPDATE SET value = value + 1""", (VERSION_KEY,))
+
+
+def transition(conn, table_id, new_status, order_id=None, expected_order_id=None):
+    """
+    Move a table from the state before `new_status` to `new_status`; call inside
+    a transaction. Occupying needs the order id; freeing (-> cleaning) can be
+    pinned to the order being closed with expected_order_id. Raises TableConflict.
+    """
+    if new_status not in PREVIOUS:
+        raise ValueError(f"unknown table status {new_status!r}")
+    if new_status == "occupied" and order_id is None:
+        raise ValueError("occupying a table needs an order id")
+    expected = PREVIOUS[new_status]
+    sql = """UPDATE tables SET status = ?,
+                 current_order_id = CASE ? WHEN 'occupied' THEN ? WHEN 'available' THEN NULL
+                                    ELSE current_order_id END
+             WHERE id = ? AND status = ?"""
+    params = [new_status, new_status, order_id, int(table_id), expected]
+    if expected_order_id is not None:
+        sql += " AND current_order_id = ?"
+        params.append(int(expected_order_id))
+    if conn.execute(sql, params).rowcount != 1:
+        row = conn.execute("SELECT status, current_order_id FROM tables WHERE id = ?", (int(table_id),)).fetchone()
+        actual = row[0] if row else None
+        if row and expected_order_id is not None and row[0] == expected:
+            actual = f"{row[0]} with order {row[1]}"
+        raise TableConflict(table_id, expected, actual)
+    bump_version(conn)
+
+
+def load(conn):
+    """(version, rows) read in one transaction-consistent pass."""
+    row = conn.execute("SELECT value FROM app_meta WHERE key = ?", (VERSION_KEY,)).fetchone()
+    rows = [dict(zip(COLUMNS, r)) for r in
+            conn.execute("SELECT " + ", ".join(COLUMNS) + " FROM tables ORDER BY id")]
+    return (row[0] if row else 0), rows
+
+
+class TableBoard:
+    """
+    In-memory table statuses for one process.
+
+    `load_fn()` returns (version, rows); `version_fn()` is the cheap one-row
+    version lookup. Subscribers are called as fn(version, rows) after every
+    change seen by this process.
+    """
+
+    def __init__(self, load_fn, version_fn, max_age=1.0):
+        self._load_fn = load_fn
+        self._version_fn = version_fn
+        self.max_age = max_age
+        self._version = None
+        self._rows = []
+        self._checked = 0.0
+        self._cond = threading.Condition()
+        self._subscribers = []
+        self.loads = 0
+
+    def snapshot(self):
+        """(version, rows) - rows are shared, treat them as read-only."""
+        now = time.monotonic()
+        if self._version is None or now - self._checked > self.max_age:
+            self._checked = now
+            if self._version is None or self._version_fn() != self._version:
+                self.refresh()
+        return self._version, self._rows
+
+    def refresh(self):
+        """Re-read the rows (call after committing a change) and notify subscribers if they moved."""
+        version, rows = self._load_fn()
+        with self._cond:
+            changed = version != self._version
+            self._version, self._rows = version, rows
+            self._checked = time.monotonic()
+            self.loads += 1
+            subscribers = list(self._subscribers)
+            self._cond.notify_all()
+        if changed:
+            for fn in subscribers:
+                fn(version, rows)
+        return version, rows
+
+    def subscribe(self, fn):
+        """Register fn(version, rows); returns a function that unsubscribes it."""
+        with self._cond:
+            self._subscribers.append(fn)
+
+        def unsubscribe():
+            with self._cond:
+                if fn in self._subscribers:
+                    self._subscribers.remove(fn)
+        return unsubscribe
+
+    def wait(self, since_version, timeout=None):
+        """Block until the version differs from since_version (or timeout); returns snapshot()."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # snapshot() also notices changes committed by other processes
+            version, rows = self.snapshot()
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if version != since_version or (remaining is not None and remaining <= 0):
+                return version, rows
+            with self._cond:
+                if self._version == since_version:
+                    self._cond.wait(self.max_age if remaining is None else min(remaining, self.max_age))
@@ -0,0 +1,216 @@
+"""
+Resized, recompressed variants of the menu photos.
+
+Variants live in `thumb_dir` (db_utils.THUMB_DIR, data/thumbnails/ by
+default) under a name derived from the source image's content hash, so an
+edited photo gets new files and unchanged photos are never regenerated.
+Encoded bytes of recently served variants are kept in an in-memory LRU.
+Menu edits queue their photos for one background thread; bulk rebuilds
+use worker processes from the CLI.
+
+    python -m utils.thumbnails rebuild [--force] [--workers N]
+"""
+import argparse
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import tempfile
+import threading
+from collections import OrderedDict
+import concurrent.futures
+
+log = logging.getLogger(__name__)
+
+WIDTHS = (80, 100, 300)
+QUALITY = 80
+MEMORY_CACHE_BYTES = 32 * 1024 * 1024
+
+Image = features = None
+_import_tried = False
+
+
+def available():
+    """Import Pillow on first use; False when it is not installed (callers fall back to the original file)."""
+    global Image, features, _import_tried
+    if not _import_tried:
+        try:
+            from PIL import Image, features
+        except ImportError:
+            pass
+        _import_tried = True
+    return Image is not None
+
+
+def _format():
+    if available() and features.check("webp"):
+        return "WEBP", "webp"
+    return "JPEG", "jpg"
+
+
+_digests = {}          # (path, mtime_ns, size) -> content hash
+_lru = OrderedDict()   # (digest, width) -> bytes
+_lru_bytes = 0
+_lock = threading.Lock()
+_pending = queue.Queue()  # (path, thumb_dir) for the background worker
+_worker = None
+
+
+def source_digest(path):
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    digest = _digests.get(key)
+    if digest is None:
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                h.update(chunk)
+        digest = _digests[key] = h.hexdigest()[:20]
+    return digest
+
+
+def thumbnail_path(path, width, thumb_dir, digest=None):
+    digest = digest or source_digest(path)
+    return os.path.join(thumb_dir, f"{digest}_{width}.{_format()[1]}")
+
+
+def make_thumbnails(path, thumb_dir, widths=WIDTHS, force=False):
+    """Generate the missing variants of one image; returns how many files were written."""
+    if not available() or not path or not os.path.isfile(path):
+        return 0
+    digest = source_digest(path)
+    todo = [w for w in widths if force or not os.path.exists(thumbnail_path(path, w, thumb_dir, digest))]
+    if not todo:
+        return 0
+    os.makedirs(thumb_dir, exist_ok=True)
+    fmt = _format()[0]
+    with Image.open(path) as src:
+        src = src.convert("RGB")
+        for w in todo:
+            img = src.copy()
+            img.thumbnail((w, w * 4), Image.LANCZOS)
+            dest = thumbnail_path(path, w, thumb_dir, digest)
+            # a unique temp name: the edit-time thread and a CLI rebuild may write the same variant
+            fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=thumb_dir)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    img.save(f, fmt, quality=QUALITY, optimize=True)
+                os.replace(tmp, dest)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+    return len(todo)
+
+
+def _remember(key, data):
+    global _lru_bytes
+    with _lock:
+        if key in _lru:
+            _lru.move_to_end(key)
+            return
+        _lru[key] = data
+        _lru_bytes += len(data)
+        while _lru_bytes > MEMORY_CACHE_BYTES and _lru:
+            _, old = _lru.popitem(last=False)
+            _lru_bytes -= len(old)
+
+
+def thumbnail_bytes(path, width, thumb_dir):
+    """
+    Encoded bytes of the variant closest to `width` (generated on demand),
+    or None when thumbnails are unavailable and the caller should use `path`.
+    """
+    if not available() or not path:
+        return None
+    width = min(WIDTHS, key=lambda w: (w < width, abs(w - width)))
+    try:
+        digest = source_digest(path)
+    except OSError:
+        return None
+    key = (digest, width)
+    data = _lru.get(key)
+    if data is not None:
+        with _lock:
+            if key in _lru:
+                _lru.move_to_end(key)
+        return data
+    dest = thumbnail_path(path, width, thumb_dir, digest)
+    try:
+        if not os.path.exists(dest):
+            make_thumbnails(path, thumb_dir)
+        with open(dest, "rb") as f:
+            data = f.read()
+    except (OSError, ValueError) as exc:
+        log.warning("thumbnail for %s failed: %s", path, exc)
+        return None
+    _remember(key, data)
+    return data
+
+
+def _work():
+    while True:
+        item = _pending.get()
+        if item is None:
+            return
+        try:
+            make_thumbnails(*item)
+        except Exception as exc:
+            log.warning("background thumbnail generation for %s failed: %s", item[0], exc)
+
+
+def schedule(paths, thumb_dir):
+    """Queue variants of `paths` for the background thread (menu edits, imports); returns how many were queued."""
+    global _worker
+    if not available():
+        return 0
+    paths = {p for p in paths if p}
+    with _lock:
+        if _worker is None or not _worker.is_alive():
+            # a daemon thread: exiting never waits on it, and PIL releases the GIL while it resizes
+            _worker = threading.Thread(target=_work, name="thumbnails", daemon=True)
+            _worker.start()
+    for p in paths:
+        _pending.put((p, thumb_dir))
+    return len(paths)
+
+
+@atexit.register
+def _stop():
+    # variants still queued are made on demand by thumbnail_bytes() or `rebuild`
+    while True:
+        try:
+            _pending.get_nowait()
+        except queue.Empty:
+            break
+    _pending.put(None)
+
+
+def rebuild_all(paths, thumb_dir, force=False, workers=None):
+    """Bulk (re)generate variants for every image in `paths`; returns files written."""
+    if not available():
+        raise RuntimeError("Pillow is not installed")
+    paths = sorted({p for p in paths if p and os.path.isfile(p)})
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as ex:
+        return sum(ex.map(make_thumbnails, paths, [thumb_dir] * len(paths), [WIDTHS] * len(paths),
+                          [force] * len(paths)))
+
+
+def main(argv=None):
+    from utils import db_utils
+
+    ap = argparse.ArgumentParser(prog="python -m utils.thumbnails")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rb = sub.add_parser("rebuild", help="generate thumbnails for every menu image")
+    rb.add_argument("--force", action="store_true", help="regenerate existing variants too")
+    rb.add_argument("--workers", type=int)
+    args = ap.parse_args(argv)
+
+    db_utils.initialize_database()
+    paths = [row["image_path"] for row in db_utils.get_menu_snapshot().rows]
+    written = rebuild_all(paths, db_utils.THUMB_DIR, force=args.force, workers=args.workers)
+    print(f"{written} thumbnails written to {db_utils.THUMB_DIR}")
+
+
+if __name__ == "__main__":
+    main()
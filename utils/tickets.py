@@ -0,0 +1,146 @@
+"""
+Open tickets (running tabs): an order that is opened for a table, grows or
+shrinks a round at a time and is settled with payment at the end.
+
+An open ticket is an `orders` row with status 'open' and no order_date yet;
+it gets its order_date (the sale time every report filters on) when it is
+settled, so reports, exports, the archive and the rollup only ever see
+closed orders. While the ticket is open:
+
+- appending a round inserts just the new lines,
+- voiding removes quantity from one line (logged in order_voids),
+- and both adjust the running subtotal / GST / total on the order row by a
+  delta: order_tax keeps the taxable amount per GST rate in minor units, so
+  the per-rate rounding matches compute_bills() without re-reading the lines.
+
+All functions take a connection and must run inside a transaction.
+"""
+from utils import rollup
+from utils.calculator import MINOR, bucket_gst, discount_minor
+
+OPEN, CLOSED = "open", "closed"
+
+
+class TicketClosed(Exception):
+    """The order is not an open ticket (already settled, or no such order)."""
+
+    def __init__(self, order_id):
+        self.order_id = order_id
+        super().__init__(f"order {order_id} is not an open ticket")
+
+
+def open_ticket(conn, order_type, table_id, opened_at):
+    """Insert an empty open order; returns its id."""
+    cur = conn.execute("""INSERT INTO orders (order_type, table_id, subtotal, gst_amount, discount_amount,
+                                              total_amount, status, opened_at)
+                          VALUES (?, ?, 0, 0, 0, 0, ?, ?)""", (order_type, table_id, OPEN, opened_at))
+    return cur.lastrowid
+
+
+def _adjust(conn, order_id, changes):
+    """Apply {gst_rate: taxable delta (minor)} to the ticket's buckets and running totals."""
+    sub_delta = gst_delta = 0
+    for rate, delta in changes.items():
+        if not delta:
+            continue
+        row = conn.execute("SELECT taxable FROM order_tax WHERE order_id = ? AND gst_rate = ?",
+                           (order_id, rate)).fetchone()
+        old = row[0] if row else 0
+        new = old + delta
+        conn.execute("""INSERT INTO order_tax (order_id, gst_rate, taxable) VALUES (?, ?, ?)
+                        ON CONFLICT(order_id, gst_rate) DO UPDATE SET taxable = excluded.taxable""",
+                     (order_id, rate, new))
+        sub_delta += delta
+        gst_delta += bucket_gst(new, rate) - bucket_gst(old, rate)
+    sub, gst = sub_delta / MINOR, gst_delta / MINOR
+    # right-hand sides see the old row, so the total is rebuilt from both deltas
+    cur = conn.execute("""UPDATE orders SET subtotal = ROUND(subtotal + ?, 2), gst_amount = ROUND(gst_amount + ?, 2),
+                                 total_amount = ROUND(subtotal + gst_amount + ? + ?, 2)
+                          WHERE id = ? AND status = ?""", (sub, gst, sub, gst, order_id, OPEN))
+    if cur.rowcount != 1:
+        raise TicketClosed(order_id)
+
+
+def append(conn, order_id, lines):
+    """
+    Add a round to an open ticket. lines: dicts with item_id, name, category,
+    price, quantity and gst (percent). Returns the new order_items ids.
+    """
+    order_id = int(order_id)
+    changes = {}
+    for it in lines:
+        rate = float(it["gst"] if it.get("gst") is not None else 5)
+        changes[rate] = changes.get(rate, 0) + int(round(float(it["price"]) * MINOR)) * int(it["quantity"])
+    _adjust(conn, order_id, changes)
+    ids = []
+    for it in lines:
+        cur = conn.execute("""INSERT INTO order_items (order_id, item_id, quantity, item_name, category, unit_price,
+                                                       gst_rate)
+                              VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                           (order_id, int(it["item_id"]), int(it["quantity"]), it["name"], it["category"],
+                            float(it["price"]), it.get("gst")))
+        ids.append(cur.lastrowid)
+    return ids
+
+
+def void(conn, order_id, line_id, quantity, voided_at):
+    """Take `quantity` (None = all) off one line of an open ticket; returns the quantity voided."""
+    order_id = int(order_id)
+    row = conn.execute("""SELECT item_id, item_name, unit_price, quantity, gst_rate FROM order_items
+                          WHERE id = ? AND order_id = ?""", (int(line_id), order_id)).fetchone()
+    if row is None:
+        raise KeyError(f"order {order_id} has no line {line_id}")
+    item_id, name, price, have, rate = row
+    qty = have if quantity is None else min(int(quantity), have)
+    if qty <= 0:
+        return 0
+    _adjust(conn, order_id, {float(rate if rate is not None else 5): -int(round((price or 0) * MINOR)) * qty})
+    if qty == have:
+        conn.execute("DELETE FROM order_items WHERE id = ?", (int(line_id),))
+    else:
+        conn.execute("UPDATE order_items SET quantity = quantity - ? WHERE id = ?", (qty, int(line_id)))
+    conn.execute("""INSERT INTO order_voids (order_id, order_item_id, item_id, item_name, unit_price, quantity,
+                                             voided_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)""", (order_id, int(line_id), item_id, name, price, qty, voided_at))
+    return qty
+
+
+def settle(conn, order_id, payment_mode, closed_at, discount_type="None", discount_value=0.0):
+    """
+    Close an open ticket: apply the discount, stamp order_date and add it to
+    the daily rollup. Returns a commit_order()-style bill record.
+    """
+    order_id = int(order_id)
+    row = conn.execute("SELECT order_type, table_id FROM orders WHERE id = ? AND status = ?",
+                       (order_id, OPEN)).fetchone()
+    if row is None:
+        raise TicketClosed(order_id)
+    order_type, table_id = row
+    buckets = conn.execute("SELECT gst_rate, taxable FROM order_tax WHERE order_id = ?", (order_id,)).fetchall()
+    subtotal = sum(t for _, t in buckets)
+    gst = sum(bucket_gst(t, r) for r, t in buckets)
+    discount = discount_minor(subtotal, discount_type, discount_value)
+    total = max(subtotal + gst - discount, 0)
+    conn.execute("""UPDATE orders SET status = ?, payment_mode = ?, order_date = ?, subtotal = ?, gst_amount = ?,
+                                      discount_amount = ?, total_amount = ?
+                    WHERE id = ?""",
+                 (CLOSED, payment_mode, closed_at, subtotal / MINOR, gst / MINOR, discount / MINOR, total / MINOR,
+                  order_id))
+    conn.execute("DELETE FROM order_tax WHERE order_id = ?", (order_id,))
+    items = [{"item_id": r[0], "name": r[1], "category": r[2], "price": r[3], "quantity": r[4], "gst": r[5]}
+             for r in conn.execute("""SELECT item_id, item_name, category, unit_price, quantity, gst_rate
+                                      FROM order_items WHERE order_id = ? ORDER BY id""", (order_id,))]
+    rollup.apply_order(conn, closed_at, order_type, payment_mode, subtotal / MINOR, gst / MINOR, discount / MINOR,
+                       total / MINOR, [(it["item_id"], it["name"], it["category"], it["price"], it["quantity"])
+                                       for it in items])
+    return {
+        "order_id": order_id, "order_type": order_type, "table_id": table_id, "payment_mode": payment_mode,
+        "subtotal": subtotal / MINOR, "gst": gst / MINOR, "discount": discount / MINOR, "total": total / MINOR,
+        "order_date": closed_at, "items": items,
+    }
+
+
+def open_tickets(conn):
+    """Open tickets, oldest first: (order_id, order_type, table_id, opened_at, subtotal, gst_amount, total_amount)."""
+    return conn.execute("""SELECT id, order_type, table_id, opened_at, subtotal, gst_amount, total_amount
+                           FROM orders WHERE status = ? ORDER BY id""", (OPEN,)).fetchall()